@@ -6,7 +6,9 @@
 
 import os
 import sys
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Optional, List
 from pathlib import Path
@@ -34,9 +36,14 @@ logger = logging.getLogger(__name__)
 # 导入核心模块
 from core.llm_client import DeepSeekClient
 from core.analyst import AnalystManager, AnalystManagerStream
+from core.batch import BatchAnalyzer
+from core.jobs import JobManager, JobStatus, QueueFullError
 from core.image_analyzer import ImageAnalyzer
+from core.jsonutil import sse_frame
 from data.stock_data import StockDataProvider
-from storage.mongodb import MongoDBStorage
+from storage import create_storage_from_env
+from quant.screener.screener import Screener
+from quant.screener.expression import ExpressionError
 
 # 创建 FastAPI 应用
 app = FastAPI(
@@ -62,8 +69,10 @@ llm_client = None
 data_provider = None
 analyst_manager = None
 analyst_manager_stream = None
-mongodb_storage = None
+report_storage = None
 image_analyzer = None
+job_manager = None
+screener = None
 
 
 # 请求模型
@@ -75,6 +84,32 @@ class AnalysisRequest(BaseModel):
     analysts: List[str] = ["market", "fundamentals"]
     research_depth: int = 3
     image_path: Optional[str] = None
+    parallel: bool = True
+
+
+class BatchAnalysisRequest(BaseModel):
+    """批量分析请求模型"""
+    tickers: List[str]
+    date: str
+    market: str = "A股"
+    analysts: List[str] = ["market", "fundamentals"]
+    research_depth: int = 3
+    max_concurrency: Optional[int] = None
+
+
+class ScreenRequest(BaseModel):
+    """筛选请求模型"""
+    expression: str
+    market: str = "A股"
+    date: Optional[str] = None
+    tickers: Optional[List[str]] = None
+    sort_by: Optional[str] = None
+    descending: bool = True
+    limit: int = 50
+    # 为命中的股票提交后台分析任务
+    analyze: bool = False
+    analysts: List[str] = ["market", "fundamentals"]
+    research_depth: int = 3
 
 
 class AnalysisResponse(BaseModel):
@@ -87,7 +122,7 @@ class AnalysisResponse(BaseModel):
 # 初始化组件
 def init_components():
     """初始化所有组件"""
-    global llm_client, data_provider, analyst_manager, analyst_manager_stream, mongodb_storage, image_analyzer
+    global llm_client, data_provider, analyst_manager, analyst_manager_stream, report_storage, image_analyzer, screener
     
     try:
         logger.info("📦 初始化组件...")
@@ -100,6 +135,10 @@ def init_components():
         data_provider = StockDataProvider()
         logger.info("✅ 数据提供者初始化完成")
         
+        # 选股筛选器（与分析共用数据提供者和本地行情缓存）
+        screener = Screener(data_provider)
+        logger.info("✅ 选股筛选器初始化完成")
+        
         # 分析师管理器
         analyst_manager = AnalystManager(llm_client, data_provider)
         logger.info("✅ 分析师管理器初始化完成")
@@ -108,12 +147,14 @@ def init_components():
         analyst_manager_stream = AnalystManagerStream(llm_client, data_provider)
         logger.info("✅ 流式分析师管理器初始化完成")
         
-        # MongoDB 存储
-        mongodb_storage = MongoDBStorage()
-        if mongodb_storage.connected:
-            logger.info("✅ MongoDB 存储初始化完成")
+        # 存储（STORAGE_BACKEND 选择 MongoDB 或 SQLite）
+        report_storage = create_storage_from_env()
+        if report_storage.connected:
+            logger.info(f"✅ 存储初始化完成: {type(report_storage).__name__}")
+        elif report_storage.accepts_writes:
+            logger.warning("⚠️ 存储未连接，分析结果将暂存到本地日志，恢复连接后写入")
         else:
-            logger.warning("⚠️ MongoDB 未连接")
+            logger.warning("⚠️ 存储未连接，分析结果将不会保存")
         
         # 图片分析器
         image_analyzer = ImageAnalyzer(llm_client)
@@ -128,7 +169,44 @@ def init_components():
 @app.on_event("startup")
 async def startup_event():
     """应用启动时初始化"""
+    # 所有阻塞调用（LLM 同步请求、akshare/yfinance、存储）都通过 asyncio.to_thread
+    # 放到默认线程池执行，这里按配置设置线程池大小，避免阻塞事件循环
+    try:
+        blocking_workers = int(os.getenv("API_BLOCKING_WORKERS", "32"))
+    except ValueError:
+        blocking_workers = 32
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=blocking_workers, thread_name_prefix="blocking")
+    )
+    logger.info(f"✅ 阻塞任务线程池初始化完成: max_workers={blocking_workers}")
+    
     init_components()
+    
+    # 后台任务队列（存储可用时持久化任务，否则仅保存在进程内）
+    global job_manager
+    try:
+        job_workers = int(os.getenv("JOB_WORKERS", "4"))
+        job_queue_size = int(os.getenv("JOB_QUEUE_SIZE", "1000"))
+    except ValueError:
+        job_workers, job_queue_size = 4, 1000
+    job_manager = JobManager(
+        runner=lambda params: run_analysis(AnalysisRequest(**params)),
+        storage=report_storage,
+        workers=job_workers,
+        queue_size=job_queue_size
+    )
+    await job_manager.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时释放资源"""
+    if job_manager:
+        await job_manager.stop()
+    if analyst_manager:
+        analyst_manager.close()
+    if report_storage:
+        report_storage.close()
 
 
 # 获取前端目录路径
@@ -148,10 +226,79 @@ async def api_info():
 @app.get("/health")
 async def health_check():
     """健康检查"""
+    storage_backend = type(report_storage).__name__ if report_storage else None
+    storage_connected = report_storage.connected if report_storage else False
     return {
         "status": "healthy",
-        "mongodb_connected": mongodb_storage.connected if mongodb_storage else False,
-        "llm_ready": llm_client is not None
+        # 兼容旧的健康检查和前端：仅当后端为 MongoDB 且已连接时为 true
+        "mongodb_connected": storage_backend == "MongoDBStorage" and storage_connected,
+        "storage_backend": storage_backend,
+        "storage_connected": storage_connected,
+        "llm_ready": llm_client is not None,
+        "jobs": job_manager.stats() if job_manager else None
+    }
+
+
+def run_analysis(request: AnalysisRequest) -> dict:
+    """
+    执行一次完整分析：图片分析（可选）、分析师报告、保存到存储
+    
+    同步阻塞函数，由 /api/analyze 放到线程池执行，也作为后台任务的执行函数。
+    
+    Args:
+        request: 分析请求
+        
+    Returns:
+        响应数据字典
+    """
+    # 图片分析（如果提供）
+    image_analysis = None
+    if request.image_path:
+        logger.info(f"🖼️ 开始分析图片: {request.image_path}")
+        image_path = Path(request.image_path)
+        if image_path.exists():
+            image_analysis = image_analyzer.analyze_image(
+                str(image_path),
+                f"请分析这张与股票 {request.ticker} 相关的图片，提取关键信息用于股票分析。"
+            )
+            logger.info("✅ 图片分析完成")
+        else:
+            logger.warning(f"⚠️ 图片文件不存在: {request.image_path}")
+    
+    # 执行分析
+    logger.info("📊 开始执行股票分析...")
+    reports = analyst_manager.analyze(
+        ticker=request.ticker,
+        date=request.date,
+        market=request.market,
+        analysts=request.analysts,
+        parallel=request.parallel
+    )
+    
+    # 保存到存储
+    if report_storage and report_storage.accepts_writes:
+        logger.info("💾 保存分析结果到存储...")
+        report_storage.save_analysis_report(
+            stock_symbol=request.ticker,
+            analysis_date=request.date,
+            market=request.market,
+            analysts=list(reports.keys()),
+            reports=reports,
+            research_depth=request.research_depth,
+            image_analysis=image_analysis
+        )
+        logger.info("✅ 分析结果已保存到存储")
+    
+    # 构建响应
+    return {
+        "ticker": request.ticker,
+        "date": request.date,
+        "market": request.market,
+        "research_depth": request.research_depth,
+        "analysts": list(reports.keys()),
+        "reports": reports,
+        "image_analysis": image_analysis,
+        "timestamp": datetime.now().isoformat()
     }
 
 
@@ -183,54 +330,8 @@ async def analyze_stock(request: AnalysisRequest):
         if not request.date:
             raise HTTPException(status_code=400, detail="分析日期不能为空")
         
-        # 图片分析（如果提供）
-        image_analysis = None
-        if request.image_path:
-            logger.info(f"🖼️ 开始分析图片: {request.image_path}")
-            image_path = Path(request.image_path)
-            if image_path.exists():
-                image_analysis = image_analyzer.analyze_image(
-                    str(image_path),
-                    f"请分析这张与股票 {request.ticker} 相关的图片，提取关键信息用于股票分析。"
-                )
-                logger.info("✅ 图片分析完成")
-            else:
-                logger.warning(f"⚠️ 图片文件不存在: {request.image_path}")
-        
-        # 执行分析
-        logger.info("📊 开始执行股票分析...")
-        reports = analyst_manager.analyze(
-            ticker=request.ticker,
-            date=request.date,
-            market=request.market,
-            analysts=request.analysts
-        )
-        
-        # 保存到 MongoDB
-        if mongodb_storage and mongodb_storage.connected:
-            logger.info("💾 保存分析结果到 MongoDB...")
-            mongodb_storage.save_analysis_report(
-                stock_symbol=request.ticker,
-                analysis_date=request.date,
-                market=request.market,
-                analysts=list(reports.keys()),
-                reports=reports,
-                research_depth=request.research_depth,
-                image_analysis=image_analysis
-            )
-            logger.info("✅ 分析结果已保存到 MongoDB")
-        
-        # 构建响应
-        response_data = {
-            "ticker": request.ticker,
-            "date": request.date,
-            "market": request.market,
-            "research_depth": request.research_depth,
-            "analysts": list(reports.keys()),
-            "reports": reports,
-            "image_analysis": image_analysis,
-            "timestamp": datetime.now().isoformat()
-        }
+        # 执行分析（阻塞调用放到线程池，避免阻塞事件循环）
+        response_data = await asyncio.to_thread(run_analysis, request)
         
         logger.info("✅ 分析完成")
         
@@ -280,59 +381,50 @@ async def analyze_stock_stream(request: AnalysisRequest):
         async def event_generator():
             """生成 SSE 格式的流式数据"""
             try:
-                import json
-                
                 # 发送开始信号
-                yield f"data: {json.dumps({'event': 'start', 'message': '分析开始'})}\n\n"
+                yield sse_frame({'event': 'start', 'message': '分析开始'})
                 
-                # 获取分析流
-                full_content = {}  # 存储完整的分析内容
-                current_analyst = None
+                # 获取分析流（各分析师并发生成，事件自带分析师标签）
+                full_content = {}  # 存储完整的分析内容（按块收集，结束后拼接）
                 
-                async for chunk in analyst_manager_stream.analyze_stream(
+                async for event in analyst_manager_stream.analyze_events(
                     ticker=request.ticker,
                     date=request.date,
                     market=request.market,
-                    analysts=request.analysts
+                    analysts=request.analysts,
+                    concurrent=request.parallel
                 ):
-                    # 处理分析师标记
-                    if chunk.startswith("[ANALYST_START]"):
-                        current_analyst = chunk.replace("[ANALYST_START]", "").strip()
-                        full_content[current_analyst] = ""
-                        yield f"data: {json.dumps({'event': 'analyst_start', 'analyst': current_analyst})}\n\n"
-                    elif chunk.startswith("[ANALYST_END]"):
-                        current_analyst = chunk.replace("[ANALYST_END]", "").strip()
-                        yield f"data: {json.dumps({'event': 'analyst_end', 'analyst': current_analyst})}\n\n"
-                    else:
-                        # 普通内容块
-                        if current_analyst:
-                            full_content[current_analyst] += chunk
-                        
-                        # 发送内容块（使用 json.dumps 确保有效的 JSON）
-                        yield f"data: {json.dumps({'event': 'content', 'chunk': chunk})}\n\n"
+                    analyst = event["analyst"]
+                    if event["event"] == "analyst_start":
+                        full_content[analyst] = []
+                    elif event["event"] == "content":
+                        full_content[analyst].append(event["chunk"])
+                    
+                    # 发送事件（orjson 可用时直接序列化，不经过标准库 json）
+                    yield sse_frame(event)
                 
                 # 发送完成信号并准备保存
-                yield f"data: {json.dumps({'event': 'complete', 'message': '分析完成'})}\n\n"
+                yield sse_frame({'event': 'complete', 'message': '分析完成'})
                 
-                # 保存到 MongoDB（在流式完成后）
-                if mongodb_storage and mongodb_storage.connected:
-                    logger.info("💾 保存流式分析结果到 MongoDB...")
-                    mongodb_storage.save_analysis_report(
+                # 保存到存储（在流式完成后）
+                if report_storage and report_storage.accepts_writes:
+                    logger.info("💾 保存流式分析结果到存储...")
+                    # 启用写缓冲时只是入队，不会阻塞事件流
+                    await asyncio.to_thread(
+                        report_storage.save_analysis_report,
                         stock_symbol=request.ticker,
                         analysis_date=request.date,
                         market=request.market,
                         analysts=list(full_content.keys()),
-                        reports=full_content,
+                        reports={name: "".join(chunks) for name, chunks in full_content.items()},
                         research_depth=request.research_depth,
                         image_analysis=None
                     )
-                    logger.info("✅ 流式分析结果已保存到 MongoDB")
+                    logger.info("✅ 流式分析结果已保存到存储")
                 
             except Exception as e:
                 logger.error(f"❌ 流式分析失败: {e}", exc_info=True)
-                import json
-                error_msg = json.dumps(str(e))
-                yield f"data: {{'event': 'error', 'message': {error_msg}}}\n\n"
+                yield sse_frame({'event': 'error', 'message': str(e)})
         
         return StreamingResponse(
             event_generator(),
@@ -346,40 +438,230 @@ async def analyze_stock_stream(request: AnalysisRequest):
         raise HTTPException(status_code=500, detail=f"流式分析失败: {str(e)}")
 
 
-@app.get("/api/history")
-async def get_analysis_history(ticker: Optional[str] = None, limit: int = 10):
+@app.post("/api/jobs")
+async def submit_analysis_job(request: AnalysisRequest):
     """
-    获取分析历史记录
+    提交后台分析任务，立即返回任务 ID
     
     Args:
-        ticker: 股票代码（可选）
-        limit: 返回数量限制
+        request: 分析请求
         
     Returns:
-        历史记录列表
+        任务 ID 和初始状态
     """
+    if not request.ticker:
+        raise HTTPException(status_code=400, detail="股票代码不能为空")
+    
+    if not request.date:
+        raise HTTPException(status_code=400, detail="分析日期不能为空")
+    
     try:
-        if not mongodb_storage or not mongodb_storage.connected:
-            return {
-                "success": False,
-                "message": "MongoDB 未连接",
-                "data": []
-            }
+        job = await job_manager.submit(request.model_dump())
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    return {
+        "success": True,
+        "message": "任务已提交",
+        "data": {"job_id": job["job_id"], "status": job["status"]}
+    }
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_analysis_job(job_id: str):
+    """
+    查询后台分析任务状态和结果
+    
+    Args:
+        job_id: 任务 ID
         
-        reports = mongodb_storage.get_analysis_reports(
-            stock_symbol=ticker,
-            limit=limit
-        )
+    Returns:
+        任务信息，完成后包含分析结果
+    """
+    job = await job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    
+    return {
+        "success": True,
+        "message": "获取成功",
+        "data": job
+    }
+
+
+@app.get("/api/jobs/{job_id}/stream")
+async def stream_analysis_job(job_id: str):
+    """
+    以 SSE 推送后台任务的状态变化，任务结束后推送结果并关闭连接
+    
+    客户端断开后可以重新连接同一个 job_id 继续获取结果。
+    
+    Args:
+        job_id: 任务 ID
+        
+    Returns:
+        流式任务状态
+    """
+    job = await job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    
+    async def event_generator():
+        """生成 SSE 格式的任务状态"""
+        current = job
+        last_status = None
+        while True:
+            if current["status"] != last_status:
+                last_status = current["status"]
+                payload = {"event": "status", "job_id": job_id, "status": last_status}
+                if last_status == JobStatus.COMPLETED:
+                    payload["result"] = current["result"]
+                elif last_status == JobStatus.FAILED:
+                    payload["error"] = current["error"]
+                yield sse_frame(payload)
+            else:
+                # 保活注释行，防止代理断开空闲连接
+                yield ": keep-alive\n\n"
+            
+            if last_status in JobStatus.FINISHED:
+                break
+            current = await job_manager.wait(job_id, timeout=15.0) or current
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream"
+    )
+
+
+@app.post("/api/analyze-batch")
+async def analyze_stock_batch(request: BatchAnalysisRequest):
+    """
+    批量分析多只股票（SSE 流式返回进度和每只股票的结果）
+    
+    Args:
+        request: 批量分析请求
+        
+    Returns:
+        流式结果：start -> result（每只股票一条，按完成顺序）-> complete
+    """
+    tickers = list(dict.fromkeys(t.strip() for t in request.tickers if t.strip()))
+    if not tickers:
+        raise HTTPException(status_code=400, detail="股票代码列表不能为空")
+    
+    if not request.date:
+        raise HTTPException(status_code=400, detail="分析日期不能为空")
+    
+    try:
+        default_concurrency = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+    except ValueError:
+        default_concurrency = 4
+    max_concurrency = min(request.max_concurrency or default_concurrency, default_concurrency)
+    
+    logger.info("=" * 60)
+    logger.info(f"🚀 收到批量分析请求: {len(tickers)} 只股票，并发 {max_concurrency}")
+    logger.info("=" * 60)
+    
+    batch_analyzer = BatchAnalyzer(analyst_manager, report_storage, max_concurrency=max_concurrency)
+    
+    async def event_generator():
+        """生成 SSE 格式的批量进度"""
+        succeeded = 0
+        yield sse_frame({'event': 'start', 'total': len(tickers)})
+        try:
+            async for result in batch_analyzer.run_async(
+                tickers=tickers,
+                date=request.date,
+                market=request.market,
+                analysts=request.analysts,
+                research_depth=request.research_depth
+            ):
+                succeeded += result["success"]
+                yield sse_frame({'event': 'result', **result})
+            
+            yield sse_frame({'event': 'complete', 'total': len(tickers), 'succeeded': succeeded, 'failed': len(tickers) - succeeded})
+        except Exception as e:
+            logger.error(f"❌ 批量分析失败: {e}", exc_info=True)
+            yield sse_frame({'event': 'error', 'message': str(e)})
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream"
+    )
+
+
+@app.get("/api/history")
+async def get_analysis_history(
+    ticker: Optional[str] = None,
+    date: Optional[str] = None,
+    limit: int = 10,
+    after: Optional[str] = None
+):
+    """
+    获取分析历史记录（只包含元数据和摘要，完整报告通过 /api/reports/{analysis_id} 获取）
+    
+    Args:
+        ticker: 股票代码（可选）
+        date: 分析日期（可选）
+        limit: 每页数量
+        after: 上一页返回的 next_cursor（可选）
         
+    Returns:
+        历史记录列表和下一页游标
+    """
+    if not report_storage or not report_storage.connected:
         return {
-            "success": True,
-            "message": "获取成功",
-            "data": reports
+            "success": False,
+            "message": "存储未连接",
+            "data": [],
+            "next_cursor": None
         }
-        
+    
+    limit = max(1, min(limit, 100))
+    try:
+        reports, next_cursor = await asyncio.to_thread(
+            report_storage.list_analysis_reports,
+            stock_symbol=ticker,
+            analysis_date=date,
+            limit=limit,
+            after=after
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"❌ 获取历史记录失败: {e}")
         raise HTTPException(status_code=500, detail=f"获取历史记录失败: {str(e)}")
+    
+    return {
+        "success": True,
+        "message": "获取成功",
+        "data": reports,
+        "next_cursor": next_cursor
+    }
+
+
+@app.get("/api/reports/{analysis_id}")
+async def get_analysis_report(analysis_id: str):
+    """
+    获取一份完整的分析报告
+    
+    Args:
+        analysis_id: 分析 ID
+        
+    Returns:
+        完整报告
+    """
+    if not report_storage or not report_storage.connected:
+        raise HTTPException(status_code=503, detail="存储未连接")
+    
+    report = await asyncio.to_thread(report_storage.get_analysis_report, analysis_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="报告不存在")
+    
+    return {
+        "success": True,
+        "message": "获取成功",
+        "data": report
+    }
 
 
 @app.get("/api/stock-info")
@@ -398,7 +680,7 @@ async def get_stock_info(ticker: str, market: str = "A股"):
         if not data_provider:
             raise HTTPException(status_code=500, detail="数据提供者未初始化")
         
-        stock_info = data_provider.get_stock_info(ticker, market)
+        stock_info = await asyncio.to_thread(data_provider.get_stock_info, ticker, market)
         market_info = data_provider.get_market_info(ticker, market)
         
         return {
@@ -417,6 +699,119 @@ async def get_stock_info(ticker: str, market: str = "A股"):
         raise HTTPException(status_code=500, detail=f"获取股票信息失败: {str(e)}")
 
 
+@app.get("/api/symbols/search")
+async def search_symbols(q: str, market: str = "A股", limit: int = 10):
+    """
+    股票代码/名称自动补全
+    
+    Args:
+        q: 代码或名称前缀
+        market: 市场类型
+        limit: 返回数量限制
+        
+    Returns:
+        匹配的股票列表
+    """
+    try:
+        if not data_provider:
+            raise HTTPException(status_code=500, detail="数据提供者未初始化")
+        
+        results = await asyncio.to_thread(data_provider.search_symbols, q, market, limit)
+        
+        return {
+            "success": True,
+            "message": "获取成功",
+            "data": results
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ 搜索股票失败: {e}")
+        raise HTTPException(status_code=500, detail=f"搜索股票失败: {str(e)}")
+
+
+@app.post("/api/screen")
+async def screen_stocks(request: ScreenRequest):
+    """
+    用筛选表达式在股票池中选股，可选为命中的股票提交后台分析任务
+    
+    Args:
+        request: 筛选请求
+        
+    Returns:
+        命中的股票列表；analyze 为 true 时附带每只股票的任务 ID
+    """
+    if not screener:
+        raise HTTPException(status_code=500, detail="选股筛选器未初始化")
+    
+    try:
+        screener.compile(request.expression)
+        if request.sort_by:
+            screener.compile(request.sort_by)
+    except ExpressionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    limit = max(1, min(request.limit, 500))
+    tickers = [t.strip() for t in request.tickers if t.strip()] if request.tickers else None
+    
+    try:
+        result = await asyncio.to_thread(
+            screener.screen,
+            request.expression,
+            request.market,
+            request.date,
+            tickers,
+            request.sort_by,
+            request.descending,
+            limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"❌ 筛选失败: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"筛选失败: {str(e)}")
+    
+    data = result.to_dict()
+    
+    if request.analyze and result.hits:
+        jobs = []
+        for ticker in result.tickers:
+            analysis_request = AnalysisRequest(
+                ticker=ticker,
+                date=result.date,
+                market=request.market,
+                analysts=request.analysts,
+                research_depth=request.research_depth
+            )
+            try:
+                job = await job_manager.submit(analysis_request.model_dump())
+            except QueueFullError:
+                logger.warning(f"⚠️ 任务队列已满，{len(result.tickers) - len(jobs)} 只股票未提交分析")
+                break
+            jobs.append({"ticker": ticker, "job_id": job["job_id"], "status": job["status"]})
+        data["jobs"] = jobs
+    
+    return {
+        "success": True,
+        "message": f"筛选完成，命中 {result.matched} 只股票",
+        "data": data
+    }
+
+
+@app.get("/api/screen/fields")
+async def get_screen_fields():
+    """筛选表达式中可用的列名和函数"""
+    return {
+        "success": True,
+        "message": "获取成功",
+        "data": {
+            "fields": Screener.available_fields(),
+            "functions": Screener.available_functions()
+        }
+    }
+
+
 # 根路径 - 返回前端页面（必须在最后，作为后备路由）
 @app.get("/")
 async def root():
@@ -1,264 +1,383 @@
 """
 分析师模块 - 提供同步和异步版本的股票分析功能
+
+分析师通过 register_analyst 注册（标识 + 提示词模板），同步/流式管理器共用同一个注册表和执行器，
+新增分析师无需修改管理器。
 """
 
+import os
+import time
+import asyncio
 import logging
-from typing import Dict, Optional, AsyncGenerator
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, AsyncGenerator
 from datetime import datetime
 
 from .llm_client import DeepSeekClient
-from data.stock_data import StockDataProvider
+from .prompts import AnalystPrompt, MARKET_PROMPT, FUNDAMENTALS_PROMPT, build_prompt
+from .singleflight import SingleFlight, StreamSingleFlight
+from data.stock_data import StockDataProvider, MarketSnapshot
 
 logger = logging.getLogger(__name__)
 
 
-# ==================== 同步版本分析师 ====================
+# ==================== 分析师注册表 ====================
 
-class MarketAnalyst:
-    """市场分析师 - 技术面分析（同步版本）"""
-    
-    def __init__(self, llm_client: DeepSeekClient, data_provider: StockDataProvider):
-        self.llm = llm_client
-        self.data_provider = data_provider
-    
-    def analyze(self, ticker: str, date: str, market: str = "A股") -> str:
-        """进行市场分析"""
-        logger.info(f"📊 [市场分析师] 开始分析: {ticker} ({market})")
-        
-        stock_info = self.data_provider.get_stock_info(ticker, market)
-        market_info = self.data_provider.get_market_info(ticker, market)
-        market_data = self.data_provider.get_market_data(ticker, date, market)
-        
-        system_prompt = f"""你是一位专业的股票技术分析师，擅长分析股票的市场表现和技术指标。
+@dataclass(frozen=True)
+class AnalystSpec:
+    """
+    分析师定义
 
-分析对象：
-- {stock_info}
-- 分析日期：{date}
-- 计价货币：{market_info['currency_name']}（{market_info['currency_symbol']}）
+    每个分析师只声明一次提示词模板（模板的 sections 即它需要的快照数据），
+    由 AnalystRunner 以同步、异步或流式方式执行。
+    """
+    key: str
+    prompt: AnalystPrompt
 
-请基于提供的市场数据，进行详细的技术分析，包括：
-1. 价格趋势分析
-2. 技术指标分析（如移动平均线、MACD、RSI等）
-3. 成交量分析
-4. 投资建议（买入/持有/卖出）
+    @property
+    def name(self) -> str:
+        """报告名称（如"市场分析师"）"""
+        return self.prompt.name
 
-使用中文撰写报告，确保分析专业且详细。"""
 
-        analysis_prompt = f"""请对以下股票进行市场分析：
+_REGISTRY: Dict[str, AnalystSpec] = {}
 
-{stock_info}
 
-市场数据：
-{market_data}
+def register_analyst(key: str, prompt: AnalystPrompt) -> AnalystSpec:
+    """
+    注册分析师（同名 key 会被覆盖），注册后即可在请求的 analysts 列表中使用
 
-请提供详细的技术分析报告，包括价格趋势、技术指标、成交量分析和投资建议。"""
-        
-        try:
-            report = self.llm.analyze(
-                prompt=analysis_prompt,
-                system_prompt=system_prompt
-            )
-            logger.info(f"✅ [市场分析师] 分析完成: {ticker}")
-            return report
-        except Exception as e:
-            logger.error(f"❌ [市场分析师] 分析失败: {e}")
-            return f"市场分析失败: {str(e)}"
+    Args:
+        key: 请求中使用的标识，如 "market"
+        prompt: 提示词模板
 
+    Returns:
+        分析师定义
+    """
+    spec = AnalystSpec(key=key, prompt=prompt)
+    _REGISTRY[key] = spec
+    return spec
 
-class FundamentalsAnalyst:
-    """基本面分析师 - 财务面分析（同步版本）"""
-    
-    def __init__(self, llm_client: DeepSeekClient, data_provider: StockDataProvider):
-        self.llm = llm_client
-        self.data_provider = data_provider
-    
-    def analyze(self, ticker: str, date: str, market: str = "A股") -> str:
-        """进行基本面分析"""
-        logger.info(f"📊 [基本面分析师] 开始分析: {ticker} ({market})")
-        
-        stock_info = self.data_provider.get_stock_info(ticker, market)
-        market_info = self.data_provider.get_market_info(ticker, market)
-        market_data = self.data_provider.get_market_data(ticker, date, market)
-        
-        system_prompt = f"""你是一位专业的股票基本面分析师，擅长分析公司的财务状况和估值。
 
-分析对象：
-- {stock_info}
-- 分析日期：{date}
-- 计价货币：{market_info['currency_name']}（{market_info['currency_symbol']}）
+def available_analysts() -> List[str]:
+    """已注册的分析师标识（按注册顺序）"""
+    return list(_REGISTRY)
 
-请基于提供的市场数据，进行详细的基本面分析，包括：
-1. 公司基本信息分析
-2. 财务状况评估
-3. 盈利能力分析
-4. 估值分析（PE、PB、PEG等）
-5. 投资建议（买入/持有/卖出）
 
-使用中文撰写报告，确保分析专业且详细。如果数据不足，请说明并基于现有数据进行分析。"""
+def select_analysts(analysts: List[str]) -> List[AnalystSpec]:
+    """按请求顺序返回分析师定义，忽略重复和未注册的标识"""
+    selected = []
+    for key in dict.fromkeys(analysts):
+        spec = _REGISTRY.get(key)
+        if spec is None:
+            logger.warning(f"⚠️ 未知的分析师: {key}（可用: {', '.join(_REGISTRY)}）")
+            continue
+        selected.append(spec)
+    return selected
 
-        analysis_prompt = f"""请对以下股票进行基本面分析：
 
-{stock_info}
+register_analyst("market", MARKET_PROMPT)
+register_analyst("fundamentals", FUNDAMENTALS_PROMPT)
 
-市场数据：
-{market_data}
 
-请提供详细的基本面分析报告，包括财务状况、估值指标和投资建议。"""
+class AnalystRunner:
+    """分析师执行器 - 同一份分析师定义的同步、异步和流式执行"""
+    
+    def __init__(self, llm_client: DeepSeekClient, data_provider: StockDataProvider):
+        self.llm = llm_client
+        self.data_provider = data_provider
+    
+    def run(
+        self,
+        spec: AnalystSpec,
+        ticker: str,
+        date: str,
+        market: str = "A股",
+        snapshot: Optional[MarketSnapshot] = None,
+        raise_errors: bool = False
+    ) -> str:
+        """
+        执行分析（同步）
+        
+        Args:
+            raise_errors: 为 True 时 LLM 调用失败直接抛出异常，否则返回"执行失败"说明文本
+        """
+        logger.info(f"📊 [{spec.name}] 开始分析: {ticker} ({market})")
+        
+        if snapshot is None:
+            snapshot = self.data_provider.get_snapshot(ticker, date, market)
+        prompt = build_prompt(spec.prompt, snapshot, date)
         
         try:
             report = self.llm.analyze(
-                prompt=analysis_prompt,
-                system_prompt=system_prompt
+                prompt=prompt.user,
+                system_prompt=prompt.system,
+                max_tokens=prompt.max_tokens
             )
-            logger.info(f"✅ [基本面分析师] 分析完成: {ticker}")
+            logger.info(f"✅ [{spec.name}] 分析完成: {ticker}")
             return report
         except Exception as e:
-            logger.error(f"❌ [基本面分析师] 分析失败: {e}")
-            return f"基本面分析失败: {str(e)}"
-
-
-class AnalystManager:
-    """分析师管理器 - 协调多个分析师（同步版本）"""
+            logger.error(f"❌ [{spec.name}] 分析失败: {e}")
+            if raise_errors:
+                raise
+            return f"{spec.name}执行失败: {str(e)}"
     
-    def __init__(self, llm_client: DeepSeekClient, data_provider: StockDataProvider):
-        self.market_analyst = MarketAnalyst(llm_client, data_provider)
-        self.fundamentals_analyst = FundamentalsAnalyst(llm_client, data_provider)
+    async def run_async(
+        self,
+        spec: AnalystSpec,
+        ticker: str,
+        date: str,
+        market: str = "A股",
+        snapshot: Optional[MarketSnapshot] = None
+    ) -> str:
+        """执行分析（异步，阻塞调用放到线程池）"""
+        return await asyncio.to_thread(self.run, spec, ticker, date, market, snapshot)
     
-    def analyze(
+    async def stream(
         self,
+        spec: AnalystSpec,
         ticker: str,
         date: str,
         market: str = "A股",
-        analysts: Optional[list] = None
-    ) -> Dict[str, str]:
-        """执行分析"""
-        if analysts is None:
-            analysts = ["market", "fundamentals"]
-        
-        reports = {}
+        snapshot: Optional[MarketSnapshot] = None
+    ) -> AsyncGenerator[str, None]:
+        """执行分析（流式，只输出文本块）"""
+        async for event in self.stream_events(spec, ticker, date, market, snapshot):
+            if event["type"] == "content":
+                yield event["text"]
+    
+    async def stream_events(
+        self,
+        spec: AnalystSpec,
+        ticker: str,
+        date: str,
+        market: str = "A股",
+        snapshot: Optional[MarketSnapshot] = None
+    ) -> AsyncGenerator[dict, None]:
+        """
+        执行分析（流式，输出 LLM 事件）
         
-        if "market" in analysts:
-            logger.info("📊 执行市场分析...")
-            reports["市场分析师"] = self.market_analyst.analyze(ticker, date, market)
+        Yields:
+            {"type": "content", "text": ...} 或 {"type": "finish", "finish_reason": ..., "usage": ..., "cached": ...}
+        """
+        logger.info(f"📊 [{spec.name}] 开始分析: {ticker} ({market})")
         
-        if "fundamentals" in analysts:
-            logger.info("📊 执行基本面分析...")
-            reports["基本面分析师"] = self.fundamentals_analyst.analyze(ticker, date, market)
+        if snapshot is None:
+            snapshot = await asyncio.to_thread(self.data_provider.get_snapshot, ticker, date, market)
+        prompt = build_prompt(spec.prompt, snapshot, date)
         
-        return reports
+        try:
+            async for event in self.llm.analyze_stream_events(
+                prompt=prompt.user,
+                system_prompt=prompt.system,
+                max_tokens=prompt.max_tokens
+            ):
+                yield event
+            logger.info(f"✅ [{spec.name}] 分析完成: {ticker}")
+        except Exception as e:
+            logger.error(f"❌ [{spec.name}] 分析失败: {e}")
+            yield {"type": "content", "text": f"{spec.name}执行失败: {str(e)}"}
 
 
-# ==================== 异步流式版本分析师 ====================
+# ==================== 同步版本管理器 ====================
 
-class MarketAnalystStream:
-    """市场分析师 - 技术面分析（异步流式版本）"""
-    
-    def __init__(self, llm_client: DeepSeekClient, data_provider: StockDataProvider):
-        self.llm = llm_client
-        self.data_provider = data_provider
-    
-    async def analyze_stream(self, ticker: str, date: str, market: str = "A股") -> AsyncGenerator[str, None]:
-        """进行市场分析（流式版本）"""
-        logger.info(f"📊 [市场分析师] 开始分析: {ticker} ({market})")
-        
-        stock_info = self.data_provider.get_stock_info(ticker, market)
-        market_info = self.data_provider.get_market_info(ticker, market)
-        market_data = self.data_provider.get_market_data(ticker, date, market)
-        
-        system_prompt = f"""你是一位专业的股票技术分析师，擅长分析股票的市场表现和技术指标。
-
-分析对象：
-- {stock_info}
-- 分析日期：{date}
-- 计价货币：{market_info['currency_name']}（{market_info['currency_symbol']}）
-
-请基于提供的市场数据，进行详细的技术分析，包括：
-1. 价格趋势分析
-2. 技术指标分析（如移动平均线、MACD、RSI等）
-3. 成交量分析
-4. 投资建议（买入/持有/卖出）
+@dataclass
+class AnalysisOutcome:
+    """
+    一次分析的结果
 
-使用中文撰写报告，确保分析专业且详细。"""
+    reports 与 AnalystManager.analyze 的返回值相同（失败的分析师对应"执行失败/超时"说明文本），
+    errors 记录失败的分析师及原因，调用方据此区分真实报告和失败占位文本。
+    """
+    reports: Dict[str, str]
+    errors: Dict[str, str] = field(default_factory=dict)
 
-        analysis_prompt = f"""请对以下股票进行市场分析：
+    @property
+    def all_failed(self) -> bool:
+        """所有分析师都失败"""
+        return bool(self.reports) and len(self.errors) >= len(self.reports)
 
-{stock_info}
+    @property
+    def succeeded(self) -> Dict[str, str]:
+        """成功的分析师报告"""
+        return {name: report for name, report in self.reports.items() if name not in self.errors}
 
-市场数据：
-{market_data}
 
-请提供详细的技术分析报告，包括价格趋势、技术指标、成交量分析和投资建议。"""
-        
-        try:
-            async for chunk in self.llm.analyze_stream(
-                prompt=analysis_prompt,
-                system_prompt=system_prompt
-            ):
-                yield chunk
-            logger.info(f"✅ [市场分析师] 分析完成: {ticker}")
-        except Exception as e:
-            logger.error(f"❌ [市场分析师] 分析失败: {e}")
-            yield f"市场分析失败: {str(e)}"
-
-
-class FundamentalsAnalystStream:
-    """基本面分析师 - 财务面分析（异步流式版本）"""
+class AnalystManager:
+    """分析师管理器 - 协调多个分析师（同步版本）"""
     
-    def __init__(self, llm_client: DeepSeekClient, data_provider: StockDataProvider):
-        self.llm = llm_client
+    def __init__(
+        self,
+        llm_client: DeepSeekClient,
+        data_provider: StockDataProvider,
+        max_workers: Optional[int] = None,
+        analyst_timeout: Optional[float] = None
+    ):
+        """
+        初始化分析师管理器
+        
+        Args:
+            llm_client: LLM 客户端
+            data_provider: 数据提供者
+            max_workers: 并行模式下的线程池大小（默认读取 ANALYST_MAX_WORKERS，否则为 4）
+            analyst_timeout: 单个分析师的超时秒数（默认读取 ANALYST_TIMEOUT，否则为 180）
+        """
         self.data_provider = data_provider
+        self.runner = AnalystRunner(llm_client, data_provider)
+        
+        if max_workers is None:
+            try:
+                max_workers = int(os.getenv("ANALYST_MAX_WORKERS", "4"))
+            except ValueError:
+                max_workers = 4
+        if analyst_timeout is None:
+            try:
+                analyst_timeout = float(os.getenv("ANALYST_TIMEOUT", "180"))
+            except ValueError:
+                analyst_timeout = 180.0
+        
+        self.max_workers = max(1, max_workers)
+        self.analyst_timeout = analyst_timeout
+        # 有界线程池，由所有请求共享，避免并发请求无限制地创建线程
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="analyst"
+        )
+        # 合并同时在途的相同请求
+        self._flight = SingleFlight()
+    
+    def analyze(
+        self,
+        ticker: str,
+        date: str,
+        market: str = "A股",
+        analysts: Optional[list] = None,
+        parallel: bool = True
+    ) -> Dict[str, str]:
+        """
+        执行分析
+        
+        Args:
+            ticker: 股票代码
+            date: 分析日期
+            market: 市场类型
+            analysts: 分析师列表
+            parallel: 是否并行执行各分析师（默认 True）
+            
+        Returns:
+            报告字典 {analyst_name: report_content}
+        """
+        return dict(self.analyze_with_status(ticker, date, market, analysts, parallel).reports)
     
-    async def analyze_stream(self, ticker: str, date: str, market: str = "A股") -> AsyncGenerator[str, None]:
-        """进行基本面分析（流式版本）"""
-        logger.info(f"📊 [基本面分析师] 开始分析: {ticker} ({market})")
+    def analyze_with_status(
+        self,
+        ticker: str,
+        date: str,
+        market: str = "A股",
+        analysts: Optional[list] = None,
+        parallel: bool = True
+    ) -> AnalysisOutcome:
+        """
+        执行分析，并返回各分析师的成败状态
         
-        stock_info = self.data_provider.get_stock_info(ticker, market)
-        market_info = self.data_provider.get_market_info(ticker, market)
-        market_data = self.data_provider.get_market_data(ticker, date, market)
+        参数同 analyze。
         
-        system_prompt = f"""你是一位专业的股票基本面分析师，擅长分析公司的财务状况和估值。
-
-分析对象：
-- {stock_info}
-- 分析日期：{date}
-- 计价货币：{market_info['currency_name']}（{market_info['currency_symbol']}）
-
-请基于提供的市场数据，进行详细的基本面分析，包括：
-1. 公司基本信息分析
-2. 财务状况评估
-3. 盈利能力分析
-4. 估值分析（PE、PB、PEG等）
-5. 投资建议（买入/持有/卖出）
-
-使用中文撰写报告，确保分析专业且详细。如果数据不足，请说明并基于现有数据进行分析。"""
-
-        analysis_prompt = f"""请对以下股票进行基本面分析：
+        Returns:
+            AnalysisOutcome（报告字典 + 失败的分析师及原因）
+        """
+        if analysts is None:
+            analysts = ["market", "fundamentals"]
+        
+        selected = select_analysts(analysts)
+        
+        # 相同 (ticker, date, market, analysts) 的请求同时在途时只执行一次
+        key = (ticker, date, market, tuple(spec.key for spec in selected))
+        outcome = self._flight.do(
+            key,
+            lambda: self._analyze_selected(selected, ticker, date, market, parallel)
+        )
+        # 合并的请求共享同一个结果对象，返回副本
+        return AnalysisOutcome(reports=dict(outcome.reports), errors=dict(outcome.errors))
+    
+    def _analyze_selected(
+        self,
+        selected: List[AnalystSpec],
+        ticker: str,
+        date: str,
+        market: str,
+        parallel: bool
+    ) -> AnalysisOutcome:
+        """执行选中的分析师"""
+        # 所有分析师共享同一份市场数据快照
+        snapshot = self.data_provider.get_snapshot(ticker, date, market)
+        outcome = AnalysisOutcome(reports={})
+        
+        if not parallel or len(selected) <= 1:
+            for spec in selected:
+                logger.info(f"📊 执行{spec.name}分析...")
+                try:
+                    outcome.reports[spec.name] = self.runner.run(
+                        spec, ticker, date, market, snapshot, raise_errors=True
+                    )
+                except Exception as e:
+                    outcome.reports[spec.name] = f"{spec.name}执行失败: {str(e)}"
+                    outcome.errors[spec.name] = str(e)
+            return outcome
+        
+        logger.info(f"📊 并行执行 {len(selected)} 个分析师...")
+        futures = {
+            spec.name: self._executor.submit(
+                self.runner.run, spec, ticker, date, market, snapshot, raise_errors=True
+            )
+            for spec in selected
+        }
+        
+        # 所有分析师同时开始，因此共用同一个截止时间
+        deadline = time.monotonic() + self.analyst_timeout
+        for name, future in futures.items():
+            try:
+                outcome.reports[name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                future.cancel()
+                logger.error(f"❌ [{name}] 分析超时（{self.analyst_timeout:.0f}s）")
+                outcome.reports[name] = f"{name}执行超时，请稍后重试。"
+                outcome.errors[name] = f"执行超时（{self.analyst_timeout:.0f}s）"
+            except Exception as e:
+                logger.error(f"❌ [{name}] 分析失败: {e}")
+                outcome.reports[name] = f"{name}执行失败: {str(e)}"
+                outcome.errors[name] = str(e)
+        
+        return outcome
+    
+    def close(self) -> None:
+        """关闭线程池"""
+        self._executor.shutdown(wait=False)
 
-{stock_info}
 
-市场数据：
-{market_data}
+# ==================== 异步流式版本管理器 ====================
 
-请提供详细的基本面分析报告，包括财务状况、估值指标和投资建议。"""
-        
-        try:
-            async for chunk in self.llm.analyze_stream(
-                prompt=analysis_prompt,
-                system_prompt=system_prompt
-            ):
-                yield chunk
-            logger.info(f"✅ [基本面分析师] 分析完成: {ticker}")
-        except Exception as e:
-            logger.error(f"❌ [基本面分析师] 分析失败: {e}")
-            yield f"基本面分析失败: {str(e)}"
+def _to_stream_event(name: str, event: dict) -> Dict:
+    """LLM 事件转换为带分析师标签的流式事件"""
+    if event["type"] == "content":
+        return {"event": "content", "analyst": name, "chunk": event["text"]}
+    return {
+        "event": "usage",
+        "analyst": name,
+        "finish_reason": event.get("finish_reason"),
+        "usage": event.get("usage"),
+        "cached": event.get("cached", False),
+    }
 
 
 class AnalystManagerStream:
     """分析师管理器 - 协调多个分析师（异步流式版本）"""
     
     def __init__(self, llm_client: DeepSeekClient, data_provider: StockDataProvider):
-        self.market_analyst_stream = MarketAnalystStream(llm_client, data_provider)
-        self.fundamentals_analyst_stream = FundamentalsAnalystStream(llm_client, data_provider)
+        self.data_provider = data_provider
+        self.runner = AnalystRunner(llm_client, data_provider)
+        # 合并同时在途的相同流式请求，同一串事件广播给所有订阅者
+        self._stream_flight = StreamSingleFlight()
     
     async def analyze_stream(
         self,
@@ -271,17 +390,105 @@ class AnalystManagerStream:
         if analysts is None:
             analysts = ["market", "fundamentals"]
         
-        if "market" in analysts:
-            logger.info("📊 执行市场分析...")
-            yield "[ANALYST_START]市场分析师\n"
-            async for chunk in self.market_analyst_stream.analyze_stream(ticker, date, market):
-                yield chunk
-            yield "\n[ANALYST_END]市场分析师\n"
+        # 所有分析师共享同一份市场数据快照（数据源为阻塞 IO，放到线程池执行）
+        snapshot = await asyncio.to_thread(self.data_provider.get_snapshot, ticker, date, market)
         
-        if "fundamentals" in analysts:
-            logger.info("📊 执行基本面分析...")
-            yield "[ANALYST_START]基本面分析师\n"
-            async for chunk in self.fundamentals_analyst_stream.analyze_stream(ticker, date, market):
+        for spec in select_analysts(analysts):
+            logger.info(f"📊 执行{spec.name}分析...")
+            yield f"[ANALYST_START]{spec.name}\n"
+            async for chunk in self.runner.stream(spec, ticker, date, market, snapshot):
                 yield chunk
-            yield "\n[ANALYST_END]基本面分析师\n"
+            yield f"\n[ANALYST_END]{spec.name}\n"
 
+    
+    async def analyze_events(
+        self,
+        ticker: str,
+        date: str,
+        market: str = "A股",
+        analysts: Optional[list] = None,
+        concurrent: bool = True
+    ) -> AsyncGenerator[Dict, None]:
+        """
+        执行流式分析，输出带分析师标签的结构化事件
+        
+        并发模式下所有分析师同时开始生成，各自的文本块按到达顺序交错输出，
+        总耗时取决于最慢的分析师而不是各分析师耗时之和。
+        
+        Args:
+            ticker: 股票代码
+            date: 分析日期
+            market: 市场类型
+            analysts: 分析师列表
+            concurrent: 是否并发执行各分析师（默认 True）
+            
+        Yields:
+            事件字典，格式为：
+            {"event": "analyst_start", "analyst": name}
+            {"event": "content", "analyst": name, "chunk": text}
+            {"event": "usage", "analyst": name, "finish_reason": reason, "usage": {...}, "cached": bool}
+            {"event": "analyst_end", "analyst": name}
+        """
+        if analysts is None:
+            analysts = ["market", "fundamentals"]
+        
+        selected = select_analysts(analysts)
+        
+        # 相同 (ticker, date, market, analysts) 的流式请求同时在途时只生成一次
+        key = (ticker, date, market, tuple(spec.key for spec in selected))
+        async for event in self._stream_flight.stream(
+            key,
+            lambda: self._analyze_events_selected(selected, ticker, date, market, concurrent)
+        ):
+            yield event
+    
+    async def _analyze_events_selected(
+        self,
+        selected: List[AnalystSpec],
+        ticker: str,
+        date: str,
+        market: str,
+        concurrent: bool
+    ) -> AsyncGenerator[Dict, None]:
+        """执行选中的流式分析师并输出事件"""
+        # 所有分析师共享同一份市场数据快照（数据源为阻塞 IO，放到线程池执行）
+        snapshot = await asyncio.to_thread(self.data_provider.get_snapshot, ticker, date, market)
+        
+        if not concurrent or len(selected) <= 1:
+            for spec in selected:
+                logger.info(f"📊 执行{spec.name}分析...")
+                yield {"event": "analyst_start", "analyst": spec.name}
+                async for event in self.runner.stream_events(spec, ticker, date, market, snapshot):
+                    yield _to_stream_event(spec.name, event)
+                yield {"event": "analyst_end", "analyst": spec.name}
+            return
+        
+        logger.info(f"📊 并发执行 {len(selected)} 个流式分析师...")
+        queue: asyncio.Queue = asyncio.Queue()
+        
+        async def pump(spec: AnalystSpec) -> None:
+            """将单个分析师的输出转换为事件放入共享队列"""
+            name = spec.name
+            try:
+                await queue.put({"event": "analyst_start", "analyst": name})
+                async for event in self.runner.stream_events(spec, ticker, date, market, snapshot):
+                    await queue.put(_to_stream_event(name, event))
+            except Exception as e:
+                logger.error(f"❌ [{name}] 流式分析失败: {e}")
+                await queue.put({"event": "content", "analyst": name, "chunk": f"{name}执行失败: {str(e)}"})
+            finally:
+                await queue.put({"event": "analyst_end", "analyst": name})
+        
+        tasks = [asyncio.create_task(pump(spec)) for spec in selected]
+        remaining = len(tasks)
+        try:
+            while remaining:
+                event = await queue.get()
+                if event["event"] == "analyst_end":
+                    remaining -= 1
+                yield event
+        finally:
+            # 客户端断开时取消仍在生成的分析师
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
@@ -0,0 +1,191 @@
+"""
+批量分析模块 - 在共享的 LLM 客户端、数据提供者和存储之上，以有限并发分析整个自选股列表
+"""
+
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import AsyncGenerator, Callable, Dict, List, Optional
+
+from .analyst import AnalystManager
+
+logger = logging.getLogger(__name__)
+
+
+def load_tickers_file(path: str) -> List[str]:
+    """
+    读取股票列表文件
+
+    每行一个股票代码，支持逗号分隔，忽略空行和 # 开头的注释，保持顺序去重。
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        股票代码列表
+    """
+    tickers = []
+    seen = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0]
+            for ticker in line.replace("，", ",").split(","):
+                ticker = ticker.strip()
+                if ticker and ticker not in seen:
+                    seen.add(ticker)
+                    tickers.append(ticker)
+    return tickers
+
+
+class BatchAnalyzer:
+    """
+    批量分析器
+
+    每只股票内部的分析师顺序执行，并发度由批量层统一控制，
+    避免与 AnalystManager 的线程池嵌套争抢。
+    """
+
+    def __init__(self, analyst_manager: AnalystManager, storage=None, max_concurrency: int = 4):
+        """
+        初始化批量分析器
+
+        Args:
+            analyst_manager: 分析师管理器（共享 LLM 客户端和数据提供者）
+            storage: 存储实例（可选，需提供 save_analysis_report）
+            max_concurrency: 同时分析的股票数量上限
+        """
+        self.analyst_manager = analyst_manager
+        self.storage = storage
+        self.max_concurrency = max(1, max_concurrency)
+
+    def analyze_one(
+        self,
+        ticker: str,
+        date: str,
+        market: str = "A股",
+        analysts: Optional[list] = None,
+        research_depth: int = 3
+    ) -> Dict:
+        """
+        分析单只股票并保存结果
+
+        Returns:
+            结果字典 {ticker, success, reports, saved, error, elapsed}
+        """
+        started = time.monotonic()
+        result = {"ticker": ticker, "success": False, "reports": {}, "saved": False, "error": None}
+        try:
+            outcome = self.analyst_manager.analyze_with_status(
+                ticker=ticker,
+                date=date,
+                market=market,
+                analysts=analysts,
+                parallel=False
+            )
+            result["reports"] = outcome.reports
+            if outcome.errors:
+                result["error"] = "; ".join(f"{name}: {error}" for name, error in outcome.errors.items())
+            # 所有分析师都失败时只有失败说明文本，不算成功，也不保存
+            result["success"] = not outcome.all_failed
+            if not result["success"]:
+                logger.error(f"❌ [批量分析] {ticker} 所有分析师均失败: {result['error']}")
+
+            # 只保存成功的分析师报告，失败说明文本不写入存储
+            reports = outcome.succeeded
+            if reports and self.storage is not None and getattr(self.storage, "accepts_writes", False):
+                result["saved"] = self.storage.save_analysis_report(
+                    stock_symbol=ticker,
+                    analysis_date=date,
+                    market=market,
+                    analysts=list(reports.keys()),
+                    reports=reports,
+                    research_depth=research_depth
+                )
+        except Exception as e:
+            logger.error(f"❌ [批量分析] {ticker} 分析失败: {e}")
+            result["error"] = str(e)
+
+        result["elapsed"] = round(time.monotonic() - started, 2)
+        return result
+
+    def run(
+        self,
+        tickers: List[str],
+        date: str,
+        market: str = "A股",
+        analysts: Optional[list] = None,
+        research_depth: int = 3,
+        progress_callback: Optional[Callable[[int, int, Dict], None]] = None
+    ) -> List[Dict]:
+        """
+        同步批量分析（用于命令行）
+
+        Args:
+            tickers: 股票代码列表
+            date: 分析日期
+            market: 市场类型
+            analysts: 分析师列表
+            research_depth: 研究深度
+            progress_callback: 每完成一只股票调用一次 (completed, total, result)
+
+        Returns:
+            按输入顺序排列的结果列表
+        """
+        total = len(tickers)
+        results: Dict[str, Dict] = {}
+        logger.info(f"🚀 [批量分析] 开始: {total} 只股票，并发 {self.max_concurrency}")
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="batch") as executor:
+            futures = {
+                executor.submit(self.analyze_one, ticker, date, market, analysts, research_depth): ticker
+                for ticker in tickers
+            }
+            for completed, future in enumerate(as_completed(futures), start=1):
+                result = future.result()
+                results[futures[future]] = result
+                logger.info(
+                    f"📈 [批量分析] {completed}/{total} {result['ticker']} "
+                    f"{'✅' if result['success'] else '❌'} ({result['elapsed']}s)"
+                )
+                if progress_callback:
+                    progress_callback(completed, total, result)
+
+        return [results[ticker] for ticker in tickers]
+
+    async def run_async(
+        self,
+        tickers: List[str],
+        date: str,
+        market: str = "A股",
+        analysts: Optional[list] = None,
+        research_depth: int = 3
+    ) -> AsyncGenerator[Dict, None]:
+        """
+        异步批量分析（用于 API），按完成顺序逐个输出结果
+
+        阻塞的分析调用放到线程池执行，并发度由信号量控制。
+
+        Yields:
+            结果字典，额外包含 completed/total 进度字段
+        """
+        total = len(tickers)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def worker(ticker: str) -> Dict:
+            async with semaphore:
+                return await asyncio.to_thread(
+                    self.analyze_one, ticker, date, market, analysts, research_depth
+                )
+
+        tasks = [asyncio.create_task(worker(ticker)) for ticker in tickers]
+        try:
+            for completed, task in enumerate(asyncio.as_completed(tasks), start=1):
+                result = await task
+                result["completed"] = completed
+                result["total"] = total
+                yield result
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
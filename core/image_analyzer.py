@@ -1,108 +1,232 @@
 """
 图片分析模块
+
+- 配置了多模态模型（DEEPSEEK_VISION_MODEL）时，图片以 image_url 消息发送给模型；否则退回文本描述
+- 发送前用 Pillow 把图片缩放到 IMAGE_MAX_SIDE 以内并重新压缩，避免上传数 MB 的 base64
+- 分析结果按图片内容哈希缓存（复用 LLM 响应缓存），重复上传同一张图表不再调用模型
 """
 
+import io
+import os
 import base64
-from pathlib import Path
-from typing import Optional
+import hashlib
+from typing import Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+_SYSTEM_PROMPT = "你是一位专业的股票分析师，擅长分析股票相关的图表和数据。"
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
 
 class ImageAnalyzer:
     """图片分析器"""
-    
-    def __init__(self, llm_client):
+
+    def __init__(self, llm_client, max_side: Optional[int] = None, jpeg_quality: Optional[int] = None):
         """
         初始化图片分析器
-        
+
         Args:
             llm_client: LLM 客户端实例
+            max_side: 发送前图片长边的上限，像素（默认读取 IMAGE_MAX_SIDE，否则为 1568）
+            jpeg_quality: 重新压缩为 JPEG 时的质量（默认读取 IMAGE_JPEG_QUALITY，否则为 85）
         """
         self.llm_client = llm_client
-    
+        self.max_side = max(64, max_side or _env_int("IMAGE_MAX_SIDE", 1568))
+        self.jpeg_quality = min(95, max(30, jpeg_quality or _env_int("IMAGE_JPEG_QUALITY", 85)))
+
     def analyze_image(self, image_path: str, prompt: str) -> str:
         """
         分析图片
-        
+
         Args:
             image_path: 图片路径
             prompt: 分析提示
-            
+
         Returns:
             分析结果
         """
         try:
-            # 读取图片并转换为 base64
-            image_base64 = self._image_to_base64(image_path)
-            
-            # 使用 LLM 分析图片
-            # 注意：这里需要 LLM 支持图片输入
-            # 简化版本：先读取图片信息，然后结合文本分析
-            analysis_prompt = f"""
-请分析以下图片内容，并结合股票分析需求进行解读：
+            with open(image_path, 'rb') as f:
+                raw = f.read()
 
-{prompt}
+            vision = bool(getattr(self.llm_client, "supports_vision", False))
+            cache = getattr(self.llm_client, "cache", None)
+            if vision:
+                result = self._cached(cache, self._cache_key(raw, prompt, vision=True))
+                if result is not None:
+                    return result
+                try:
+                    data, mime = self._prepare_image(raw)
+                    image_url = f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+                    result = self.llm_client.analyze_image(
+                        prompt=f"请分析这张图片，并结合股票分析需求进行解读：\n\n{prompt}",
+                        image_url=image_url,
+                        system_prompt=_SYSTEM_PROMPT
+                    )
+                    if cache is not None and result:
+                        cache.set(self._cache_key(raw, prompt, vision=True), result)
+                    return result
+                except Exception as e:
+                    # 退回结果不写入多模态的缓存键，避免一次临时错误在缓存有效期内固定为看不到图片的结果
+                    logger.warning(f"⚠️ 多模态图片分析失败，退回文本描述: {e}")
 
-图片路径: {image_path}
-"""
-            
-            # 如果 LLM 支持图片输入，可以在这里添加图片数据
-            # 当前简化版本仅使用文本描述
-            result = self.llm_client.analyze(
-                prompt=analysis_prompt,
-                system_prompt="你是一位专业的股票分析师，擅长分析股票相关的图表和数据。"
-            )
-            
+            text_key = self._cache_key(raw, prompt, vision=False)
+            result = self._cached(cache, text_key)
+            if result is not None:
+                return result
+            result = self._analyze_as_text(image_path, raw, prompt)
+            if cache is not None and result:
+                cache.set(text_key, result)
             return result
-            
+
         except Exception as e:
             logger.error(f"图片分析失败: {e}")
             return f"图片分析失败: {str(e)}"
-    
+
+    def _analyze_as_text(self, image_path: str, raw: bytes, prompt: str) -> str:
+        """模型不支持图片输入时，只把图片的基本信息作为文本发送"""
+        info = self._describe(raw)
+        analysis_prompt = f"""
+请分析以下图片内容，并结合股票分析需求进行解读：
+
+{prompt}
+
+图片路径: {image_path}
+图片信息: {info}
+"""
+        return self.llm_client.analyze(
+            prompt=analysis_prompt,
+            system_prompt=_SYSTEM_PROMPT
+        )
+
+    @staticmethod
+    def _cached(cache, key: str) -> Optional[str]:
+        if cache is None:
+            return None
+        cached = cache.get(key)
+        if cached is not None:
+            logger.info("⚡ 图片分析缓存命中")
+        return cached
+
+    def _cache_key(self, raw: bytes, prompt: str, vision: bool) -> str:
+        """图片内容哈希 + 提示 + 模型与预处理参数（参数变化后不会命中旧结果）"""
+        model = getattr(self.llm_client, "vision_model", None) if vision else getattr(self.llm_client, "model", None)
+        digest = hashlib.sha256(raw).hexdigest()
+        key = f"image|{digest}|{model}|{self.max_side}|{self.jpeg_quality}|{prompt}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _prepare_image(self, raw: bytes) -> Tuple[bytes, str]:
+        """
+        缩放并重新压缩图片
+
+        长边缩放到 max_side 以内；图表（线条、色块多）通常 PNG 更小更清晰，照片、截图通常 JPEG 更小，
+        两种编码都试一次取较小者。原图已在尺寸内且更小时直接使用原图。
+
+        Args:
+            raw: 原始图片数据
+
+        Returns:
+            (图片数据, MIME 类型)
+        """
+        from PIL import Image, ImageOps
+
+        with Image.open(io.BytesIO(raw)) as img:
+            original_format = img.format
+            original_size = img.size
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+
+            has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+            if img.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+                # CMYK、16 位灰度等模式先转为 RGB
+                img = img.convert("RGBA" if has_alpha else "RGB")
+            candidates = []
+
+            png = io.BytesIO()
+            img.save(png, format="PNG", optimize=True)
+            candidates.append((png.getvalue(), "image/png"))
+
+            rgb = img
+            if has_alpha:
+                # JPEG 不支持透明通道，铺白色背景
+                rgb = Image.new("RGB", img.size, (255, 255, 255))
+                rgb.paste(img.convert("RGBA"), mask=img.convert("RGBA").split()[-1])
+            elif img.mode != "RGB":
+                rgb = img.convert("RGB")
+            jpeg = io.BytesIO()
+            rgb.save(jpeg, format="JPEG", quality=self.jpeg_quality, optimize=True)
+            candidates.append((jpeg.getvalue(), "image/jpeg"))
+
+        data, mime = min(candidates, key=lambda c: len(c[0]))
+        if (
+            original_format in ("JPEG", "PNG")
+            and max(original_size) <= self.max_side
+            and len(raw) <= len(data)
+        ):
+            data, mime = raw, f"image/{original_format.lower()}"
+
+        logger.info(
+            f"🖼️ 图片预处理: {original_size[0]}x{original_size[1]} {len(raw) / 1024:.0f}KB -> "
+            f"{mime} {len(data) / 1024:.0f}KB"
+        )
+        return data, mime
+
     def _image_to_base64(self, image_path: str) -> str:
         """
-        将图片转换为 base64 编码
-        
+        将图片缩放、压缩后转换为 base64 编码
+
         Args:
             image_path: 图片路径
-            
+
         Returns:
             base64 编码的图片数据
         """
         try:
-            from PIL import Image
-            import io
-            
             with open(image_path, 'rb') as f:
-                image_data = f.read()
-                return base64.b64encode(image_data).decode('utf-8')
+                data, _ = self._prepare_image(f.read())
+            return base64.b64encode(data).decode('utf-8')
         except Exception as e:
             logger.warning(f"图片编码失败: {e}")
             return ""
-    
+
+    @staticmethod
+    def _describe(raw: bytes) -> str:
+        """图片格式、尺寸的文本描述"""
+        try:
+            from PIL import Image
+
+            with Image.open(io.BytesIO(raw)) as img:
+                return f"{img.format} {img.size[0]}x{img.size[1]} {img.mode}"
+        except Exception as e:
+            return f"无法读取（{e}）"
+
     def get_image_info(self, image_path: str) -> dict:
         """
         获取图片基本信息
-        
+
         Args:
             image_path: 图片路径
-            
+
         Returns:
             图片信息字典
         """
         try:
             from PIL import Image
-            
-            img = Image.open(image_path)
-            return {
-                'format': img.format,
-                'size': img.size,
-                'mode': img.mode,
-                'path': image_path
-            }
+
+            with Image.open(image_path) as img:
+                return {
+                    'format': img.format,
+                    'size': img.size,
+                    'mode': img.mode,
+                    'path': image_path
+                }
         except Exception as e:
             logger.error(f"获取图片信息失败: {e}")
             return {'error': str(e)}
-
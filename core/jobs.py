@@ -0,0 +1,312 @@
+"""
+后台任务模块 - 提交分析任务后立即返回任务 ID，由工作协程池异步执行
+
+任务状态和结果通过存储层持久化（存储可用时），同时在进程内保留一份，
+存储不可用时退化为纯进程内队列。多个进程共用同一个存储时，任务执行前先原子地认领
+（记录 owner 和租约 lease_until，执行期间定期续期），同一个任务只由一个进程执行。
+"""
+
+import os
+import uuid
+import socket
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class JobStatus:
+    """任务状态"""
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+    FINISHED = (COMPLETED, FAILED)
+
+
+class QueueFullError(Exception):
+    """任务队列已满"""
+
+
+class JobManager:
+    """
+    任务管理器
+
+    - submit: 创建任务并放入有界队列，立即返回任务
+    - 工作协程从队列取任务，在线程池中执行阻塞的 runner
+    - get / wait: 查询任务状态或等待状态变化
+    """
+
+    def __init__(
+        self,
+        runner: Callable[[Dict[str, Any]], Dict[str, Any]],
+        storage=None,
+        workers: int = 4,
+        queue_size: int = 1000,
+        retention: int = 1000,
+        lease_seconds: Optional[float] = None
+    ):
+        """
+        初始化任务管理器
+
+        Args:
+            runner: 任务执行函数（同步），接收任务参数，返回结果字典
+            storage: 存储实例（可选，需提供 save_job/get_job/get_unfinished_jobs/claim_job/renew_job）
+            workers: 工作协程数量，即同时执行的任务数
+            queue_size: 等待队列长度上限
+            retention: 进程内保留的任务数上限（超出后淘汰最早结束的任务）
+            lease_seconds: 任务租约时长，秒（默认读取 JOB_LEASE_SECONDS，否则为 300）；
+                执行中每隔三分之一租约续期一次，进程退出后租约过期的任务由其它进程接管
+        """
+        self.runner = runner
+        self.storage = storage
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.retention = retention
+
+        if lease_seconds is None:
+            try:
+                lease_seconds = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+            except ValueError:
+                lease_seconds = 300.0
+        self.lease_seconds = max(1.0, lease_seconds)
+        # 本进程的标识，写入认领的任务
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._events: Dict[str, asyncio.Event] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+
+    # ==================== 生命周期 ====================
+
+    async def start(self) -> None:
+        """启动工作协程，并恢复上次进程退出时未完成的任务"""
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.workers)
+        ]
+        await self._recover()
+        logger.info(f"✅ 后台任务队列已启动: workers={self.workers}, queue_size={self.queue_size}")
+
+    async def stop(self) -> None:
+        """停止工作协程（未完成的任务保留在存储中，下次启动时恢复）"""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    # ==================== 公共接口 ====================
+
+    async def submit(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        提交任务
+
+        Args:
+            params: 任务参数
+
+        Returns:
+            任务字典
+
+        Raises:
+            QueueFullError: 等待队列已满
+        """
+        if self._queue is None:
+            raise RuntimeError("JobManager 尚未启动")
+        if self._queue.full():
+            raise QueueFullError("任务队列已满，请稍后重试")
+
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": JobStatus.PENDING,
+            "params": params,
+            "result": None,
+            "error": None,
+            "created_at": datetime.now(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        self._remember(job)
+        await self._persist(job)
+        self._queue.put_nowait(job["job_id"])
+        logger.info(f"📥 任务已提交: {job['job_id']}")
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """查询任务，进程内不存在时从存储读取"""
+        job = self._jobs.get(job_id)
+        if job is None and self._storage_ready():
+            job = await asyncio.to_thread(self.storage.get_job, job_id)
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        等待任务状态变化（最长 timeout 秒）后返回任务
+
+        进程内的任务通过事件唤醒；其它进程提交的任务退化为按超时轮询存储。
+        """
+        event = self._events.get(job_id)
+        if event is not None:
+            try:
+                await asyncio.wait_for(event.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        else:
+            await asyncio.sleep(timeout)
+        return await self.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        """队列统计"""
+        counts = {status: 0 for status in (JobStatus.PENDING, JobStatus.RUNNING, JobStatus.COMPLETED, JobStatus.FAILED)}
+        for job in self._jobs.values():
+            counts[job["status"]] += 1
+        counts["queued"] = self._queue.qsize() if self._queue else 0
+        return counts
+
+    # ==================== 内部实现 ====================
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = self._jobs.get(job_id)
+                if job is None or job["status"] in JobStatus.FINISHED:
+                    continue
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ 任务工作协程 {index} 异常: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        job["status"] = JobStatus.RUNNING
+        job["started_at"] = datetime.now()
+        job["owner"] = self.owner
+        job["lease_until"] = self._lease_deadline()
+        heartbeat = None
+        if self._storage_ready():
+            # 认领失败说明其它进程已在执行，丢弃进程内的副本，查询时从存储读取最新状态
+            if not await self._claim(job):
+                logger.info(f"⏭️ 任务已由其它进程执行，跳过: {job['job_id']}")
+                self._forget(job["job_id"])
+                return
+            heartbeat = asyncio.create_task(self._heartbeat(job))
+        self._notify(job["job_id"])
+        logger.info(f"⚙️ 任务开始执行: {job['job_id']}")
+
+        try:
+            job["result"] = await asyncio.to_thread(self.runner, job["params"])
+            job["status"] = JobStatus.COMPLETED
+            logger.info(f"✅ 任务完成: {job['job_id']}")
+        except Exception as e:
+            job["error"] = str(e)
+            job["status"] = JobStatus.FAILED
+            logger.error(f"❌ 任务失败: {job['job_id']}: {e}")
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+
+        job["finished_at"] = datetime.now()
+        job["lease_until"] = None
+        await self._persist(job)
+        self._notify(job["job_id"])
+
+    async def _claim(self, job: Dict[str, Any]) -> bool:
+        try:
+            return await asyncio.to_thread(self.storage.claim_job, job)
+        except Exception as e:
+            logger.warning(f"⚠️ 认领任务失败: {job['job_id']}: {e}")
+            return False
+
+    async def _heartbeat(self, job: Dict[str, Any]) -> None:
+        """执行期间定期续期租约"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            job["lease_until"] = self._lease_deadline()
+            try:
+                renewed = await asyncio.to_thread(self.storage.renew_job, job)
+            except Exception as e:
+                renewed = False
+                logger.warning(f"⚠️ 任务租约续期异常: {job['job_id']}: {e}")
+            if not renewed:
+                logger.warning(f"⚠️ 任务租约续期失败（存储不可用或已被其它进程接管）: {job['job_id']}")
+
+    def _lease_deadline(self) -> datetime:
+        return datetime.now() + timedelta(seconds=self.lease_seconds)
+
+    async def _recover(self) -> None:
+        """
+        重新排队存储中未完成的任务
+
+        只排队 pending 和租约已过期的 running 任务（其它进程正在执行的任务不接管）；
+        执行前仍需认领，多个进程同时恢复同一个任务时只有一个会执行。
+        """
+        if not self._storage_ready():
+            return
+        try:
+            jobs = await asyncio.to_thread(self.storage.get_unfinished_jobs)
+        except Exception as e:
+            logger.warning(f"⚠️ 恢复未完成任务失败: {e}")
+            return
+
+        now = datetime.now()
+        recovered = 0
+        for job in jobs:
+            if self._queue.full():
+                break
+            if job["job_id"] in self._jobs:
+                continue
+            lease_until = job.get("lease_until")
+            if job["status"] == JobStatus.RUNNING and isinstance(lease_until, datetime) and lease_until >= now:
+                continue
+            job["status"] = JobStatus.PENDING
+            self._remember(job)
+            self._queue.put_nowait(job["job_id"])
+            recovered += 1
+        if recovered:
+            logger.info(f"♻️ 已恢复 {recovered} 个未完成任务")
+
+    def _remember(self, job: Dict[str, Any]) -> None:
+        self._jobs[job["job_id"]] = job
+        self._events.setdefault(job["job_id"], asyncio.Event())
+
+        # 淘汰最早结束的任务，未完成的任务始终保留
+        if len(self._jobs) > self.retention:
+            for job_id in list(self._jobs):
+                if len(self._jobs) <= self.retention:
+                    break
+                if self._jobs[job_id]["status"] in JobStatus.FINISHED:
+                    del self._jobs[job_id]
+                    self._events.pop(job_id, None)
+
+    def _forget(self, job_id: str) -> None:
+        """移除进程内的任务副本，并唤醒等待者"""
+        self._jobs.pop(job_id, None)
+        event = self._events.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    def _notify(self, job_id: str) -> None:
+        """唤醒等待者，并为下一次状态变化换一个新事件"""
+        event = self._events.get(job_id)
+        if event is not None:
+            event.set()
+            if self._jobs.get(job_id, {}).get("status") not in JobStatus.FINISHED:
+                self._events[job_id] = asyncio.Event()
+
+    def _storage_ready(self) -> bool:
+        return self.storage is not None and getattr(self.storage, "connected", False)
+
+    async def _persist(self, job: Dict[str, Any]) -> None:
+        if not self._storage_ready():
+            return
+        try:
+            await asyncio.to_thread(self.storage.save_job, job)
+        except Exception as e:
+            logger.warning(f"⚠️ 保存任务状态失败: {job['job_id']}: {e}")
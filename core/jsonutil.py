@@ -0,0 +1,38 @@
+"""
+JSON 编解码工具
+
+安装了 orjson 时使用 orjson（解析和序列化都快数倍），否则退回标准库 json。
+流式接口每个 token 都要解析一次上游 SSE 行、序列化一次下游 SSE 帧，这里是热点路径。
+"""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    orjson = None
+    HAS_ORJSON = False
+
+# 解析失败时抛出的异常（orjson.JSONDecodeError 是 json.JSONDecodeError 的子类）
+JSONDecodeError = json.JSONDecodeError
+
+
+def loads(data: Any) -> Any:
+    """解析 JSON（支持 str/bytes）"""
+    if HAS_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> str:
+    """序列化为紧凑的 JSON 字符串（非 ASCII 字符不转义）"""
+    if HAS_ORJSON:
+        return orjson.dumps(obj, default=str).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def sse_frame(obj: Any) -> str:
+    """序列化为一条 SSE 数据帧"""
+    return f"data: {dumps(obj)}\n\n"
@@ -0,0 +1,267 @@
+"""
+LLM 响应缓存模块
+
+按 (model, temperature, max_tokens, messages) 的哈希缓存模型回复（原始正文 + 结束原因），支持：
+- 内存 LRU（带 TTL 和容量上限）
+- 可选的 SQLite 磁盘层（进程重启后仍可命中）
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 缓存值格式版本，参与缓存键计算：格式变化后旧条目不再命中
+RESPONSE_FORMAT_VERSION = 2
+
+
+def make_cache_key(model: str, temperature: float, max_tokens: Optional[int], messages: List[dict]) -> str:
+    """
+    计算缓存键
+
+    Args:
+        model: 模型名称
+        temperature: 温度参数
+        max_tokens: 最大输出 token 数
+        messages: 消息列表
+
+    Returns:
+        SHA-256 十六进制字符串
+    """
+    payload = json.dumps(
+        {
+            "format": RESPONSE_FORMAT_VERSION,
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "messages": messages,
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def encode_response(text: str, finish_reason: Optional[str]) -> str:
+    """
+    把模型回复编码为缓存值
+
+    缓存保存未加工的正文和结束原因，同步调用和流式回放按同一份数据还原（截断提示由调用方统一追加）。
+    """
+    return json.dumps({"text": text, "finish_reason": finish_reason}, ensure_ascii=False)
+
+
+def decode_response(value: str) -> Tuple[str, Optional[str]]:
+    """
+    解码缓存值
+
+    Returns:
+        (正文, 结束原因)；无法解析的值按正常结束的纯文本处理
+    """
+    try:
+        data = json.loads(value)
+        return data["text"], data.get("finish_reason")
+    except (ValueError, TypeError, KeyError):
+        return value, "stop"
+
+
+class ResponseCache:
+    """响应缓存接口，自定义缓存实现 get/set 即可接入 DeepSeekClient"""
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class MemoryResponseCache(ResponseCache):
+    """内存 LRU 缓存，按条目数和总字符数双重限制容量"""
+
+    def __init__(self, ttl: float = 600.0, max_entries: int = 512, max_chars: int = 20_000_000):
+        """
+        Args:
+            ttl: 过期时间（秒）
+            max_entries: 最大条目数
+            max_chars: 所有缓存文本的总字符数上限
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self._data: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            stored_at, value = item
+            if time.time() - stored_at > self.ttl:
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        if len(value) > self.max_chars:
+            return
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.time(), value)
+            self._chars += len(value)
+            while len(self._data) > self.max_entries or self._chars > self.max_chars:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._chars = 0
+
+    def _remove(self, key: str) -> None:
+        _, value = self._data.pop(key)
+        self._chars -= len(value)
+
+
+class SQLiteResponseCache(ResponseCache):
+    """SQLite 磁盘缓存，过期条目在读取时或超出容量时清理"""
+
+    def __init__(self, path: str, ttl: float = 86400.0, max_entries: int = 50_000):
+        """
+        Args:
+            path: 数据库文件路径
+            ttl: 过期时间（秒）
+            max_entries: 最大条目数
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_stored_at ON llm_cache(stored_at)")
+            self._conn.commit()
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, stored_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, stored_at = row
+            if time.time() - stored_at > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, stored_at) VALUES (?, ?, ?)",
+                (key, value, time.time()),
+            )
+            self._writes += 1
+            # 每 100 次写入清理一次过期和超量条目
+            if self._writes % 100 == 0:
+                self._evict()
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        self._conn.execute("DELETE FROM llm_cache WHERE stored_at < ?", (time.time() - self.ttl,))
+        self._conn.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            "SELECT key FROM llm_cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TieredResponseCache(ResponseCache):
+    """内存 + 磁盘两级缓存，磁盘命中时回填内存"""
+
+    def __init__(self, memory: ResponseCache, disk: ResponseCache):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        self.memory.set(key, value)
+        self.disk.set(key, value)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        self.disk.clear()
+
+
+def create_response_cache_from_env() -> Optional[ResponseCache]:
+    """
+    根据环境变量创建响应缓存
+
+    - LLM_CACHE_ENABLED: 是否启用（默认 true）
+    - LLM_CACHE_TTL: 过期时间，秒（默认 600）
+    - LLM_CACHE_MAX_ENTRIES: 内存缓存条目上限（默认 512）
+    - LLM_CACHE_DB: SQLite 文件路径，设置后启用磁盘层
+
+    Returns:
+        缓存实例，未启用时返回 None
+    """
+    if os.getenv("LLM_CACHE_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+
+    try:
+        ttl = float(os.getenv("LLM_CACHE_TTL", "600"))
+    except ValueError:
+        ttl = 600.0
+    try:
+        max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+    except ValueError:
+        max_entries = 512
+
+    cache: ResponseCache = MemoryResponseCache(ttl=ttl, max_entries=max_entries)
+
+    db_path = os.getenv("LLM_CACHE_DB")
+    if db_path:
+        try:
+            cache = TieredResponseCache(cache, SQLiteResponseCache(db_path, ttl=ttl))
+        except Exception as e:
+            logger.warning(f"⚠️ LLM 磁盘缓存初始化失败，仅使用内存缓存: {e}")
+
+    return cache
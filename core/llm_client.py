@@ -4,16 +4,58 @@ DeepSeek LLM 客户端
 """
 
 import os
+import time
+import asyncio
 import logging
+import weakref
+import threading
+import importlib.util
 from typing import Optional, List, AsyncGenerator
 import httpx
 from dotenv import load_dotenv
 
+from . import jsonutil
+from .prompts import estimate_messages_tokens
+from .llm_cache import (
+    ResponseCache,
+    create_response_cache_from_env,
+    decode_response,
+    encode_response,
+    make_cache_key,
+)
+from .rate_limit import TokenBucket, RETRYABLE_STATUS_CODES, backoff_delay
+
 # 加载环境变量
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# 同步调用的输出因 max_tokens 被截断时追加到正文末尾的提示（流式调用通过 finish 事件的 finish_reason 体现）
+TRUNCATION_NOTICE = "\n\n> ⚠️ 输出达到长度上限（max_tokens={max_tokens}）被截断，内容可能不完整。"
+
+
+def _with_truncation_notice(text: str, finish_reason: Optional[str], max_tokens: Optional[int]) -> str:
+    """同步调用返回的正文：被截断时在末尾追加提示（新请求和缓存命中使用同一规则）"""
+    if finish_reason == "length":
+        return (text or "") + TRUNCATION_NOTICE.format(max_tokens=max_tokens)
+    return text
+
+
+def _env_float(name: str, default: float) -> float:
+    """读取浮点型环境变量，格式错误时使用默认值"""
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    """读取整型环境变量，格式错误时使用默认值"""
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
 
 class DeepSeekClient:
     """
@@ -21,8 +63,16 @@ class DeepSeekClient:
     使用 HTTP 直接调用 DeepSeek API（兼容 OpenAI Chat Completions 格式）
     """
     
-    def __init__(self) -> None:
-        """初始化客户端，从 .env 文件读取配置"""
+    # 缓存回放时每个文本块的字符数
+    CACHE_REPLAY_CHUNK_CHARS = 16
+    
+    def __init__(self, cache: Optional[ResponseCache] = None) -> None:
+        """
+        初始化客户端，从 .env 文件读取配置
+        
+        Args:
+            cache: 响应缓存（默认按 LLM_CACHE_* 环境变量创建，设置 LLM_CACHE_ENABLED=false 关闭）
+        """
         # 从环境变量读取配置
         self.api_key = os.getenv("DEEPSEEK_API_KEY")
         base_url = os.getenv("DEEPSEEK_BASE_URL")
@@ -60,38 +110,139 @@ class DeepSeekClient:
         self.base_url = base_url
         self.model_name = self.model
         
+        # 多模态模型：设置后图片以 image_url 消息发送给该模型，未设置时图片分析退回文本描述
+        self.vision_model = os.getenv("DEEPSEEK_VISION_MODEL", "").strip() or None
+        
+        # 响应缓存
+        self.cache = cache if cache is not None else create_response_cache_from_env()
+        
+        # 流式输出合并间隔（毫秒），0 表示逐块输出
+        self.stream_coalesce = max(0.0, _env_float("DEEPSEEK_STREAM_COALESCE_MS", 0.0)) / 1000.0
+        
+        # 重试配置
+        self.max_retries = max(0, _env_int("DEEPSEEK_MAX_RETRIES", 3))
+        self.backoff_base = _env_float("DEEPSEEK_BACKOFF_BASE", 1.0)
+        self.backoff_max = _env_float("DEEPSEEK_BACKOFF_MAX", 30.0)
+        
+        # 并发与速率限制：同时在途的请求数、每分钟 token 数（0 表示不限制）
+        self.max_concurrency = max(1, _env_int("DEEPSEEK_MAX_CONCURRENCY", 8))
+        self._sync_semaphore = threading.BoundedSemaphore(self.max_concurrency)
+        # asyncio.Semaphore 绑定事件循环，按循环在首次异步调用时创建（run_async 与 FastAPI 可能使用不同的循环）
+        self._async_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        self._async_semaphores_lock = threading.Lock()
+        tokens_per_minute = _env_int("DEEPSEEK_TOKENS_PER_MINUTE", 0)
+        self._token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        
+        # 连接池与超时：连接超时短、读取超时长（LLM 生成耗时较长）
+        timeout = httpx.Timeout(
+            connect=_env_float("DEEPSEEK_CONNECT_TIMEOUT", 10.0),
+            read=_env_float("DEEPSEEK_READ_TIMEOUT", 120.0),
+            write=30.0,
+            pool=_env_float("DEEPSEEK_POOL_TIMEOUT", 30.0),
+        )
+        limits = httpx.Limits(
+            max_connections=_env_int("DEEPSEEK_MAX_CONNECTIONS", 32),
+            max_keepalive_connections=_env_int("DEEPSEEK_MAX_KEEPALIVE", 16),
+            keepalive_expiry=60.0,
+        )
+        # HTTP/2 需要安装 h2，未安装时退回 HTTP/1.1
+        http2 = (
+            os.getenv("DEEPSEEK_HTTP2", "true").lower() in ("1", "true", "yes")
+            and importlib.util.find_spec("h2") is not None
+        )
+        
         # 创建同步 HTTP 客户端
         self._client = httpx.Client(
             base_url=self.base_url,
-            timeout=60.0,
+            timeout=timeout,
+            limits=limits,
+            http2=http2,
         )
         
         # 创建异步 HTTP 客户端（用于流式调用）
         self._async_client = httpx.AsyncClient(
             base_url=self.base_url,
-            timeout=60.0,
+            timeout=timeout,
+            limits=limits,
+            http2=http2,
         )
         
-        logger.info(f"✅ DeepSeek 客户端初始化完成: model={self.model}, base_url={self.base_url}")
+        logger.info(
+            f"✅ DeepSeek 客户端初始化完成: model={self.model}, base_url={self.base_url}, "
+            f"http2={http2}, max_concurrency={self.max_concurrency}, max_retries={self.max_retries}"
+        )
+    
+    def _resolve_max_tokens(self, max_tokens: Optional[int]) -> Optional[int]:
+        """
+        确定本次请求的输出上限：调用方（分析师预算）指定的值，
+        DEEPSEEK_MAX_TOKENS 作为全局上限；都未设置时不传，使用服务端默认值
+        """
+        if max_tokens is None:
+            return self.max_tokens
+        if self.max_tokens is None:
+            return max_tokens
+        return min(max_tokens, self.max_tokens)
+    
+    def _async_semaphore(self) -> asyncio.Semaphore:
+        """当前事件循环的并发信号量（必须在协程中调用）"""
+        loop = asyncio.get_running_loop()
+        with self._async_semaphores_lock:
+            semaphore = self._async_semaphores.get(loop)
+            if semaphore is None:
+                semaphore = self._async_semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+            return semaphore
+    
+    def _estimate_request_tokens(self, messages: List[dict], max_tokens: Optional[int] = None) -> int:
+        """估算一次请求消耗的 token 数（输入 + 输出上限），用于速率限制"""
+        return estimate_messages_tokens(messages) + (max_tokens or 1024)
+    
+    def _post_with_retry(self, headers: dict, payload: dict) -> httpx.Response:
+        """
+        发送同步请求，对网络错误和可重试状态码进行指数退避重试
+        
+        Returns:
+            最后一次请求的响应（可能为非 200）
+        """
+        for attempt in range(self.max_retries + 1):
+            if self._token_bucket is not None:
+                wait = self._token_bucket.reserve(self._estimate_request_tokens(payload["messages"], payload.get("max_tokens")))
+                if wait > 0:
+                    time.sleep(wait)
+            
+            with self._sync_semaphore:
+                try:
+                    response = self._client.post("/chat/completions", headers=headers, json=payload)
+                except httpx.TransportError as e:
+                    if attempt >= self.max_retries:
+                        raise
+                    delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                    logger.warning(f"⚠️ LLM 请求网络错误，{delay:.1f}s 后重试 ({attempt + 1}/{self.max_retries}): {e}")
+                else:
+                    if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+                        return response
+                    delay = backoff_delay(attempt, self.backoff_base, self.backoff_max, response)
+                    logger.warning(
+                        f"⚠️ LLM 请求返回 {response.status_code}，{delay:.1f}s 后重试 "
+                        f"({attempt + 1}/{self.max_retries})"
+                    )
+            
+            time.sleep(delay)
     
-    def _chat(self, messages: List[dict]) -> str:
+    def _chat(self, messages: List[dict], max_tokens: Optional[int] = None, model: Optional[str] = None) -> str:
         """
         内部方法：调用 Chat Completions API
         
         Args:
             messages: 消息列表，格式为 [{"role": "system", "content": "..."}, ...]
+            max_tokens: 输出 token 上限（可选）
+            model: 本次请求使用的模型（默认 DEEPSEEK_MODEL）
             
         Returns:
             模型响应文本
         """
+        model = model or self.model
         if not self.api_key:
             return "LLM 未配置（缺少 DEEPSEEK_API_KEY 环境变量），当前为占位回复。"
-        print(f"api_key: {self.api_key}")
-        print(f"model: {self.model}")
-        print(f"temperature: {self.temperature}")
-        print(f"max_tokens: {self.max_tokens}")
-        print(f"messages: {messages}")
-        print(f"base_url: {self.base_url}")
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
@@ -99,34 +250,40 @@ class DeepSeekClient:
 
 
         payload = {
-            "model": self.model,
+            "model": model,
             "messages": messages,
-            # "messages": messages,
             "temperature": self.temperature,
-            "max_tokens": 4096,
         }
-        print(f"payload: {payload},headers: {headers}")
         # 如果设置了 max_tokens，添加到 payload
-        if self.max_tokens is not None:
-            payload["max_tokens"] = self.max_tokens
+        max_tokens = self._resolve_max_tokens(max_tokens)
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+        
+        # 相同模型参数和消息的请求直接返回缓存结果
+        cache_key = make_cache_key(model, self.temperature, max_tokens, messages)
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info("⚡ LLM 响应缓存命中")
+                text, finish_reason = decode_response(cached)
+                return _with_truncation_notice(text, finish_reason, max_tokens)
 
         try:
             # 调用 /v1/chat/completions 端点
-            response = self._client.post("/chat/completions", headers=headers, json=payload)
+            response = self._post_with_retry(headers, payload)
             
             # 检查 HTTP 状态码
             if response.status_code != 200:
                 error_detail = response.text
                 logger.error(
                     f"LLM API 调用失败: status={response.status_code}, "
-                    f"model={self.model}, "
+                    f"model={model}, "
                     f"error={error_detail}"
                 )
-                print(f"error_detail: {error_detail}")
                 # 检查是否是模型不存在的错误
                 if response.status_code == 404 or "model" in error_detail.lower() or "not found" in error_detail.lower():
                     raise ValueError(
-                        f"模型 '{self.model}' 不存在或没有访问权限。\n"
+                        f"模型 '{model}' 不存在或没有访问权限。\n"
                         f"请检查：\n"
                         f"1. 模型名称是否正确（可用模型：deepseek-chat, deepseek-coder, deepseek-reasoner）\n"
                         f"2. 你的 API Key 是否有权限访问该模型\n"
@@ -139,7 +296,7 @@ class DeepSeekClient:
                     f"请检查 API Key 和模型名称是否正确。错误详情: {error_detail[:200]}"
                 )
             
-            data = response.json()
+            data = jsonutil.loads(response.content)
             
             # 检查返回数据格式
             if "choices" not in data or not data["choices"]:
@@ -147,8 +304,16 @@ class DeepSeekClient:
                 raise ValueError("LLM API 返回数据格式异常，请检查 API 响应。")
             
             # 按照官方返回格式，从 choices[0].message.content 中读取回复
-            content = data["choices"][0]["message"]["content"]
-            return content
+            choice = data["choices"][0]
+            content = choice["message"]["content"]
+            finish_reason = choice.get("finish_reason")
+            # 缓存原始正文和结束原因，与流式调用写入的缓存格式相同
+            if self.cache is not None and content:
+                self.cache.set(cache_key, encode_response(content, finish_reason))
+            if finish_reason == "length":
+                # 同步调用没有结束事件，在正文末尾注明被截断
+                logger.warning(f"⚠️ LLM 输出达到 max_tokens={max_tokens} 上限被截断")
+            return _with_truncation_notice(content, finish_reason, max_tokens)
             
         except httpx.TimeoutException:
             logger.error("LLM API 调用超时")
@@ -166,18 +331,39 @@ class DeepSeekClient:
             logger.error(f"LLM API 调用发生未知错误: {e}", exc_info=True)
             raise ValueError(f"LLM API 调用发生错误: {str(e)}。请查看日志获取详细信息。")
     
-    async def _chat_stream(self, messages: List[dict]) -> AsyncGenerator[str, None]:
+    async def _chat_stream(self, messages: List[dict], max_tokens: Optional[int] = None) -> AsyncGenerator[str, None]:
         """
         内部方法：调用 Chat Completions API 流式版本
         
         Args:
             messages: 消息列表，格式为 [{"role": "system", "content": "..."}, ...]
+            max_tokens: 输出 token 上限（可选）
             
         Yields:
             模型响应的文本块
         """
+        async for event in self._chat_stream_events(messages, max_tokens):
+            if event["type"] == "content":
+                yield event["text"]
+    
+    async def _chat_stream_events(
+        self,
+        messages: List[dict],
+        max_tokens: Optional[int] = None
+    ) -> AsyncGenerator[dict, None]:
+        """
+        内部方法：调用 Chat Completions API 流式版本，输出结构化事件
+        
+        Args:
+            messages: 消息列表，格式为 [{"role": "system", "content": "..."}, ...]
+            max_tokens: 输出 token 上限（可选）
+            
+        Yields:
+            {"type": "content", "text": 文本块}
+            {"type": "finish", "finish_reason": 结束原因, "usage": token 用量（可能为 None）, "cached": 是否缓存回放}
+        """
         if not self.api_key:
-            yield "LLM 未配置（缺少 DEEPSEEK_API_KEY 环境变量），当前为占位回复。"
+            yield {"type": "content", "text": "LLM 未配置（缺少 DEEPSEEK_API_KEY 环境变量），当前为占位回复。"}
             return
         
         headers = {
@@ -190,55 +376,138 @@ class DeepSeekClient:
             "messages": messages,
             "temperature": self.temperature,
             "stream": True,  # 启用流式输出
+            "stream_options": {"include_usage": True},  # 最后一个数据块附带 token 用量
         }
         
         # 如果设置了 max_tokens，添加到 payload
-        if self.max_tokens is not None:
-            payload["max_tokens"] = self.max_tokens
+        max_tokens = self._resolve_max_tokens(max_tokens)
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+        
+        # 缓存命中时按小块回放，调用方仍以流式方式接收
+        cache_key = make_cache_key(self.model, self.temperature, max_tokens, messages)
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info("⚡ LLM 响应缓存命中（流式回放）")
+                text, finish_reason = decode_response(cached)
+                for i in range(0, len(text), self.CACHE_REPLAY_CHUNK_CHARS):
+                    yield {"type": "content", "text": text[i:i + self.CACHE_REPLAY_CHUNK_CHARS]}
+                    await asyncio.sleep(0)
+                # 按原始响应的结束原因回放（被截断的响应仍报告 length）
+                yield {"type": "finish", "finish_reason": finish_reason, "usage": None, "cached": True}
+                return
+        
+        collected = []
+        completed = False
+        finish_reason = None
+        usage = None
+        # 合并输出：缓冲区中的文本在距上次输出超过 stream_coalesce 秒时一起输出
+        pending = []
+        last_flush = time.monotonic()
 
         try:
-            # 使用流式请求
-            async with self._async_client.stream(
-                "POST",
-                "/chat/completions",
-                headers=headers,
-                json=payload
-            ) as response:
-                if response.status_code != 200:
-                    error_detail = await response.atext()
-                    logger.error(
-                        f"LLM API 调用失败: status={response.status_code}, "
-                        f"model={self.model}, "
-                        f"error={error_detail}"
-                    )
-                    
-                    if response.status_code == 404 or "model" in error_detail.lower():
-                        raise ValueError(
-                            f"模型 '{self.model}' 不存在或没有访问权限。"
+            for attempt in range(self.max_retries + 1):
+                if self._token_bucket is not None:
+                    wait = self._token_bucket.reserve(self._estimate_request_tokens(messages, max_tokens))
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                
+                retry_delay = None
+                async with self._async_semaphore():
+                    try:
+                        # 使用流式请求
+                        async with self._async_client.stream(
+                            "POST",
+                            "/chat/completions",
+                            headers=headers,
+                            json=payload
+                        ) as response:
+                            if response.status_code in RETRYABLE_STATUS_CODES and attempt < self.max_retries:
+                                await response.aread()
+                                retry_delay = backoff_delay(attempt, self.backoff_base, self.backoff_max, response)
+                                logger.warning(
+                                    f"⚠️ LLM 流式请求返回 {response.status_code}，{retry_delay:.1f}s 后重试 "
+                                    f"({attempt + 1}/{self.max_retries})"
+                                )
+                            elif response.status_code != 200:
+                                error_detail = (await response.aread()).decode("utf-8", errors="replace")
+                                logger.error(
+                                    f"LLM API 调用失败: status={response.status_code}, "
+                                    f"model={self.model}, "
+                                    f"error={error_detail}"
+                                )
+                                
+                                if response.status_code == 404 or "model" in error_detail.lower():
+                                    raise ValueError(
+                                        f"模型 '{self.model}' 不存在或没有访问权限。"
+                                    )
+                                
+                                raise ValueError(
+                                    f"LLM API 调用失败（状态码: {response.status_code}）。"
+                                )
+                            else:
+                                # 处理流式响应
+                                async for line in response.aiter_lines():
+                                    if not line.startswith("data: "):
+                                        continue
+                                    data_str = line[6:].strip()
+                                    if data_str == "[DONE]":
+                                        completed = True
+                                        break
+                                    
+                                    try:
+                                        data = jsonutil.loads(data_str)
+                                    except jsonutil.JSONDecodeError:
+                                        continue
+                                    
+                                    if data.get("usage"):
+                                        usage = data["usage"]
+                                    choices = data.get("choices")
+                                    if not choices:
+                                        continue
+                                    choice = choices[0]
+                                    if choice.get("finish_reason"):
+                                        finish_reason = choice["finish_reason"]
+                                    content = (choice.get("delta") or {}).get("content")
+                                    if not content:
+                                        continue
+                                    
+                                    collected.append(content)
+                                    if not self.stream_coalesce:
+                                        yield {"type": "content", "text": content}
+                                        continue
+                                    pending.append(content)
+                                    now = time.monotonic()
+                                    if now - last_flush >= self.stream_coalesce:
+                                        yield {"type": "content", "text": "".join(pending)}
+                                        pending.clear()
+                                        last_flush = now
+                    except httpx.TransportError as e:
+                        # 已经输出过内容时无法透明重试，直接抛出
+                        if collected or attempt >= self.max_retries:
+                            raise
+                        retry_delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                        logger.warning(
+                            f"⚠️ LLM 流式请求网络错误，{retry_delay:.1f}s 后重试 "
+                            f"({attempt + 1}/{self.max_retries}): {e}"
                         )
-                    
-                    raise ValueError(
-                        f"LLM API 调用失败（状态码: {response.status_code}）。"
-                    )
                 
-                # 处理流式响应
-                async for line in response.aiter_lines():
-                    if line.startswith("data: "):
-                        data_str = line[6:].strip()
-                        if data_str == "[DONE]":
-                            break
-                        
-                        try:
-                            import json
-                            data = json.loads(data_str)
-                            
-                            if "choices" in data and data["choices"]:
-                                delta = data["choices"][0].get("delta", {})
-                                content = delta.get("content", "")
-                                if content:
-                                    yield content
-                        except (json.JSONDecodeError, KeyError, IndexError):
-                            continue
+                if retry_delay is None:
+                    break
+                await asyncio.sleep(retry_delay)
+            
+            if pending:
+                yield {"type": "content", "text": "".join(pending)}
+            
+            # 只缓存完整结束的响应，中途断开的不缓存
+            if completed and collected and self.cache is not None:
+                self.cache.set(cache_key, encode_response("".join(collected), finish_reason))
+            
+            if completed:
+                if finish_reason == "length":
+                    logger.warning(f"⚠️ LLM 输出达到 max_tokens={max_tokens} 上限被截断")
+                yield {"type": "finish", "finish_reason": finish_reason, "usage": usage, "cached": False}
                             
         except httpx.TimeoutException:
             logger.error("LLM API 调用超时")
@@ -252,13 +521,19 @@ class DeepSeekClient:
             logger.error(f"LLM API 流式调用发生错误: {e}", exc_info=True)
             raise ValueError(f"LLM API 流式调用发生错误: {str(e)}")
     
-    def analyze_stream(self, prompt: str, system_prompt: Optional[str] = None) -> AsyncGenerator[str, None]:
+    def analyze_stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> AsyncGenerator[str, None]:
         """
         流式分析文本
         
         Args:
             prompt: 用户提示
             system_prompt: 系统提示（可选）
+            max_tokens: 输出 token 上限（可选）
             
         Yields:
             分析结果的文本块
@@ -268,7 +543,31 @@ class DeepSeekClient:
             messages.append({"role": "system", "content": system_prompt})
         messages.append({"role": "user", "content": prompt})
         
-        return self._chat_stream(messages)
+        return self._chat_stream(messages, max_tokens)
+    
+    def analyze_stream_events(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> AsyncGenerator[dict, None]:
+        """
+        流式分析文本，除文本块外还输出结束原因和 token 用量
+        
+        Args:
+            prompt: 用户提示
+            system_prompt: 系统提示（可选）
+            max_tokens: 输出 token 上限（可选）
+            
+        Yields:
+            {"type": "content", "text": ...} 或 {"type": "finish", "finish_reason": ..., "usage": ..., "cached": ...}
+        """
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        
+        return self._chat_stream_events(messages, max_tokens)
     
     def invoke(self, messages: List[dict]) -> str:
         """
@@ -282,13 +581,14 @@ class DeepSeekClient:
         """
         return self._chat(messages)
     
-    def analyze(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+    def analyze(self, prompt: str, system_prompt: Optional[str] = None, max_tokens: Optional[int] = None) -> str:
         """
         分析文本
         
         Args:
             prompt: 用户提示
             system_prompt: 系统提示（可选）
+            max_tokens: 输出 token 上限（可选）
             
         Returns:
             分析结果
@@ -298,7 +598,49 @@ class DeepSeekClient:
             messages.append({"role": "system", "content": system_prompt})
         messages.append({"role": "user", "content": prompt})
         
-        return self._chat(messages)
+        return self._chat(messages, max_tokens)
+    
+    @property
+    def supports_vision(self) -> bool:
+        """是否配置了可接收图片输入的模型"""
+        return self.vision_model is not None
+    
+    def analyze_image(
+        self,
+        prompt: str,
+        image_url: str,
+        system_prompt: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> str:
+        """
+        分析图片（OpenAI 兼容的多模态消息格式）
+        
+        Args:
+            prompt: 用户提示
+            image_url: 图片 URL 或 data URL（data:image/jpeg;base64,...）
+            system_prompt: 系统提示（可选）
+            max_tokens: 输出 token 上限（可选）
+            
+        Returns:
+            分析结果
+            
+        Raises:
+            ValueError: 未配置多模态模型（DEEPSEEK_VISION_MODEL）或调用失败
+        """
+        if not self.supports_vision:
+            raise ValueError("未配置多模态模型，请在 .env 文件中设置 DEEPSEEK_VISION_MODEL")
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({
+            "role": "user",
+            "content": [
+                {"type": "text", "text": prompt},
+                {"type": "image_url", "image_url": {"url": image_url}},
+            ],
+        })
+        
+        return self._chat(messages, max_tokens, model=self.vision_model)
     
     def close(self) -> None:
         """关闭 HTTP 客户端"""
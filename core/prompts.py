@@ -0,0 +1,208 @@
+"""
+提示词构建模块
+
+- 分析师提示词模板：同步与流式分析师共用同一份模板
+- 系统提示词不含任何请求数据（股票信息只在用户消息中出现一次），相同分析师的请求前缀一致
+- token 估算与按预算确定性裁剪：超出输入预算时按优先级从低到高、从段落末尾逐行删除
+"""
+
+import os
+import re
+import math
+import logging
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    # 仅用于类型标注，避免 LLM 客户端引用 token 估算时加载数据层
+    from data.stock_data import MarketSnapshot
+
+logger = logging.getLogger(__name__)
+
+# 中文字符、全角标点约 0.6 token/字，其余字符约 0.3 token/字（DeepSeek 官方换算）
+_CJK_PATTERN = re.compile(r"[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]")
+_CJK_TOKENS_PER_CHAR = 0.6
+_OTHER_TOKENS_PER_CHAR = 0.3
+# 每条消息的格式开销
+_MESSAGE_OVERHEAD_TOKENS = 4
+# 多模态消息中每张图片按此估算（缩放到 1568px 以内的图片约 1000~1600 token）
+_IMAGE_TOKENS = 1600
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的 token 数
+
+    Args:
+        text: 文本
+
+    Returns:
+        估算的 token 数（向上取整）
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    return math.ceil(cjk * _CJK_TOKENS_PER_CHAR + (len(text) - cjk) * _OTHER_TOKENS_PER_CHAR)
+
+
+def _estimate_content_tokens(content) -> int:
+    """估算单条消息内容的 token 数；多模态内容中的图片按固定值计算，不按 base64 长度"""
+    if isinstance(content, list):
+        return sum(
+            _IMAGE_TOKENS if part.get("type") == "image_url" else estimate_tokens(str(part.get("text", "")))
+            for part in content
+        )
+    return estimate_tokens(str(content or ""))
+
+
+def estimate_messages_tokens(messages: List[dict]) -> int:
+    """估算消息列表的输入 token 数"""
+    return sum(_estimate_content_tokens(m.get("content", "")) + _MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+@dataclass(frozen=True)
+class AnalystPrompt:
+    """分析师提示词模板"""
+    name: str
+    system: str
+    instruction: str
+    # 用户消息中包含的快照字段，按顺序排列；越靠后的字段在超出预算时越先被裁剪
+    sections: Tuple[str, ...]
+    max_input_tokens: int = 3000
+    max_output_tokens: int = 2048
+
+
+@dataclass
+class BuiltPrompt:
+    """构建好的提示词"""
+    system: str
+    user: str
+    max_tokens: int
+    input_tokens: int
+    trimmed: bool = False
+
+
+# 快照字段在用户消息中的标题
+_SECTION_TITLES = {
+    "market_data": "市场数据：",
+    "indicators": "",
+}
+
+MARKET_PROMPT = AnalystPrompt(
+    name="市场分析师",
+    system="""你是一位专业的股票技术分析师，擅长分析股票的市场表现和技术指标。
+
+请基于用户提供的市场数据和本地预先计算好的技术指标，进行详细的技术分析（无需自行重复计算指标），包括：
+1. 价格趋势分析
+2. 技术指标分析（如移动平均线、MACD、RSI等）
+3. 成交量分析
+4. 投资建议（买入/持有/卖出）
+
+使用中文撰写报告，确保分析专业且详细。""",
+    instruction="请提供详细的技术分析报告，包括价格趋势、技术指标、成交量分析和投资建议。",
+    sections=("market_data", "indicators"),
+)
+
+FUNDAMENTALS_PROMPT = AnalystPrompt(
+    name="基本面分析师",
+    system="""你是一位专业的股票基本面分析师，擅长分析公司的财务状况和估值。
+
+请基于用户提供的市场数据，进行详细的基本面分析，包括：
+1. 公司基本信息分析
+2. 财务状况评估
+3. 盈利能力分析
+4. 估值分析（PE、PB、PEG等）
+5. 投资建议（买入/持有/卖出）
+
+使用中文撰写报告，确保分析专业且详细。如果数据不足，请说明并基于现有数据进行分析。""",
+    instruction="请提供详细的基本面分析报告，包括财务状况、估值指标和投资建议。",
+    sections=("market_data",),
+)
+
+
+def _input_budget(template: AnalystPrompt) -> int:
+    """输入预算：环境变量 PROMPT_MAX_INPUT_TOKENS 可统一覆盖模板默认值"""
+    try:
+        return int(os.getenv("PROMPT_MAX_INPUT_TOKENS", str(template.max_input_tokens)))
+    except ValueError:
+        return template.max_input_tokens
+
+
+def _section_lines(text: str, seen: set) -> List[str]:
+    """拆分为非空行，去掉已在前面出现过的行（如股票代码）"""
+    lines = []
+    for line in (text or "").strip().splitlines():
+        key = line.strip()
+        if key and key not in seen:
+            seen.add(key)
+            lines.append(line.rstrip())
+    return lines
+
+
+def build_prompt(
+    template: AnalystPrompt,
+    snapshot: "MarketSnapshot",
+    date: str,
+    max_input_tokens: Optional[int] = None
+) -> BuiltPrompt:
+    """
+    根据模板和市场快照构建提示词
+
+    Args:
+        template: 分析师提示词模板
+        snapshot: 市场数据快照
+        date: 分析日期
+        max_input_tokens: 输入 token 预算（默认使用模板/环境变量）
+
+    Returns:
+        构建好的提示词
+    """
+    budget = max_input_tokens if max_input_tokens is not None else _input_budget(template)
+    market_info = snapshot.market_info
+
+    seen: set = set()
+    header = _section_lines(snapshot.stock_info, seen)
+    header.append(f"分析日期：{date}")
+    header.append(f"计价货币：{market_info['currency_name']}（{market_info['currency_symbol']}）")
+
+    sections = [
+        (_SECTION_TITLES.get(field, ""), _section_lines(getattr(snapshot, field, ""), seen))
+        for field in template.sections
+    ]
+
+    def render() -> str:
+        parts = ["分析对象：\n" + "\n".join(header)]
+        for title, lines in sections:
+            if lines:
+                parts.append("\n".join(([title] if title else []) + lines))
+        parts.append(template.instruction)
+        return "\n\n".join(parts)
+
+    def measure(user: str) -> int:
+        return estimate_messages_tokens([
+            {"role": "system", "content": template.system},
+            {"role": "user", "content": user},
+        ])
+
+    user = render()
+    input_tokens = measure(user)
+    trimmed = False
+
+    # 从最后一个字段的末尾开始逐行删除，直到满足预算（分析对象和指令始终保留）
+    for _, lines in reversed(sections):
+        while lines and input_tokens > budget:
+            lines.pop()
+            trimmed = True
+            user = render()
+            input_tokens = measure(user)
+
+    if trimmed:
+        logger.info(f"✂️ [{template.name}] 提示词超出输入预算 {budget}，已裁剪至约 {input_tokens} tokens")
+
+    return BuiltPrompt(
+        system=template.system,
+        user=user,
+        max_tokens=template.max_output_tokens,
+        input_tokens=input_tokens,
+        trimmed=trimmed,
+    )
@@ -0,0 +1,75 @@
+"""
+LLM 请求限流与重试工具
+"""
+
+import time
+import random
+import threading
+from typing import Optional
+
+import httpx
+
+# 可重试的 HTTP 状态码：超时、限流、服务端临时错误
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    令牌桶限流器（线程安全）
+
+    容量为每分钟允许的 token 数，按秒匀速补充。acquire 采用预占方式：
+    立即扣减令牌（可以为负），返回调用方需要等待的秒数，等待在锁外进行。
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: int) -> float:
+        """
+        预占令牌
+
+        Args:
+            amount: 需要的 token 数（超过容量时按容量计）
+
+        Returns:
+            需要等待的秒数
+        """
+        amount = min(float(amount), self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+def backoff_delay(attempt: int, base: float, maximum: float, response: Optional[httpx.Response] = None) -> float:
+    """
+    计算第 attempt 次重试前的等待时间
+
+    优先使用服务端返回的 Retry-After，否则使用带完全抖动的指数退避：
+    random(0, min(maximum, base * 2 ** attempt))
+
+    Args:
+        attempt: 已失败次数（从 0 开始）
+        base: 基础等待秒数
+        maximum: 最大等待秒数
+        response: 失败的响应（可选）
+
+    Returns:
+        等待秒数
+    """
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return min(maximum, max(0.0, float(retry_after)))
+            except ValueError:
+                pass
+    return random.uniform(0, min(maximum, base * (2 ** attempt)))
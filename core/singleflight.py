@@ -0,0 +1,162 @@
+"""
+请求合并模块（single-flight）
+
+相同 key 的请求同时在途时，只有第一个真正执行，其余请求等待并共享同一份结果；
+流式版本把同一串事件按顺序广播给所有订阅者，后加入的订阅者会先收到已产生的事件。
+"""
+
+import asyncio
+import threading
+import logging
+from typing import Any, AsyncGenerator, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """一次在途的同步调用"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """同步请求合并（线程安全）"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        执行 fn，若相同 key 的调用正在进行则等待其结果
+
+        Args:
+            key: 请求标识
+            fn: 实际执行的函数
+
+        Returns:
+            fn 的返回值（所有合并的调用方拿到同一个对象）
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            logger.info(f"🔗 合并进行中的相同请求: {key}")
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+
+class _StreamFlight:
+    """一次在途的流式调用"""
+
+    def __init__(self):
+        self.events: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.condition = asyncio.Condition()
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+
+
+class StreamSingleFlight:
+    """
+    流式请求合并
+
+    第一个订阅者触发生产任务，生产任务把事件追加到共享缓冲区；每个订阅者维护自己的读取位置。
+    所有订阅者都断开时取消生产任务。
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _StreamFlight] = {}
+
+    async def stream(
+        self,
+        key: Hashable,
+        factory: Callable[[], AsyncGenerator[Any, None]]
+    ) -> AsyncGenerator[Any, None]:
+        """
+        订阅 key 对应的事件流，必要时通过 factory 创建
+
+        Args:
+            key: 请求标识
+            factory: 创建底层异步生成器的函数
+
+        Yields:
+            底层生成器产生的事件（从第一个事件开始）
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _StreamFlight()
+            flight.task = asyncio.create_task(self._produce(key, flight, factory))
+        else:
+            logger.info(f"🔗 合并进行中的相同流式请求: {key}")
+
+        flight.subscribers += 1
+        index = 0
+        try:
+            while True:
+                async with flight.condition:
+                    while index >= len(flight.events) and not flight.done:
+                        await flight.condition.wait()
+                    pending = flight.events[index:]
+                    index += len(pending)
+                    finished = flight.done and index >= len(flight.events)
+
+                for event in pending:
+                    yield event
+
+                if finished:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done and flight.task is not None:
+                flight.task.cancel()
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+    async def _produce(
+        self,
+        key: Hashable,
+        flight: _StreamFlight,
+        factory: Callable[[], AsyncGenerator[Any, None]]
+    ) -> None:
+        generator = factory()
+        try:
+            async for event in generator:
+                async with flight.condition:
+                    flight.events.append(event)
+                    flight.condition.notify_all()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            flight.error = e
+        finally:
+            # 确保底层生成器的清理逻辑（如取消子任务）立即执行
+            await generator.aclose()
+            # 结束后新的请求重新执行，不复用旧结果
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            async with flight.condition:
+                flight.done = True
+                flight.condition.notify_all()
@@ -0,0 +1,291 @@
+"""
+技术指标计算模块
+
+所有指标基于 NumPy 向量化计算，输入既可以是单只股票的一维数组 (T,)，
+也可以是多只股票对齐后的二维数组 (T, N)，输出形状与输入一致。
+序列开头不足一个窗口的位置以及输入中的缺失值均为 NaN。
+"""
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def _as_2d(x) -> Tuple[np.ndarray, bool]:
+    """转换为 (T, N) 的 float64 数组，并返回是否为一维输入"""
+    arr = np.asarray(x, dtype=np.float64)
+    if arr.ndim == 1:
+        return arr[:, None], True
+    return arr, False
+
+
+def _restore(arr: np.ndarray, was_1d: bool) -> np.ndarray:
+    return arr[:, 0] if was_1d else arr
+
+
+def _rolling_sum(x: np.ndarray, window: int) -> np.ndarray:
+    """基于累加和的滚动求和，窗口内存在 NaN 时结果为 NaN"""
+    out = np.full(x.shape, np.nan)
+    if window <= 0 or x.shape[0] < window:
+        return out
+    nan_mask = np.isnan(x)
+    values = np.where(nan_mask, 0.0, x)
+    zeros = np.zeros((1, x.shape[1]))
+    csum = np.concatenate([zeros, np.cumsum(values, axis=0)])
+    cnan = np.concatenate([zeros, np.cumsum(nan_mask, axis=0)])
+    sums = csum[window:] - csum[:-window]
+    nans = cnan[window:] - cnan[:-window]
+    out[window - 1:] = np.where(nans > 0, np.nan, sums)
+    return out
+
+
+def sma(x, window: int) -> np.ndarray:
+    """简单移动平均"""
+    arr, was_1d = _as_2d(x)
+    return _restore(_rolling_sum(arr, window) / window, was_1d)
+
+
+def ema(x, window: int, alpha: Optional[float] = None) -> np.ndarray:
+    """
+    指数移动平均
+
+    时间维度递推，股票维度向量化；每只股票从第一个有效值开始计算，
+    前 window-1 个值视为预热期返回 NaN。
+
+    Args:
+        x: 输入序列
+        window: 周期
+        alpha: 平滑系数（默认 2 / (window + 1)，Wilder 平滑传入 1 / window）
+    """
+    arr, was_1d = _as_2d(x)
+    if alpha is None:
+        alpha = 2.0 / (window + 1)
+
+    out = np.full(arr.shape, np.nan)
+    prev = np.full(arr.shape[1], np.nan)
+    seen = np.zeros(arr.shape[1], dtype=np.int64)
+    for t in range(arr.shape[0]):
+        cur = arr[t]
+        valid = ~np.isnan(cur)
+        prev = np.where(valid, np.where(np.isnan(prev), cur, alpha * cur + (1 - alpha) * prev), prev)
+        seen += valid
+        out[t] = np.where(valid & (seen >= window), prev, np.nan)
+    return _restore(out, was_1d)
+
+
+def rolling_std(x, window: int) -> np.ndarray:
+    """滚动总体标准差"""
+    arr, was_1d = _as_2d(x)
+    mean = _rolling_sum(arr, window) / window
+    mean_sq = _rolling_sum(arr * arr, window) / window
+    var = np.maximum(mean_sq - mean * mean, 0.0)
+    return _restore(np.sqrt(var), was_1d)
+
+
+def rolling_max(x, window: int) -> np.ndarray:
+    """滚动最大值"""
+    arr, was_1d = _as_2d(x)
+    out = np.full(arr.shape, np.nan)
+    if arr.shape[0] >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(arr, window, axis=0)
+        out[window - 1:] = windows.max(axis=-1)
+    return _restore(out, was_1d)
+
+
+def rolling_min(x, window: int) -> np.ndarray:
+    """滚动最小值"""
+    arr, was_1d = _as_2d(x)
+    out = np.full(arr.shape, np.nan)
+    if arr.shape[0] >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(arr, window, axis=0)
+        out[window - 1:] = windows.min(axis=-1)
+    return _restore(out, was_1d)
+
+
+def _shift(arr: np.ndarray, periods: int = 1) -> np.ndarray:
+    out = np.full(arr.shape, np.nan)
+    out[periods:] = arr[:-periods]
+    return out
+
+
+def macd(close, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    MACD 指标
+
+    Returns:
+        (DIF, DEA, MACD 柱)，柱值按国内习惯为 2 * (DIF - DEA)
+    """
+    dif = ema(close, fast) - ema(close, slow)
+    dea = ema(dif, signal)
+    return dif, dea, 2 * (dif - dea)
+
+
+def rsi(close, window: int = 14) -> np.ndarray:
+    """相对强弱指标（Wilder 平滑）"""
+    arr, was_1d = _as_2d(close)
+    delta = arr - _shift(arr)
+    gain = np.where(delta > 0, delta, np.where(np.isnan(delta), np.nan, 0.0))
+    loss = np.where(delta < 0, -delta, np.where(np.isnan(delta), np.nan, 0.0))
+    avg_gain = ema(gain, window, alpha=1.0 / window)
+    avg_loss = ema(loss, window, alpha=1.0 / window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = np.where(avg_loss == 0, 100.0, 100 - 100 / (1 + avg_gain / avg_loss))
+    out = np.where(np.isnan(avg_gain) | np.isnan(avg_loss), np.nan, out)
+    return _restore(out, was_1d)
+
+
+def bollinger(close, window: int = 20, num_std: float = 2.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    布林带
+
+    Returns:
+        (上轨, 中轨, 下轨)
+    """
+    mid = sma(close, window)
+    std = rolling_std(close, window)
+    return mid + num_std * std, mid, mid - num_std * std
+
+
+def atr(high, low, close, window: int = 14) -> np.ndarray:
+    """平均真实波幅（Wilder 平滑）"""
+    h, was_1d = _as_2d(high)
+    l, _ = _as_2d(low)
+    c, _ = _as_2d(close)
+    prev_close = _shift(c)
+    true_range = np.fmax(h - l, np.fmax(np.abs(h - prev_close), np.abs(l - prev_close)))
+    return _restore(ema(true_range, window, alpha=1.0 / window), was_1d)
+
+
+def obv(close, volume) -> np.ndarray:
+    """能量潮"""
+    c, was_1d = _as_2d(close)
+    v, _ = _as_2d(volume)
+    direction = np.sign(np.nan_to_num(c - _shift(c)))
+    return _restore(np.cumsum(direction * np.nan_to_num(v), axis=0), was_1d)
+
+
+def volume_ratio(volume, window: int = 5) -> np.ndarray:
+    """量比：当日成交量 / 前 window 日平均成交量"""
+    v, was_1d = _as_2d(volume)
+    prior_avg = _shift(_rolling_sum(v, window) / window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = np.where(prior_avg > 0, v / prior_avg, np.nan)
+    return _restore(out, was_1d)
+
+
+def compute_indicators(close, high=None, low=None, volume=None) -> Dict[str, np.ndarray]:
+    """
+    一次性计算全部指标
+
+    输入可以是 (T,) 或 (T, N) 数组，批量计算多只股票时各列需按日期对齐。
+
+    Returns:
+        指标名称 -> 数组 的字典
+    """
+    result: Dict[str, np.ndarray] = {}
+    close = np.asarray(close, dtype=np.float64)
+    for window in (5, 10, 20, 60):
+        result[f"ma{window}"] = sma(close, window)
+    result["ema12"] = ema(close, 12)
+    result["ema26"] = ema(close, 26)
+    result["macd_dif"], result["macd_dea"], result["macd_hist"] = macd(close)
+    result["rsi6"] = rsi(close, 6)
+    result["rsi14"] = rsi(close, 14)
+    result["boll_upper"], result["boll_mid"], result["boll_lower"] = bollinger(close)
+    result["high_60"] = rolling_max(close, 60)
+    result["low_60"] = rolling_min(close, 60)
+
+    if high is not None and low is not None:
+        result["atr14"] = atr(high, low, close)
+
+    if volume is not None:
+        volume = np.asarray(volume, dtype=np.float64)
+        result["obv"] = obv(close, volume)
+        result["obv_ma20"] = sma(result["obv"], 20)
+        result["vol_ma5"] = sma(volume, 5)
+        result["vol_ma20"] = sma(volume, 20)
+        result["volume_ratio"] = volume_ratio(volume)
+
+    return result
+
+
+def indicators_from_history(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """基于 StockDataProvider.get_history 返回的标准化日线计算指标"""
+    return compute_indicators(
+        close=df["close"].to_numpy(dtype=np.float64),
+        high=df["high"].to_numpy(dtype=np.float64),
+        low=df["low"].to_numpy(dtype=np.float64),
+        volume=df["volume"].to_numpy(dtype=np.float64),
+    )
+
+
+def _fmt(value: float, digits: int = 2) -> str:
+    return "N/A" if value is None or np.isnan(value) else f"{value:.{digits}f}"
+
+
+def _pct_return(close: np.ndarray, periods: int) -> float:
+    if len(close) <= periods or close[-periods - 1] == 0:
+        return float("nan")
+    return (close[-1] / close[-periods - 1] - 1) * 100
+
+
+def summarize_indicators(df: Optional[pd.DataFrame]) -> str:
+    """
+    将指标最新值整理成供 LLM 阅读的文本摘要
+
+    Args:
+        df: 标准化日线数据
+
+    Returns:
+        指标摘要文本，数据为空时返回空字符串
+    """
+    if df is None or df.empty:
+        return ""
+
+    close = df["close"].to_numpy(dtype=np.float64)
+    ind = indicators_from_history(df)
+    last = {name: values[-1] for name, values in ind.items()}
+    price = close[-1]
+
+    ma_order = [last["ma5"], last["ma10"], last["ma20"], last["ma60"]]
+    if not np.isnan(ma_order).any():
+        if all(a > b for a, b in zip(ma_order, ma_order[1:])):
+            ma_state = "多头排列"
+        elif all(a < b for a, b in zip(ma_order, ma_order[1:])):
+            ma_state = "空头排列"
+        else:
+            ma_state = "交织"
+    else:
+        ma_state = "数据不足"
+
+    hist = ind["macd_hist"]
+    macd_state = "N/A"
+    if len(hist) >= 2 and not np.isnan(hist[-2:]).any():
+        if hist[-2] <= 0 < hist[-1]:
+            macd_state = "金叉"
+        elif hist[-2] >= 0 > hist[-1]:
+            macd_state = "死叉"
+        else:
+            macd_state = "红柱" if hist[-1] > 0 else "绿柱"
+            macd_state += "放大" if abs(hist[-1]) > abs(hist[-2]) else "缩小"
+
+    boll_width = last["boll_upper"] - last["boll_lower"]
+    boll_pos = (price - last["boll_lower"]) / boll_width * 100 if boll_width > 0 else float("nan")
+
+    obv_state = "N/A"
+    if "obv" in last and not np.isnan(last["obv_ma20"]):
+        obv_state = "OBV 高于 20 日均线（资金流入）" if last["obv"] > last["obv_ma20"] else "OBV 低于 20 日均线（资金流出）"
+
+    return f"""
+技术指标（基于 {len(df)} 个交易日本地计算）:
+均线: MA5={_fmt(last['ma5'])} MA10={_fmt(last['ma10'])} MA20={_fmt(last['ma20'])} MA60={_fmt(last['ma60'])}（{ma_state}）
+MACD: DIF={_fmt(last['macd_dif'], 3)} DEA={_fmt(last['macd_dea'], 3)} 柱={_fmt(last['macd_hist'], 3)}（{macd_state}）
+RSI: RSI6={_fmt(last['rsi6'])} RSI14={_fmt(last['rsi14'])}
+布林带(20,2): 上轨={_fmt(last['boll_upper'])} 中轨={_fmt(last['boll_mid'])} 下轨={_fmt(last['boll_lower'])} 价格位置={_fmt(boll_pos, 1)}%
+ATR14: {_fmt(last.get('atr14', float('nan')))}
+成交量: 5日均量={_fmt(last.get('vol_ma5', float('nan')), 0)} 20日均量={_fmt(last.get('vol_ma20', float('nan')), 0)} 量比={_fmt(last.get('volume_ratio', float('nan')))}
+资金: {obv_state}
+区间表现: 5日={_fmt(_pct_return(close, 5))}% 20日={_fmt(_pct_return(close, 20))}% 60日={_fmt(_pct_return(close, 60))}%
+60日区间: 最高收盘={_fmt(last['high_60'])} 最低收盘={_fmt(last['low_60'])}
+"""
@@ -0,0 +1,372 @@
+"""
+本地 OHLCV 日线缓存模块
+
+按 (市场, 股票代码, 复权方式) 将日线数据持久化到本地列式文件（Parquet，
+未安装 pyarrow 时退化为 pickle），再次请求时只向数据源增量拉取缓存中缺失的交易日。
+"""
+
+import os
+import json
+import time
+import threading
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 统一后的列名，所有数据源在写入缓存前都转换为此格式
+OHLCV_COLUMNS = ["date", "open", "high", "low", "close", "volume", "amount", "pct_change"]
+
+# 数据拉取函数：(start, end) -> 标准化 DataFrame，end 为闭区间
+Fetcher = Callable[[datetime, datetime], Optional[pd.DataFrame]]
+
+
+def _parquet_available() -> bool:
+    """检测是否可以读写 Parquet"""
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class OHLCVCache:
+    """
+    OHLCV 日线缓存
+
+    每个 (market, ticker, adjust) 对应一个数据文件和一个元数据文件，元数据记录已覆盖的
+    日期区间。读取时：
+    1. 请求区间完全在已覆盖区间内 -> 直接从内存/磁盘返回
+    2. 否则只拉取区间两端缺失的部分，合并后写回磁盘
+
+    前复权（qfq）数据在除权除息后会整体改变历史价格，因此增量拉取会与缓存的最后一根 K 线
+    重叠一天，若重叠处收盘价不一致则整体重新拉取。
+
+    当天的 K 线尚未确定，每次请求今天的数据都需要重新拉取；上次拉取后 tail_ttl_minutes 内
+    直接使用缓存，避免全市场筛选时每次请求都访问数据源。增量拉取失败时返回已缓存的数据。
+
+    数据源失败时可能返回空表而不抛出异常，因此拉取结果为空时不扩大已覆盖区间（首次拉取为空时不写入），
+    只在元数据中记录已尝试的区间（checked_start/checked_end），tail_ttl 之后再重试。
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        memory_entries: int = 256,
+        tail_ttl_minutes: Optional[float] = None
+    ):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 缓存目录（默认读取 STOCK_DATA_CACHE_DIR，否则为 data/cache/ohlcv）
+            memory_entries: 内存中保留的最近使用的数据表数量
+            tail_ttl_minutes: 未确定的最新 K 线的缓存时间，分钟（默认读取 STOCK_DATA_TAIL_TTL_MINUTES，否则为 5）
+        """
+        if tail_ttl_minutes is None:
+            try:
+                tail_ttl_minutes = float(os.getenv("STOCK_DATA_TAIL_TTL_MINUTES", "5"))
+            except ValueError:
+                tail_ttl_minutes = 5.0
+        self.tail_ttl = max(0.0, tail_ttl_minutes) * 60
+        if cache_dir is None:
+            cache_dir = os.getenv(
+                "STOCK_DATA_CACHE_DIR",
+                str(Path(__file__).parent / "cache" / "ohlcv")
+            )
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.use_parquet = _parquet_available()
+        self.memory_entries = memory_entries
+
+        # 内存 LRU：key -> (DataFrame, meta)
+        self._memory: "OrderedDict[Tuple[str, str, str], Tuple[pd.DataFrame, Dict]]" = OrderedDict()
+        self._memory_lock = threading.Lock()
+        # 每个 key 一把锁，避免并发请求同一只股票时重复拉取
+        self._key_locks: Dict[Tuple[str, str, str], threading.Lock] = {}
+        self._key_locks_lock = threading.Lock()
+
+    # ==================== 公共接口 ====================
+
+    def get_history(
+        self,
+        market: str,
+        ticker: str,
+        start: datetime,
+        end: datetime,
+        fetcher: Fetcher,
+        adjust: str = "qfq"
+    ) -> pd.DataFrame:
+        """
+        获取 [start, end] 区间的日线数据，必要时增量拉取
+
+        Args:
+            market: 市场类型
+            ticker: 股票代码
+            start: 起始日期（含）
+            end: 结束日期（含）
+            fetcher: 数据源拉取函数
+            adjust: 复权方式
+
+        Returns:
+            标准化的日线 DataFrame（可能为空）
+        """
+        start = pd.Timestamp(start).normalize()
+        end = pd.Timestamp(end).normalize()
+        key = (market, ticker, adjust)
+
+        with self._lock_for(key):
+            df, meta = self._load(key)
+            df, meta = self._refresh(key, df, meta, start, end, fetcher, adjust)
+
+        mask = (df["date"] >= start) & (df["date"] <= end)
+        return df.loc[mask].reset_index(drop=True)
+
+    def covers(self, market: str, ticker: str, start: datetime, end: datetime, adjust: str = "qfq") -> bool:
+        """缓存是否已完整覆盖 [start, end] 区间（只检查，不拉取）"""
+        key = (market, ticker, adjust)
+        with self._lock_for(key):
+            _, meta = self._load(key)
+        return self._covered(meta, pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize())
+
+    def _covered(self, meta: Dict, start: pd.Timestamp, end: pd.Timestamp) -> bool:
+        """
+        缓存是否满足请求：已覆盖区间包含请求区间；或缺少的部分（未确定的最新 K 线、
+        上次拉取为空的两端）距上次拉取未超过 tail_ttl
+        """
+        if not meta:
+            return False
+        fetched_at = meta.get("fetched_at")
+        fresh = fetched_at is not None and time.time() - fetched_at < self.tail_ttl
+        if meta["start"] > start and not (fresh and meta.get("checked_start", meta["start"]) <= start):
+            return False
+        if meta["end"] >= end:
+            return True
+        return fresh and meta.get("checked_end", meta["end"]) >= end
+
+    def invalidate(self, market: str, ticker: str, adjust: str = "qfq") -> None:
+        """删除某只股票的缓存"""
+        key = (market, ticker, adjust)
+        with self._lock_for(key):
+            with self._memory_lock:
+                self._memory.pop(key, None)
+            data_path, meta_path = self._paths(key)
+            for path in (data_path, meta_path):
+                if path.exists():
+                    path.unlink()
+
+    # ==================== 增量刷新 ====================
+
+    def _refresh(
+        self,
+        key: Tuple[str, str, str],
+        df: pd.DataFrame,
+        meta: Dict,
+        start: pd.Timestamp,
+        end: pd.Timestamp,
+        fetcher: Fetcher,
+        adjust: str
+    ) -> Tuple[pd.DataFrame, Dict]:
+        """拉取缓存缺失的区间并写回；已有缓存时拉取失败则返回缓存"""
+        if self._covered(meta, start, end):
+            return df, meta
+
+        if meta:
+            try:
+                return self._extend(key, df, meta, start, end, fetcher, adjust)
+            except Exception as e:
+                # 网络抖动不应丢弃磁盘上已有的数据
+                logger.warning(f"⚠️ 增量拉取行情失败，使用已缓存的数据: {key}, {e}")
+                return df, meta
+
+        df = self._normalize(fetcher(start.to_pydatetime(), end.to_pydatetime()))
+        if df.empty:
+            # 数据源失败时返回空表，不能把区间记为已覆盖，下次请求重新拉取
+            logger.warning(f"⚠️ 未获取到行情数据，不写入缓存: {key}")
+            return df, {}
+        meta = {
+            "start": start,
+            "end": min(end, pd.Timestamp(datetime.now().date()) - timedelta(days=1)),
+            "fetched_at": time.time(),
+            "checked_start": start,
+            "checked_end": end,
+        }
+        self._save(key, df, meta)
+        return df, meta
+
+    def _extend(
+        self,
+        key: Tuple[str, str, str],
+        df: pd.DataFrame,
+        meta: Dict,
+        start: pd.Timestamp,
+        end: pd.Timestamp,
+        fetcher: Fetcher,
+        adjust: str
+    ) -> Tuple[pd.DataFrame, Dict]:
+        """在已有缓存的基础上拉取两端缺失的区间并写回"""
+        # 当天的 K 线可能尚未收盘，只把昨天及以前视为已确定的数据
+        settled_end = min(end, pd.Timestamp(datetime.now().date()) - timedelta(days=1))
+        covered_start = pd.Timestamp(meta["start"])
+        covered_end = pd.Timestamp(meta["end"])
+
+        frames = [df]
+        new_start, new_end = covered_start, covered_end
+
+        if start < covered_start:
+            head = self._normalize(fetcher(start.to_pydatetime(), (covered_start - timedelta(days=1)).to_pydatetime()))
+            # 为空可能是拉取失败，也可能是上市前；不扩大覆盖区间，tail_ttl 后重试
+            if not head.empty:
+                frames.insert(0, head)
+                new_start = start
+
+        if end > covered_end:
+            # 与缓存的最后一天重叠，用于检测复权基准是否变化
+            tail = self._normalize(fetcher(covered_end.to_pydatetime(), end.to_pydatetime()))
+            if adjust and self._adjustment_changed(df, tail, covered_end):
+                logger.info(f"🔄 检测到复权数据变化，重新拉取: {key}")
+                full_start = min(start, covered_start)
+                refetched = self._normalize(fetcher(full_start.to_pydatetime(), end.to_pydatetime()))
+                if refetched.empty:
+                    raise ValueError("重新拉取的数据为空")
+                df = refetched
+                meta = {
+                    "start": full_start,
+                    "end": settled_end,
+                    "fetched_at": time.time(),
+                    "checked_start": full_start,
+                    "checked_end": end,
+                }
+                self._save(key, df, meta)
+                return df, meta
+            # 与缓存重叠的那天也没有返回，说明拉取失败（或期间没有交易日）；不扩大覆盖区间
+            if not tail.empty:
+                frames.append(tail)
+                new_end = max(covered_end, settled_end)
+
+        df = pd.concat([f for f in frames if not f.empty] or [frames[0]], ignore_index=True)
+        df = df.drop_duplicates(subset="date", keep="last").sort_values("date").reset_index(drop=True)
+        meta = {
+            "start": new_start,
+            "end": new_end,
+            "fetched_at": time.time(),
+            "checked_start": min(start, new_start),
+            "checked_end": max(end, new_end),
+        }
+
+        self._save(key, df, meta)
+        return df, meta
+
+    @staticmethod
+    def _adjustment_changed(cached: pd.DataFrame, fresh: pd.DataFrame, day: pd.Timestamp) -> bool:
+        """比较重叠日的收盘价，判断复权基准是否变化"""
+        old = cached.loc[cached["date"] == day, "close"]
+        new = fresh.loc[fresh["date"] == day, "close"]
+        if old.empty or new.empty:
+            return False
+        return abs(float(old.iloc[0]) - float(new.iloc[0])) > 1e-6 * max(1.0, abs(float(old.iloc[0])))
+
+    @staticmethod
+    def _normalize(df: Optional[pd.DataFrame]) -> pd.DataFrame:
+        """确保 DataFrame 包含标准列且日期为 datetime 类型"""
+        if df is None or df.empty:
+            return pd.DataFrame({col: pd.Series(dtype="float64") for col in OHLCV_COLUMNS}).astype(
+                {"date": "datetime64[ns]"}
+            )
+        df = df.copy()
+        for col in OHLCV_COLUMNS:
+            if col not in df.columns:
+                df[col] = float("nan")
+        df["date"] = pd.to_datetime(df["date"]).dt.tz_localize(None).dt.normalize().astype("datetime64[ns]")
+        return df[OHLCV_COLUMNS]
+
+    # ==================== 存储 ====================
+
+    def _lock_for(self, key: Tuple[str, str, str]) -> threading.Lock:
+        with self._key_locks_lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def _paths(self, key: Tuple[str, str, str]) -> Tuple[Path, Path]:
+        market, ticker, adjust = key
+        safe_ticker = "".join(c if c.isalnum() or c in "-_" else "_" for c in ticker)
+        directory = self.cache_dir / market / (adjust or "none")
+        directory.mkdir(parents=True, exist_ok=True)
+        suffix = ".parquet" if self.use_parquet else ".pkl"
+        return directory / f"{safe_ticker}{suffix}", directory / f"{safe_ticker}.meta.json"
+
+    def _load(self, key: Tuple[str, str, str]) -> Tuple[pd.DataFrame, Dict]:
+        """优先从内存读取，其次从磁盘读取"""
+        with self._memory_lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        data_path, meta_path = self._paths(key)
+        if not data_path.exists() or not meta_path.exists():
+            return self._normalize(None), {}
+
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                raw_meta = json.load(f)
+            meta = {
+                "start": pd.Timestamp(raw_meta["start"]),
+                "end": pd.Timestamp(raw_meta["end"]),
+                # 旧版本的元数据没有拉取时间，使用数据文件的修改时间
+                "fetched_at": raw_meta.get("fetched_at", data_path.stat().st_mtime),
+            }
+            for name in ("checked_start", "checked_end"):
+                if raw_meta.get(name):
+                    meta[name] = pd.Timestamp(raw_meta[name])
+            if self.use_parquet:
+                df = pd.read_parquet(data_path)
+            else:
+                df = pd.read_pickle(data_path)
+            df = self._normalize(df)
+        except Exception as e:
+            logger.warning(f"⚠️ 读取行情缓存失败，将重新拉取: {key}, {e}")
+            return self._normalize(None), {}
+
+        self._remember(key, df, meta)
+        return df, meta
+
+    def _save(self, key: Tuple[str, str, str], df: pd.DataFrame, meta: Dict) -> None:
+        """原子写入数据文件和元数据文件"""
+        self._remember(key, df, meta)
+        data_path, meta_path = self._paths(key)
+        try:
+            tmp_data = data_path.with_suffix(data_path.suffix + ".tmp")
+            if self.use_parquet:
+                df.to_parquet(tmp_data, index=False)
+            else:
+                df.to_pickle(tmp_data)
+            os.replace(tmp_data, data_path)
+
+            tmp_meta = meta_path.with_suffix(".tmp")
+            with open(tmp_meta, "w", encoding="utf-8") as f:
+                json.dump({
+                    "start": meta["start"].isoformat(),
+                    "end": meta["end"].isoformat(),
+                    "fetched_at": meta.get("fetched_at"),
+                    **{
+                        name: meta[name].isoformat()
+                        for name in ("checked_start", "checked_end") if name in meta
+                    },
+                }, f)
+            os.replace(tmp_meta, meta_path)
+        except Exception as e:
+            logger.warning(f"⚠️ 写入行情缓存失败: {key}, {e}")
+
+    def _remember(self, key: Tuple[str, str, str], df: pd.DataFrame, meta: Dict) -> None:
+        with self._memory_lock:
+            self._memory[key] = (df, meta)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
@@ -0,0 +1,244 @@
+"""
+多股票截面数据面板
+
+把一组股票的日线对齐到同一个交易日历上，得到稠密的 (交易日 × 股票 × 字段) 数组，
+供排序、筛选、相关性、因子计算等截面计算直接使用，不必逐只股票循环和解析文本。
+
+- 交易日历：A 股使用交易所日历（akshare 下载后保存到本地），其他市场使用各股票交易日的并集
+- 停牌、未上市的位置在 observed 掩码中为 False；可选前向填充价格（成交量、成交额、涨跌幅填 0）
+"""
+
+import json
+import time
+import threading
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+PANEL_FIELDS = ("open", "high", "low", "close", "volume", "amount", "pct_change")
+# 停牌日没有成交，前向填充时这些字段填 0 而不是沿用前值
+_FLOW_FIELDS = ("volume", "amount", "pct_change")
+# 停牌日的开高低价取前一个收盘价
+_PRICE_FIELDS = ("open", "high", "low")
+
+
+@dataclass
+class Panel:
+    """
+    截面数据面板
+
+    values 形状为 (T, N, F)，对应 dates × tickers × fields；
+    observed 形状为 (T, N)，标记该股票当天是否真实有行情（前向填充的位置为 False）。
+    """
+    dates: np.ndarray
+    tickers: List[str]
+    fields: tuple
+    values: np.ndarray
+    observed: np.ndarray
+    market: str = "A股"
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def field(self, name: str) -> np.ndarray:
+        """取单个字段的 (T, N) 视图"""
+        try:
+            return self.values[:, :, self.fields.index(name)]
+        except ValueError:
+            raise KeyError(f"面板中没有字段: {name}") from None
+
+    def latest(self, name: str) -> np.ndarray:
+        """各股票最后一个交易日的字段值 (N,)"""
+        return self.field(name)[-1] if len(self.dates) else np.empty(0, dtype=self.values.dtype)
+
+    def to_frame(self, name: str) -> pd.DataFrame:
+        """单个字段转为 DataFrame（行为日期、列为股票代码）"""
+        return pd.DataFrame(self.field(name), index=pd.DatetimeIndex(self.dates, name="date"), columns=self.tickers)
+
+    @classmethod
+    def from_frames(
+        cls,
+        frames: Dict[str, pd.DataFrame],
+        market: str = "A股",
+        fields: Sequence[str] = PANEL_FIELDS,
+        calendar: Optional[np.ndarray] = None,
+        dtype=np.float64,
+        ffill: bool = True
+    ) -> "Panel":
+        """
+        把多只股票的标准化日线对齐为面板
+
+        Args:
+            frames: {ticker: 标准化日线 DataFrame}
+            market: 市场类型
+            fields: 字段列表
+            calendar: 交易日历（datetime64[ns]，默认使用各股票交易日的并集）
+            dtype: 数组类型（float32 可节省一半内存）
+            ffill: 是否前向填充停牌日（上市前仍为 NaN）
+
+        Returns:
+            面板
+        """
+        fields = tuple(fields)
+        tickers = [t for t, df in frames.items() if df is not None and not df.empty]
+        ticker_dates = {t: frames[t]["date"].to_numpy(dtype="datetime64[ns]") for t in tickers}
+
+        if calendar is None:
+            calendar = np.unique(np.concatenate(list(ticker_dates.values()))) if tickers else np.array([], dtype="datetime64[ns]")
+        dates = np.asarray(calendar, dtype="datetime64[ns]")
+
+        T, N, F = len(dates), len(tickers), len(fields)
+        values = np.full((T, N, F), np.nan, dtype=dtype)
+        observed = np.zeros((T, N), dtype=bool)
+
+        for j, ticker in enumerate(tickers):
+            df = frames[ticker]
+            rows = np.searchsorted(dates, ticker_dates[ticker])
+            # 丢弃不在日历中的日期（如数据源返回的非交易日）
+            valid = (rows < T) & (dates[np.minimum(rows, T - 1)] == ticker_dates[ticker]) if T else np.zeros(0, dtype=bool)
+            rows = rows[valid]
+            observed[rows, j] = True
+            for k, name in enumerate(fields):
+                if name in df.columns:
+                    values[rows, j, k] = df[name].to_numpy(dtype=np.float64)[valid]
+
+        if ffill and T and N:
+            _fill_suspended(values, observed, fields)
+
+        return cls(dates=dates, tickers=tickers, fields=fields, values=values, observed=observed, market=market)
+
+
+def _fill_suspended(values: np.ndarray, observed: np.ndarray, fields: tuple) -> None:
+    """原地填充停牌日：收盘价沿用前值，开高低取前收盘，成交类字段为 0；上市前保持 NaN"""
+    T = values.shape[0]
+    index = np.where(observed, np.arange(T)[:, None], -1)
+    np.maximum.accumulate(index, axis=0, out=index)
+    listed = index >= 0
+    gap = listed & ~observed
+    source = np.maximum(index, 0)
+
+    columns = np.arange(values.shape[1])[None, :]
+    close = values[:, :, fields.index("close")] if "close" in fields else None
+    for k, name in enumerate(fields):
+        layer = values[:, :, k]
+        if name in _FLOW_FIELDS:
+            filled = 0.0
+        elif name in _PRICE_FIELDS and close is not None:
+            filled = close[source, columns]
+        else:
+            filled = layer[source, columns]
+        layer[gap] = np.broadcast_to(filled, layer.shape)[gap]
+
+
+class TradingCalendar:
+    """
+    交易日历
+
+    A 股从 akshare 下载交易所日历（包含当年剩余的交易日）并保存到本地，本地日历不覆盖请求区间时重新下载；
+    其他市场没有可用的日历数据源，使用面板内股票交易日的并集。
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None, refresh_hours: float = 24.0):
+        """
+        初始化交易日历
+
+        Args:
+            cache_dir: 日历保存目录（为空时只保存在内存中）
+            refresh_hours: 下载失败或日历不覆盖请求区间时的最短重试间隔
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.refresh_seconds = refresh_hours * 3600
+        self._calendars: Dict[str, np.ndarray] = {}
+        self._attempted: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def sessions(self, market: str, start, end, observed: np.ndarray) -> np.ndarray:
+        """
+        [start, end] 区间内的交易日
+
+        Args:
+            market: 市场类型
+            start: 起始日期
+            end: 结束日期
+            observed: 各股票实际出现过的日期
+
+        Returns:
+            交易日数组（datetime64[ns]）；截断到实际数据的首尾日期，避免面板首尾出现整行空值
+        """
+        observed = np.unique(np.asarray(observed, dtype="datetime64[ns]"))
+        if not len(observed):
+            return observed
+        start = max(np.datetime64(pd.Timestamp(start).normalize(), "ns"), observed[0])
+        end = min(np.datetime64(pd.Timestamp(end).normalize(), "ns"), observed[-1])
+
+        official = self._official(market, end) if market == "A股" else None
+        if official is None:
+            return observed[(observed >= start) & (observed <= end)]
+
+        dates = np.union1d(official, observed)
+        return dates[(dates >= start) & (dates <= end)]
+
+    def _official(self, market: str, end: np.datetime64) -> Optional[np.ndarray]:
+        with self._lock:
+            calendar = self._calendars.get(market)
+            if calendar is None:
+                calendar = self._load(market)
+            if calendar is not None and calendar[-1] >= end:
+                return calendar
+            if time.time() - self._attempted.get(market, 0) < self.refresh_seconds:
+                return calendar
+            self._attempted[market] = time.time()
+            downloaded = self._download(market)
+            if downloaded is not None:
+                calendar = downloaded
+                self._calendars[market] = calendar
+                self._save(market, calendar)
+            return calendar
+
+    def _path(self, market: str) -> Optional[Path]:
+        return self.cache_dir / f"calendar_{market}.json" if self.cache_dir else None
+
+    def _load(self, market: str) -> Optional[np.ndarray]:
+        path = self._path(market)
+        if path is None or not path.exists():
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                calendar = np.array(json.load(f)["dates"], dtype="datetime64[ns]")
+            self._calendars[market] = calendar
+            return calendar
+        except Exception as e:
+            logger.warning(f"⚠️ 读取交易日历失败: {market}, {e}")
+            return None
+
+    def _save(self, market: str, calendar: np.ndarray) -> None:
+        path = self._path(market)
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"dates": [str(d)[:10] for d in calendar]}, f)
+            tmp.replace(path)
+        except Exception as e:
+            logger.warning(f"⚠️ 写入交易日历失败: {market}, {e}")
+
+    @staticmethod
+    def _download(market: str) -> Optional[np.ndarray]:
+        try:
+            import akshare as ak
+            df = ak.tool_trade_date_hist_sina()
+            calendar = np.unique(pd.to_datetime(df["trade_date"]).to_numpy(dtype="datetime64[ns]"))
+            logger.info(f"📅 已下载 {market} 交易日历: {len(calendar)} 个交易日")
+            return calendar
+        except Exception as e:
+            logger.warning(f"⚠️ 下载 {market} 交易日历失败，使用行情数据中的交易日: {e}")
+            return None
@@ -2,18 +2,63 @@
 股票数据获取模块
 """
 
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from typing import Callable, Dict, List, Optional, Sequence
 import logging
 
+from .ohlcv_cache import OHLCVCache
+from .symbol_directory import SymbolDirectory
+from .indicators import summarize_indicators
+from .panel import Panel, TradingCalendar, PANEL_FIELDS
+
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class MarketSnapshot:
+    """
+    单次分析请求的市场数据快照
+
+    由 StockDataProvider.get_snapshot 按 (ticker, date, market) 构建一次，
+    交给所有分析师共享，避免每个分析师重复请求 akshare/yfinance。
+    """
+    ticker: str
+    date: str
+    market: str
+    stock_info: str
+    market_info: Dict = field(default_factory=dict)
+    market_data: str = ""
+    indicators: str = ""
+    history: Optional[pd.DataFrame] = field(default=None, repr=False)
+
+
 class StockDataProvider:
     """股票数据提供者"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        cache: Optional[OHLCVCache] = None,
+        use_cache: bool = True,
+        symbol_directory: Optional[SymbolDirectory] = None
+    ):
+        """
+        初始化数据提供者
+        
+        Args:
+            cache: 日线缓存实例（默认自动创建）
+            use_cache: 是否启用本地日线缓存
+            symbol_directory: 股票代码目录（默认自动创建）
+        """
+        if use_cache and cache is None:
+            cache = OHLCVCache()
+        self.cache = cache if use_cache else None
+        self.symbol_directory = symbol_directory or SymbolDirectory()
+        self.calendar = TradingCalendar(self.cache.cache_dir if self.cache is not None else None)
+        
         self.market_info = {
             'A股': {
                 'is_china': True,
@@ -34,6 +79,38 @@ class StockDataProvider:
             }
         }
     
+    def get_snapshot(self, ticker: str, date: str, market: str = "A股") -> MarketSnapshot:
+        """
+        获取一次请求所需的全部市场数据（每项只请求一次）
+        
+        Args:
+            ticker: 股票代码
+            date: 分析日期
+            market: 市场类型
+            
+        Returns:
+            市场数据快照
+        """
+        logger.info(f"📦 构建市场数据快照: {ticker} {date} ({market})")
+        history = self.get_history(ticker, date, market)
+        
+        try:
+            indicators = summarize_indicators(history)
+        except Exception as e:
+            logger.warning(f"计算技术指标失败: {e}")
+            indicators = ""
+        
+        return MarketSnapshot(
+            ticker=ticker,
+            date=date,
+            market=market,
+            stock_info=self.get_stock_info(ticker, market),
+            market_info=self.get_market_info(ticker, market),
+            market_data=self.get_market_data(ticker, date, market, history=history),
+            indicators=indicators,
+            history=history,
+        )
+    
     def get_market_info(self, ticker: str, market: str = "A股") -> Dict:
         """获取市场信息"""
         return self.market_info.get(market, self.market_info['A股'])
@@ -62,6 +139,11 @@ class StockDataProvider:
     
     def _get_china_stock_info(self, ticker: str) -> str:
         """获取 A 股股票信息"""
+        company_name = self.symbol_directory.get_name(ticker, "A股")
+        if company_name:
+            return f"股票代码: {ticker}\n股票名称: {company_name}\n市场: A股"
+        
+        # 目录中不存在（如新股），退回单只股票查询
         try:
             import akshare as ak
             # 获取股票基本信息
@@ -77,23 +159,18 @@ class StockDataProvider:
     
     def _get_hk_stock_info(self, ticker: str) -> str:
         """获取港股股票信息"""
-        try:
-            import akshare as ak
-            # 清理股票代码
-            clean_ticker = ticker.replace('.HK', '').replace('.hk', '')
-            stock_info = ak.stock_hk_spot_em()
-            if stock_info is not None and not stock_info.empty:
-                stock_data = stock_info[stock_info['代码'] == clean_ticker]
-                if not stock_data.empty:
-                    company_name = stock_data.iloc[0]['名称']
-                    return f"股票代码: {ticker}\n股票名称: {company_name}\n市场: 港股"
-        except Exception as e:
-            logger.warning(f"获取港股信息失败: {e}")
+        company_name = self.symbol_directory.get_name(ticker, "港股")
+        if company_name:
+            return f"股票代码: {ticker}\n股票名称: {company_name}\n市场: 港股"
         
         return f"股票代码: {ticker}\n市场: 港股"
     
     def _get_us_stock_info(self, ticker: str) -> str:
         """获取美股股票信息"""
+        company_name = self.symbol_directory.get_name(ticker, "美股")
+        if company_name:
+            return f"股票代码: {ticker}\n股票名称: {company_name}\n市场: 美股"
+        
         try:
             import yfinance as yf
             stock = yf.Ticker(ticker)
@@ -105,7 +182,28 @@ class StockDataProvider:
         
         return f"股票代码: {ticker}\n市场: 美股"
     
-    def get_market_data(self, ticker: str, date: str, market: str = "A股", days: int = 365) -> str:
+    def search_symbols(self, query: str, market: str = "A股", limit: int = 10) -> list:
+        """
+        按代码或名称前缀搜索股票（用于自动补全）
+        
+        Args:
+            query: 查询前缀
+            market: 市场类型
+            limit: 返回数量上限
+            
+        Returns:
+            [{"code": ..., "name": ...}, ...]
+        """
+        return self.symbol_directory.search(query, market, limit)
+    
+    def get_market_data(
+        self,
+        ticker: str,
+        date: str,
+        market: str = "A股",
+        days: int = 365,
+        history: Optional[pd.DataFrame] = None
+    ) -> str:
         """
         获取市场数据
         
@@ -114,6 +212,7 @@ class StockDataProvider:
             date: 分析日期
             market: 市场类型
             days: 历史数据天数
+            history: 已获取的日线数据（可选，传入时不再重复获取）
             
         Returns:
             市场数据字符串
@@ -121,109 +220,317 @@ class StockDataProvider:
         market_info = self.get_market_info(ticker, market)
         
         if market_info.get('is_china'):
-            return self._get_china_market_data(ticker, date, days)
+            return self._get_china_market_data(ticker, date, days, history)
         elif market_info.get('is_hk'):
-            return self._get_hk_market_data(ticker, date, days)
+            return self._get_hk_market_data(ticker, date, days, history)
         elif market_info.get('is_us'):
-            return self._get_us_market_data(ticker, date, days)
+            return self._get_us_market_data(ticker, date, days, history)
         else:
             return f"暂不支持 {market} 市场数据"
     
-    def _get_china_market_data(self, ticker: str, date: str, days: int) -> str:
-        """获取 A 股市场数据"""
+    def get_history(self, ticker: str, date: str, market: str = "A股", days: int = 365) -> Optional[pd.DataFrame]:
+        """
+        获取日线历史数据（优先读取本地缓存，仅增量拉取缺失的交易日）
+        
+        Args:
+            ticker: 股票代码
+            date: 分析日期（含）
+            market: 市场类型
+            days: 历史数据天数
+            
+        Returns:
+            标准化的日线 DataFrame，列为 date/open/high/low/close/volume/amount/pct_change；
+            获取失败时返回 None
+        """
+        fetcher = self._history_fetcher(ticker, market)
+        if fetcher is None:
+            return None
+        
+        end_date = datetime.strptime(date, "%Y-%m-%d")
+        start_date = end_date - timedelta(days=days)
+        return self._load_history(ticker, market, start_date, end_date, fetcher)
+    
+    def _history_fetcher(self, ticker: str, market: str) -> Optional[Callable[[datetime, datetime], pd.DataFrame]]:
+        """按市场选择日线数据源"""
+        market_info = self.get_market_info(ticker, market)
+        
+        if market_info.get('is_china'):
+            return lambda start, end: self._fetch_china_history(ticker, start, end)
+        elif market_info.get('is_hk'):
+            return lambda start, end: self._fetch_hk_history(ticker, start, end)
+        elif market_info.get('is_us'):
+            return lambda start, end: self._fetch_us_history(ticker, start, end)
+        return None
+    
+    def _load_history(
+        self,
+        ticker: str,
+        market: str,
+        start_date: datetime,
+        end_date: datetime,
+        fetcher: Callable[[datetime, datetime], pd.DataFrame]
+    ) -> Optional[pd.DataFrame]:
+        """经本地缓存读取 [start_date, end_date] 的日线"""
         try:
-            import akshare as ak
-            from datetime import datetime, timedelta
+            if self.cache is not None:
+                return self.cache.get_history(market, ticker, start_date, end_date, fetcher, adjust="qfq")
+            return OHLCVCache._normalize(fetcher(start_date, end_date))
+        except Exception as e:
+            logger.warning(f"获取 {market} 历史数据失败: {ticker}, {e}")
+            return None
+    
+    def get_panel(
+        self,
+        tickers: Sequence[str],
+        date: str,
+        market: str = "A股",
+        days: int = 365,
+        fields: Sequence[str] = PANEL_FIELDS,
+        dtype=np.float64,
+        ffill: bool = True,
+        max_workers: int = 8
+    ) -> Panel:
+        """
+        一次获取一组股票按交易日历对齐的截面面板
+        
+        已缓存的区间直接从本地读取；美股缺失的数据用一次 yfinance 批量下载补齐，
+        A 股、港股没有批量历史行情接口，缺失的股票在线程池中并发拉取。
+        
+        Args:
+            tickers: 股票代码列表
+            date: 结束日期（含）
+            market: 市场类型
+            days: 历史数据天数
+            fields: 字段列表
+            dtype: 数组类型（np.float32 可节省一半内存）
+            ffill: 是否前向填充停牌日
+            max_workers: 并发拉取的线程数
             
-            end_date = datetime.strptime(date, "%Y-%m-%d")
-            start_date = end_date - timedelta(days=days)
+        Returns:
+            (交易日 × 股票 × 字段) 面板，没有数据的股票不会出现在面板中
+        """
+        tickers = list(dict.fromkeys(tickers))
+        end_date = datetime.strptime(date, "%Y-%m-%d")
+        start_date = end_date - timedelta(days=days)
+        
+        prefetched: Dict[str, pd.DataFrame] = {}
+        if self.get_market_info("", market).get('is_us'):
+            missing = [
+                t for t in tickers
+                if self.cache is None or not self.cache.covers(market, t, start_date, end_date)
+            ]
+            if len(missing) > 1:
+                prefetched = self._bulk_fetch_us_history(missing, start_date, end_date)
+        
+        def load(ticker: str) -> Optional[pd.DataFrame]:
+            fetcher = self._history_fetcher(ticker, market)
+            if fetcher is None:
+                return None
+            bulk = prefetched.get(ticker)
+            if bulk is not None:
+                single = fetcher
+                
+                # 批量结果覆盖的子区间直接切片，超出部分（如复权基准变化后的全量重拉）仍逐只拉取
+                def fetcher(start, end):
+                    if start >= start_date:
+                        return bulk[(bulk['date'] >= pd.Timestamp(start)) & (bulk['date'] <= pd.Timestamp(end))]
+                    return single(start, end)
             
-            # 获取历史数据
-            df = ak.stock_zh_a_hist(
-                symbol=ticker,
-                period="daily",
-                start_date=start_date.strftime("%Y%m%d"),
-                end_date=end_date.strftime("%Y%m%d"),
-                adjust="qfq"
+            return self._load_history(ticker, market, start_date, end_date, fetcher)
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tickers) or 1)), thread_name_prefix="panel") as executor:
+            frames = dict(zip(tickers, executor.map(load, tickers)))
+        
+        missing = [t for t, df in frames.items() if df is None or df.empty]
+        if missing:
+            logger.warning(f"⚠️ {len(missing)} 只股票没有行情数据，已跳过: {', '.join(missing[:10])}")
+        
+        frames = {t: df for t, df in frames.items() if df is not None and not df.empty}
+        observed = np.concatenate([df['date'].to_numpy(dtype='datetime64[ns]') for df in frames.values()]) if frames else np.array([], dtype='datetime64[ns]')
+        calendar = self.calendar.sessions(market, start_date, end_date, observed)
+        
+        panel = Panel.from_frames(frames, market, fields, calendar=calendar, dtype=dtype, ffill=ffill)
+        logger.info(f"📊 截面面板: {len(panel.tickers)} 只股票 × {len(panel.dates)} 个交易日 × {len(panel.fields)} 个字段")
+        return panel
+    
+    def _fetch_china_history(self, ticker: str, start: datetime, end: datetime) -> pd.DataFrame:
+        """从 akshare 拉取 A 股日线（前复权）"""
+        import akshare as ak
+        
+        df = ak.stock_zh_a_hist(
+            symbol=ticker,
+            period="daily",
+            start_date=start.strftime("%Y%m%d"),
+            end_date=end.strftime("%Y%m%d"),
+            adjust="qfq"
+        )
+        return self._rename_akshare(df)
+    
+    def _fetch_hk_history(self, ticker: str, start: datetime, end: datetime) -> pd.DataFrame:
+        """从 akshare 拉取港股日线（前复权）"""
+        import akshare as ak
+        clean_ticker = ticker.replace('.HK', '').replace('.hk', '')
+        
+        df = ak.stock_hk_hist(
+            symbol=clean_ticker,
+            period="daily",
+            start_date=start.strftime("%Y%m%d"),
+            end_date=end.strftime("%Y%m%d"),
+            adjust="qfq"
+        )
+        return self._rename_akshare(df)
+    
+    def _fetch_us_history(self, ticker: str, start: datetime, end: datetime) -> pd.DataFrame:
+        """从 yfinance 拉取美股日线"""
+        import yfinance as yf
+        
+        stock = yf.Ticker(ticker)
+        # yfinance 的 end 为开区间，向后多取一天以包含分析日期当天
+        df = stock.history(start=start, end=end + timedelta(days=1))
+        return self._rename_yfinance(df)
+    
+    def _bulk_fetch_us_history(self, tickers: List[str], start: datetime, end: datetime) -> Dict[str, pd.DataFrame]:
+        """用一次 yfinance 批量请求拉取多只美股的日线，失败时返回空字典（退回逐只拉取）"""
+        try:
+            import yfinance as yf
+            data = yf.download(
+                tickers,
+                start=start,
+                end=end + timedelta(days=1),
+                group_by="ticker",
+                auto_adjust=True,
+                threads=True,
+                progress=False,
             )
-            
-            if df is not None and not df.empty:
-                latest = df.iloc[-1]
-                return f"""
+        except Exception as e:
+            logger.warning(f"美股批量拉取失败，改为逐只拉取: {e}")
+            return {}
+        
+        if data is None or data.empty:
+            return {}
+        
+        result = {}
+        for ticker in tickers:
+            try:
+                df = data[ticker].dropna(how='all')
+            except KeyError:
+                continue
+            if not df.empty:
+                result[ticker] = OHLCVCache._normalize(self._rename_yfinance(df))
+        logger.info(f"📦 美股批量拉取: {len(result)}/{len(tickers)} 只股票")
+        return result
+    
+    @staticmethod
+    def _rename_yfinance(df: Optional[pd.DataFrame]) -> pd.DataFrame:
+        """将 yfinance 的列名转换为标准列名"""
+        if df is None or df.empty:
+            return pd.DataFrame()
+        
+        df = df.reset_index().rename(columns={
+            'Date': 'date',
+            'Open': 'open',
+            'High': 'high',
+            'Low': 'low',
+            'Close': 'close',
+            'Volume': 'volume',
+        })
+        df['pct_change'] = df['close'].pct_change() * 100
+        return df
+    
+    @staticmethod
+    def _rename_akshare(df: Optional[pd.DataFrame]) -> pd.DataFrame:
+        """将 akshare 的中文列名转换为标准列名"""
+        if df is None or df.empty:
+            return pd.DataFrame()
+        return df.rename(columns={
+            '日期': 'date',
+            '开盘': 'open',
+            '最高': 'high',
+            '最低': 'low',
+            '收盘': 'close',
+            '成交量': 'volume',
+            '成交额': 'amount',
+            '涨跌幅': 'pct_change',
+        })
+    
+    def _get_china_market_data(
+        self,
+        ticker: str,
+        date: str,
+        days: int,
+        df: Optional[pd.DataFrame] = None
+    ) -> str:
+        """获取 A 股市场数据"""
+        if df is None:
+            df = self.get_history(ticker, date, "A股", days)
+        
+        if df is not None and not df.empty:
+            latest = df.iloc[-1]
+            pct_change = 'N/A' if pd.isna(latest['pct_change']) else f"{latest['pct_change']:.2f}"
+            return f"""
 股票代码: {ticker}
-最新日期: {latest['日期']}
-收盘价: {latest['收盘']} 元
-开盘价: {latest['开盘']} 元
-最高价: {latest['最高']} 元
-最低价: {latest['最低']} 元
-成交量: {latest['成交量']}
-成交额: {latest['成交额']} 元
-涨跌幅: {latest.get('涨跌幅', 'N/A')}%
+最新日期: {latest['date'].strftime('%Y-%m-%d')}
+收盘价: {latest['close']:.2f} 元
+开盘价: {latest['open']:.2f} 元
+最高价: {latest['high']:.2f} 元
+最低价: {latest['low']:.2f} 元
+成交量: {latest['volume']:.0f}
+成交额: {latest['amount']:.2f} 元
+涨跌幅: {pct_change}%
 历史数据天数: {len(df)}
 """
-        except Exception as e:
-            logger.warning(f"获取 A 股市场数据失败: {e}")
         
         return f"股票代码: {ticker}\n数据获取失败，请检查股票代码是否正确"
     
-    def _get_hk_market_data(self, ticker: str, date: str, days: int) -> str:
+    def _get_hk_market_data(
+        self,
+        ticker: str,
+        date: str,
+        days: int,
+        df: Optional[pd.DataFrame] = None
+    ) -> str:
         """获取港股市场数据"""
-        try:
-            import akshare as ak
-            clean_ticker = ticker.replace('.HK', '').replace('.hk', '')
-            
-            # 获取港股历史数据
-            df = ak.stock_hk_hist(
-                symbol=clean_ticker,
-                period="daily",
-                start_date=date.replace('-', ''),
-                end_date=date.replace('-', ''),
-                adjust="qfq"
-            )
-            
-            if df is not None and not df.empty:
-                latest = df.iloc[-1]
-                return f"""
+        if df is None:
+            df = self.get_history(ticker, date, "港股", days)
+        
+        if df is not None and not df.empty:
+            latest = df.iloc[-1]
+            return f"""
 股票代码: {ticker}
-最新日期: {latest['日期']}
-收盘价: {latest['收盘']} 港币
-开盘价: {latest['开盘']} 港币
-最高价: {latest['最高']} 港币
-最低价: {latest['最低']} 港币
-成交量: {latest['成交量']}
-成交额: {latest['成交额']} 港币
+最新日期: {latest['date'].strftime('%Y-%m-%d')}
+收盘价: {latest['close']:.3f} 港币
+开盘价: {latest['open']:.3f} 港币
+最高价: {latest['high']:.3f} 港币
+最低价: {latest['low']:.3f} 港币
+成交量: {latest['volume']:.0f}
+成交额: {latest['amount']:.2f} 港币
+历史数据天数: {len(df)}
 """
-        except Exception as e:
-            logger.warning(f"获取港股市场数据失败: {e}")
         
         return f"股票代码: {ticker}\n数据获取失败"
     
-    def _get_us_market_data(self, ticker: str, date: str, days: int) -> str:
+    def _get_us_market_data(
+        self,
+        ticker: str,
+        date: str,
+        days: int,
+        df: Optional[pd.DataFrame] = None
+    ) -> str:
         """获取美股市场数据"""
-        try:
-            import yfinance as yf
-            from datetime import datetime, timedelta
-            
-            end_date = datetime.strptime(date, "%Y-%m-%d")
-            start_date = end_date - timedelta(days=days)
-            
-            stock = yf.Ticker(ticker)
-            df = stock.history(start=start_date, end=end_date)
-            
-            if df is not None and not df.empty:
-                latest = df.iloc[-1]
-                return f"""
+        if df is None:
+            df = self.get_history(ticker, date, "美股", days)
+        
+        if df is not None and not df.empty:
+            latest = df.iloc[-1]
+            return f"""
 股票代码: {ticker}
-最新日期: {latest.name.strftime('%Y-%m-%d')}
-收盘价: ${latest['Close']:.2f}
-开盘价: ${latest['Open']:.2f}
-最高价: ${latest['High']:.2f}
-最低价: ${latest['Low']:.2f}
-成交量: {latest['Volume']:,.0f}
+最新日期: {latest['date'].strftime('%Y-%m-%d')}
+收盘价: ${latest['close']:.2f}
+开盘价: ${latest['open']:.2f}
+最高价: ${latest['high']:.2f}
+最低价: ${latest['low']:.2f}
+成交量: {latest['volume']:,.0f}
 历史数据天数: {len(df)}
 """
-        except Exception as e:
-            logger.warning(f"获取美股市场数据失败: {e}")
         
         return f"股票代码: {ticker}\n数据获取失败"
-
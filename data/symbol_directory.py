@@ -0,0 +1,298 @@
+"""
+股票代码-名称目录模块
+
+每个市场的代码表只下载一次，保存在内存字典中并持久化到本地，按固定周期在后台刷新。
+用于 O(1) 查询股票名称和代码/名称前缀自动补全。
+"""
+
+import os
+import json
+import time
+import bisect
+import threading
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 全量代码表需要分页下载、耗时较长的市场：单只股票查询时不等待首次下载，
+# 而是在后台下载并先返回 None（调用方有其他数据源兜底）；list_codes 仍会等待
+_BACKGROUND_MARKETS = ("美股",)
+
+
+def normalize_code(code: str, market: str) -> str:
+    """
+    标准化股票代码
+
+    Args:
+        code: 原始代码，如 "600000"、"00700.HK"、"105.AAPL"、"aapl"
+        market: 市场类型
+
+    Returns:
+        标准化后的代码：A股为 6 位数字，港股为 5 位数字，美股为大写字母代码
+    """
+    code = str(code).strip()
+    if market == "港股":
+        code = code.upper().replace(".HK", "")
+        return code.zfill(5) if code.isdigit() else code
+    if market == "美股":
+        # 东方财富美股代码带有交易所前缀，如 "105.AAPL"
+        return code.split(".")[-1].upper() if "." in code and code.split(".")[0].isdigit() else code.upper()
+    code = code.upper()
+    for prefix in ("SH", "SZ", "BJ"):
+        if code.startswith(prefix):
+            code = code[len(prefix):]
+    return code.split(".")[0]
+
+
+class _MarketIndex:
+    """单个市场的代码索引：字典用于精确查询，有序列表用于前缀查询"""
+
+    def __init__(self, names: Dict[str, str], loaded_at: float):
+        self.names = names
+        self.loaded_at = loaded_at
+        self.sorted_codes = sorted(names)
+        self.sorted_names = sorted((name, code) for code, name in names.items() if name)
+
+    def prefix_search(self, query: str, limit: int) -> List[Dict[str, str]]:
+        """按代码前缀、再按名称前缀匹配"""
+        results: List[Dict[str, str]] = []
+        seen = set()
+
+        i = bisect.bisect_left(self.sorted_codes, query)
+        while i < len(self.sorted_codes) and len(results) < limit:
+            code = self.sorted_codes[i]
+            if not code.startswith(query):
+                break
+            results.append({"code": code, "name": self.names[code]})
+            seen.add(code)
+            i += 1
+
+        j = bisect.bisect_left(self.sorted_names, (query, ""))
+        while j < len(self.sorted_names) and len(results) < limit:
+            name, code = self.sorted_names[j]
+            if not name.startswith(query):
+                break
+            if code not in seen:
+                results.append({"code": code, "name": name})
+            j += 1
+
+        return results
+
+
+class SymbolDirectory:
+    """
+    全市场股票代码目录
+
+    - 首次查询某市场时从本地文件加载，文件不存在或已过期则从 akshare 下载
+    - 超过刷新周期后，查询仍返回旧数据，同时在后台线程中刷新
+    - 下载失败后 retry_minutes 内不再重试，期间继续使用旧数据（没有旧数据时返回空结果）
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        refresh_hours: Optional[float] = None,
+        retry_minutes: Optional[float] = None
+    ):
+        """
+        初始化代码目录
+
+        Args:
+            cache_dir: 持久化目录（默认读取 SYMBOL_DIRECTORY_DIR，否则为 data/cache/symbols）
+            refresh_hours: 刷新周期（小时，默认读取 SYMBOL_DIRECTORY_REFRESH_HOURS，否则为 24）
+            retry_minutes: 下载失败后的重试间隔（分钟，默认读取 SYMBOL_DIRECTORY_RETRY_MINUTES，否则为 5）
+        """
+        if cache_dir is None:
+            cache_dir = os.getenv(
+                "SYMBOL_DIRECTORY_DIR",
+                str(Path(__file__).parent / "cache" / "symbols")
+            )
+        if refresh_hours is None:
+            try:
+                refresh_hours = float(os.getenv("SYMBOL_DIRECTORY_REFRESH_HOURS", "24"))
+            except ValueError:
+                refresh_hours = 24.0
+        if retry_minutes is None:
+            try:
+                retry_minutes = float(os.getenv("SYMBOL_DIRECTORY_RETRY_MINUTES", "5"))
+            except ValueError:
+                retry_minutes = 5.0
+
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.refresh_seconds = refresh_hours * 3600
+        self.retry_seconds = retry_minutes * 60
+
+        self._indexes: Dict[str, _MarketIndex] = {}
+        self._locks = {market: threading.Lock() for market in ("A股", "港股", "美股")}
+        self._refreshing = set()
+        # 最近一次下载失败的时间
+        self._failed_at: Dict[str, float] = {}
+
+    # ==================== 公共接口 ====================
+
+    def get_name(self, code: str, market: str = "A股") -> Optional[str]:
+        """
+        查询股票名称
+
+        Args:
+            code: 股票代码
+            market: 市场类型
+
+        Returns:
+            股票名称，不存在时返回 None
+        """
+        index = self._get_index(market, wait=market not in _BACKGROUND_MARKETS)
+        if index is None:
+            return None
+        return index.names.get(normalize_code(code, market))
+
+    def search(self, query: str, market: str = "A股", limit: int = 10) -> List[Dict[str, str]]:
+        """
+        按代码或名称前缀搜索（用于自动补全）
+
+        Args:
+            query: 查询前缀
+            market: 市场类型
+            limit: 返回数量上限
+
+        Returns:
+            [{"code": ..., "name": ...}, ...]
+        """
+        query = query.strip()
+        if not query:
+            return []
+        index = self._get_index(market, wait=market not in _BACKGROUND_MARKETS)
+        if index is None:
+            return []
+        code_query = query.upper() if market == "美股" else query
+        return index.prefix_search(code_query, limit)
+
+    def list_codes(self, market: str = "A股") -> List[str]:
+        """
+        列出某个市场的全部股票代码（用于全市场筛选）
+
+        Args:
+            market: 市场类型
+
+        Returns:
+            按代码排序的列表，目录不可用时为空列表
+        """
+        index = self._get_index(market)
+        if index is None:
+            return []
+        return list(index.sorted_codes)
+
+    def refresh(self, market: str) -> bool:
+        """立即从数据源刷新某个市场的代码表"""
+        names = self._download(market)
+        if not names:
+            self._failed_at[market] = time.time()
+            return False
+        self._failed_at.pop(market, None)
+        self._indexes[market] = _MarketIndex(names, time.time())
+        self._persist(market, names)
+        logger.info(f"✅ 股票代码目录已刷新: {market} ({len(names)} 只)")
+        return True
+
+    # ==================== 加载与刷新 ====================
+
+    def _get_index(self, market: str, wait: bool = True) -> Optional[_MarketIndex]:
+        """
+        取得某市场的索引
+
+        Args:
+            market: 市场类型
+            wait: 本地没有代码表时是否等待下载完成（False 时在后台下载并返回 None）
+        """
+        if market not in self._locks:
+            return None
+
+        index = self._indexes.get(market)
+        if index is None and self._backing_off(market):
+            return None
+        if index is None:
+            with self._locks[market]:
+                index = self._indexes.get(market)
+                if index is None:
+                    index = self._load_from_disk(market)
+                    if index is not None:
+                        self._indexes[market] = index
+                    elif not wait:
+                        self._refresh_in_background(market)
+                    elif not self._backing_off(market) and self.refresh(market):
+                        index = self._indexes[market]
+
+        if index is not None and time.time() - index.loaded_at > self.refresh_seconds:
+            self._refresh_in_background(market)
+        return index
+
+    def _backing_off(self, market: str) -> bool:
+        """上次下载失败后是否仍在重试间隔内"""
+        return time.time() - self._failed_at.get(market, 0) < self.retry_seconds
+
+    def _refresh_in_background(self, market: str) -> None:
+        if market in self._refreshing or self._backing_off(market):
+            return
+        self._refreshing.add(market)
+
+        def run():
+            try:
+                self.refresh(market)
+            finally:
+                self._refreshing.discard(market)
+
+        threading.Thread(target=run, name=f"symbol-refresh-{market}", daemon=True).start()
+
+    def _path(self, market: str) -> Path:
+        filename = {"A股": "a_share", "港股": "hk", "美股": "us"}[market]
+        return self.cache_dir / f"{filename}.json"
+
+    def _load_from_disk(self, market: str) -> Optional[_MarketIndex]:
+        path = self._path(market)
+        if not path.exists():
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            return _MarketIndex(payload["names"], payload["loaded_at"])
+        except Exception as e:
+            logger.warning(f"⚠️ 读取股票代码目录失败: {market}, {e}")
+            return None
+
+    def _persist(self, market: str, names: Dict[str, str]) -> None:
+        path = self._path(market)
+        try:
+            tmp = path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"loaded_at": time.time(), "names": names}, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except Exception as e:
+            logger.warning(f"⚠️ 保存股票代码目录失败: {market}, {e}")
+
+    def _download(self, market: str) -> Dict[str, str]:
+        """从 akshare 下载完整代码表"""
+        try:
+            import akshare as ak
+
+            if market == "A股":
+                df = ak.stock_info_a_code_name()
+                code_col, name_col = "code", "name"
+            elif market == "港股":
+                df = ak.stock_hk_spot_em()
+                code_col, name_col = "代码", "名称"
+            else:
+                df = ak.stock_us_spot_em()
+                code_col, name_col = "代码", "名称"
+
+            if df is None or df.empty:
+                return {}
+            return {
+                normalize_code(code, market): str(name)
+                for code, name in zip(df[code_col], df[name_col])
+            }
+        except Exception as e:
+            logger.warning(f"⚠️ 下载股票代码目录失败: {market}, {e}")
+            return {}
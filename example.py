@@ -12,7 +12,7 @@ load_dotenv()
 from core.llm_client import DeepSeekClient
 from core.analyst import AnalystManager
 from data.stock_data import StockDataProvider
-from storage.mongodb import MongoDBStorage
+from storage import create_storage_from_env
 
 def example_basic_analysis():
     """基本分析示例"""
@@ -40,10 +40,10 @@ def example_basic_analysis():
         print(f"{'=' * 60}")
         print(report)
     
-    # 保存到 MongoDB
-    mongodb_storage = MongoDBStorage()
-    if mongodb_storage.connected:
-        mongodb_storage.save_analysis_report(
+    # 保存到存储（STORAGE_BACKEND 选择 MongoDB 或 SQLite）
+    report_storage = create_storage_from_env()
+    if report_storage.connected:
+        report_storage.save_analysis_report(
             stock_symbol="300748",
             analysis_date="2026-01-16",
             market="A股",
@@ -51,9 +51,10 @@ def example_basic_analysis():
             reports=reports,
             research_depth=3
         )
-        print("\n✅ 分析结果已保存到 MongoDB")
+        print("\n✅ 分析结果已保存")
     else:
-        print("\n⚠️ MongoDB 未连接，结果未保存")
+        print("\n⚠️ 存储未连接，结果未保存")
+    report_storage.close()
 
 
 def example_single_analyst():
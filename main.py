@@ -28,22 +28,30 @@ logger = logging.getLogger(__name__)
 
 # 导入核心模块
 from core.llm_client import DeepSeekClient
-from core.analyst import AnalystManager
+from core.analyst import AnalystManager, available_analysts
+from core.batch import BatchAnalyzer, load_tickers_file
 from core.image_analyzer import ImageAnalyzer
 from data.stock_data import StockDataProvider
-from storage.mongodb import MongoDBStorage
+from storage import create_storage_from_env
+from quant.screener.screener import Screener
+from quant.screener.expression import ExpressionError
 
 
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(description='TradingMiniAgents - 简化版股票分析智能体')
-    parser.add_argument('--ticker', type=str, required=True, help='股票代码')
+    target_group = parser.add_mutually_exclusive_group(required=True)
+    target_group.add_argument('--ticker', type=str, help='股票代码')
+    target_group.add_argument('--tickers-file', type=str, help='股票列表文件（每行一个代码），批量分析')
+    target_group.add_argument('--screen', type=str, help='筛选表达式，先在全市场本地筛选，再批量分析命中的股票')
     parser.add_argument('--date', type=str, default=None, help='分析日期 (YYYY-MM-DD)，默认为今天')
     parser.add_argument('--market', type=str, default='A股', choices=['A股', '港股', '美股'], help='市场类型')
     parser.add_argument('--analysts', type=str, default='market,fundamentals', 
-                       help='要使用的分析师，用逗号分隔 (market, fundamentals)')
+                       help=f'要使用的分析师，用逗号分隔 ({", ".join(available_analysts())})')
     parser.add_argument('--image', type=str, default=None, help='要分析的图片路径（可选）')
     parser.add_argument('--depth', type=int, default=3, help='研究深度 (1-5)，默认 3')
+    parser.add_argument('--concurrency', type=int, default=4, help='批量分析时同时分析的股票数，默认 4')
+    parser.add_argument('--screen-limit', type=int, default=20, help='筛选后最多分析的股票数，默认 20')
     
     args = parser.parse_args()
     
@@ -56,15 +64,30 @@ def main():
     # 解析分析师列表
     analyst_list = [a.strip() for a in args.analysts.split(',')]
     
+    # 批量模式读取股票列表
+    tickers = None
+    if args.tickers_file:
+        tickers = load_tickers_file(args.tickers_file)
+        if not tickers:
+            logger.error(f"❌ 股票列表文件为空: {args.tickers_file}")
+            sys.exit(1)
+    if args.image and (args.tickers_file or args.screen):
+        logger.warning("⚠️ 批量模式不支持图片分析，已忽略 --image")
+    
     logger.info("=" * 60)
     logger.info("🚀 TradingMiniAgents - 股票分析开始")
     logger.info("=" * 60)
-    logger.info(f"股票代码: {args.ticker}")
+    if tickers:
+        logger.info(f"股票列表: {args.tickers_file}（{len(tickers)} 只，并发 {args.concurrency}）")
+    elif args.screen:
+        logger.info(f"筛选条件: {args.screen}（最多 {args.screen_limit} 只，并发 {args.concurrency}）")
+    else:
+        logger.info(f"股票代码: {args.ticker}")
     logger.info(f"分析日期: {analysis_date}")
     logger.info(f"市场类型: {args.market}")
     logger.info(f"分析师: {', '.join(analyst_list)}")
     logger.info(f"研究深度: {args.depth}")
-    if args.image:
+    if args.image and not (tickers or args.screen):
         logger.info(f"图片分析: {args.image}")
     logger.info("=" * 60)
     
@@ -80,16 +103,53 @@ def main():
         data_provider = StockDataProvider()
         logger.info("✅ 数据提供者初始化完成")
         
+        # 筛选模式：先用本地指标筛选，只把命中的股票交给分析师
+        if args.screen:
+            try:
+                screen_result = Screener(data_provider).screen(
+                    args.screen, market=args.market, date=analysis_date, limit=args.screen_limit
+                )
+            except ExpressionError as e:
+                logger.error(f"❌ 筛选表达式错误: {e}")
+                sys.exit(1)
+            for hit in screen_result.hits:
+                logger.info(f"🔍 {hit['ticker']} {hit['name'] or ''} 收盘 {hit['close']} 涨跌幅 {hit['pct_change']}%")
+            tickers = screen_result.tickers
+            if not tickers:
+                logger.info(f"筛选完成，没有股票满足条件: {args.screen}")
+                return
+        
         # 分析师管理器
         analyst_manager = AnalystManager(llm_client, data_provider)
         logger.info("✅ 分析师管理器初始化完成")
         
-        # MongoDB 存储
-        mongodb_storage = MongoDBStorage()
-        if mongodb_storage.connected:
-            logger.info("✅ MongoDB 存储初始化完成")
+        # 存储（STORAGE_BACKEND 选择 MongoDB 或 SQLite）
+        report_storage = create_storage_from_env()
+        if report_storage.connected:
+            logger.info(f"✅ 存储初始化完成: {type(report_storage).__name__}")
+        elif report_storage.accepts_writes:
+            logger.warning("⚠️ 存储未连接，分析结果将暂存到本地日志，恢复连接后写入")
         else:
-            logger.warning("⚠️ MongoDB 未连接，分析结果将不会保存到数据库")
+            logger.warning("⚠️ 存储未连接，分析结果将不会保存到数据库")
+        
+        # 批量分析：共享 LLM 客户端、数据提供者和存储连接
+        if tickers:
+            batch_analyzer = BatchAnalyzer(analyst_manager, report_storage, max_concurrency=args.concurrency)
+            results = batch_analyzer.run(
+                tickers=tickers,
+                date=analysis_date,
+                market=args.market,
+                analysts=analyst_list,
+                research_depth=args.depth
+            )
+            
+            failed = [r for r in results if not r['success']]
+            logger.info("=" * 60)
+            logger.info(f"✅ 批量分析完成: 成功 {len(results) - len(failed)}，失败 {len(failed)}")
+            for result in failed:
+                logger.warning(f"⚠️ {result['ticker']}: {result['error']}")
+            logger.info("=" * 60)
+            return
         
         # 图片分析（如果提供）
         image_analysis = None
@@ -126,10 +186,10 @@ def main():
             logger.info(f"{'=' * 60}")
             print(f"\n{report}\n")
         
-        # 保存到 MongoDB
-        if mongodb_storage.connected:
-            logger.info("💾 保存分析结果到 MongoDB...")
-            success = mongodb_storage.save_analysis_report(
+        # 保存到存储
+        if report_storage.accepts_writes:
+            logger.info("💾 保存分析结果到存储...")
+            success = report_storage.save_analysis_report(
                 stock_symbol=args.ticker,
                 analysis_date=analysis_date,
                 market=args.market,
@@ -139,9 +199,9 @@ def main():
                 image_analysis=image_analysis
             )
             if success:
-                logger.info("✅ 分析结果已保存到 MongoDB")
+                logger.info("✅ 分析结果已保存到存储")
             else:
-                logger.warning("⚠️ 保存到 MongoDB 失败")
+                logger.warning("⚠️ 保存到存储失败")
         
         logger.info("=" * 60)
         logger.info("✅ 分析完成！")
@@ -155,8 +215,8 @@ def main():
         sys.exit(1)
     finally:
         # 清理资源
-        if 'mongodb_storage' in locals():
-            mongodb_storage.close()
+        if 'report_storage' in locals():
+            report_storage.close()
 
 
 if __name__ == "__main__":
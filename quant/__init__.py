@@ -0,0 +1,3 @@
+"""
+量化交易模块
+"""
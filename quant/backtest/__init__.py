@@ -0,0 +1,3 @@
+"""
+回测引擎
+"""
@@ -0,0 +1,284 @@
+"""
+向量化回测引擎
+
+信号 -> 持仓 -> 收益全部在 (T, N) 数组上计算，没有逐 K 线的 Python 循环，
+一次调用即可对上百只股票运行同一策略（每只股票一列，各自独立核算）。
+
+交易模型：
+- 策略在第 t 根 K 线收盘后给出目标仓位（占该股票账户净值的比例），在第 t+1 根 K 线开盘成交
+- 每根 K 线至多成交一次，当日买入的仓位最早在下一交易日卖出，天然满足 A 股 T+1
+- 成本：买卖双边佣金和滑点，另按市场收取买入/卖出印花税
+- A 股：不允许做空；开盘价触及涨停时无法买入、触及跌停时无法卖出；停牌日无法交易
+- 被阻止的调仓保持原有仓位，直到下一个可成交的交易日
+"""
+
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .data import PriceArrays
+from .metrics import compute_metrics, trade_ratios, trade_statistics
+
+logger = logging.getLogger(__name__)
+
+# 策略：(行情数组, **参数) -> 目标仓位 (T, N)，取值 [-1, 1]，NaN 表示维持上一个目标仓位
+Strategy = Callable[..., np.ndarray]
+
+# 前复权价格与交易所涨跌停价存在舍入误差，判断涨跌停时留出的容差
+LIMIT_TOLERANCE = 0.002
+
+_MARKET_DEFAULTS = {
+    "A股": {"sell_tax": 0.0005, "price_limit": True, "periods_per_year": 244},
+    "港股": {"commission": 0.0003, "buy_tax": 0.001, "sell_tax": 0.001},
+    "美股": {"commission": 0.0},
+}
+
+
+def a_share_limit_pct(ticker: str) -> float:
+    """A 股涨跌幅限制：科创板、创业板 20%，北交所 30%，其余 10%"""
+    code = ticker.split(".")[0]
+    if code.startswith(("688", "689", "300", "301")):
+        return 0.20
+    if code.startswith(("8", "4", "92")):
+        return 0.30
+    return 0.10
+
+
+@dataclass
+class BacktestConfig:
+    """回测参数"""
+    initial_cash: float = 100000.0
+    # 佣金、印花税、滑点均为成交金额的比例
+    commission: float = 0.00025
+    buy_tax: float = 0.0
+    sell_tax: float = 0.0
+    slippage: float = 0.001
+    allow_short: bool = False
+    # 是否应用涨跌停规则；limit_pct 为空时按股票代码所属板块确定
+    price_limit: bool = False
+    limit_pct: Optional[float] = None
+    periods_per_year: int = 252
+
+    @classmethod
+    def for_market(cls, market: str, **overrides) -> "BacktestConfig":
+        """按市场的交易规则生成默认参数"""
+        return cls(**{**_MARKET_DEFAULTS.get(market, {}), **overrides})
+
+
+@dataclass
+class BacktestResult:
+    """回测结果，数组形状均为 (T, N)，metrics 中每个指标为 (N,)"""
+    tickers: List[str]
+    dates: np.ndarray
+    positions: np.ndarray
+    returns: np.ndarray
+    equity: np.ndarray
+    metrics: Dict[str, np.ndarray]
+    config: BacktestConfig = field(default_factory=BacktestConfig)
+
+    def summary(self, ticker: str) -> Dict:
+        """单只股票的指标"""
+        j = self.tickers.index(ticker)
+        return {"ticker": ticker, **{name: _to_python(values[j]) for name, values in self.metrics.items()}}
+
+    def to_records(self, sort_by: Optional[str] = None, descending: bool = True) -> List[Dict]:
+        """
+        每只股票一条指标记录
+
+        Args:
+            sort_by: 排序指标（可选）
+            descending: 是否降序
+        """
+        records = [self.summary(t) for t in self.tickers]
+        if sort_by:
+            records.sort(key=lambda r: r[sort_by], reverse=descending)
+        return records
+
+    def since(self, start: int) -> "BacktestResult":
+        """
+        只保留第 start 根 K 线之后的部分，净值从初始资金重新起算
+
+        用于前面的数据只作为指标预热、从中间某天开始评估的场景（如滚动优化的样本外区间）。
+        """
+        returns = self.returns[start:]
+        positions = self.positions[start:]
+        equity = self.config.initial_cash * np.cumprod(1 + returns, axis=0)
+        return BacktestResult(
+            tickers=self.tickers,
+            dates=self.dates[start:],
+            positions=positions,
+            returns=returns,
+            equity=equity,
+            metrics=compute_metrics(returns, equity, positions, self.config.initial_cash, self.config.periods_per_year),
+            config=self.config,
+        )
+
+    def portfolio(self) -> Dict:
+        """
+        等权组合（每日再平衡到各股票等权）的指标
+
+        收益、风险类指标由等权净值曲线计算；交易类指标（胜率、盈亏比、交易笔数、换手率）
+        由各股票自己的逐笔交易汇总，平均后的小数仓位无法切分出真实的交易。
+        """
+        if not self.tickers:
+            return {}
+        returns = self.returns.mean(axis=1, keepdims=True)
+        equity = self.config.initial_cash * np.cumprod(1 + returns, axis=0)
+        positions = self.positions.mean(axis=1, keepdims=True)
+        metrics = compute_metrics(returns, equity, positions, self.config.initial_cash, self.config.periods_per_year)
+
+        stats = trade_statistics(self.positions, self.equity, self.config.initial_cash)
+        metrics.update(trade_ratios({name: values.sum(keepdims=True) for name, values in stats.items()}))
+        metrics["turnover"] = self.metrics["turnover"].sum(keepdims=True)
+        return {name: _to_python(values[0]) for name, values in metrics.items()}
+
+
+def _to_python(value):
+    """NumPy 标量转为可 JSON 序列化的 Python 类型"""
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        value = float(value)
+        return None if np.isnan(value) or np.isinf(value) else value
+    return value
+
+
+def _shift(arr: np.ndarray, fill: float) -> np.ndarray:
+    """沿时间轴后移一根 K 线"""
+    out = np.empty_like(arr)
+    out[:1] = fill
+    out[1:] = arr[:-1]
+    return out
+
+
+def _ffill(arr: np.ndarray) -> np.ndarray:
+    """沿时间轴前向填充 NaN（开头的 NaN 保持不变）"""
+    valid = ~np.isnan(arr)
+    index = np.where(valid, np.arange(arr.shape[0])[:, None], 0)
+    np.maximum.accumulate(index, axis=0, out=index)
+    return np.take_along_axis(arr, index, axis=0)
+
+
+def _resolve_positions(desired: np.ndarray, tradable: np.ndarray, up_locked: np.ndarray, down_locked: np.ndarray) -> np.ndarray:
+    """
+    根据可交易性确定实际持仓
+
+    held[t] = desired[t]（可成交）或 held[t-1]（被阻止）。是否被阻止取决于调仓方向，
+    即依赖 held[t-1]；这里用不动点迭代代替逐 K 线循环：每轮用上一轮的持仓判断方向，
+    再把被阻止的位置置为 NaN 后前向填充。每轮至少修正最早一处不一致，通常两三轮即收敛。
+    """
+    held = desired
+    for _ in range(desired.shape[0] + 1):
+        prev = _shift(held, 0.0)
+        blocked = (
+            (~tradable & (desired != prev))
+            | (up_locked & (desired > prev))
+            | (down_locked & (desired < prev))
+        )
+        resolved = np.nan_to_num(_ffill(np.where(blocked, np.nan, desired)), nan=0.0)
+        if np.array_equal(resolved, held):
+            return held
+        held = resolved
+    return held
+
+
+class BacktestEngine:
+    """向量化回测引擎"""
+
+    def __init__(self, config: Optional[BacktestConfig] = None):
+        """
+        初始化回测引擎
+
+        Args:
+            config: 回测参数（默认按行情所属市场生成）
+        """
+        self.config = config
+
+    def run(self, prices: PriceArrays, strategy: Strategy, **params) -> BacktestResult:
+        """
+        对所有股票运行同一策略
+
+        Args:
+            prices: 对齐后的行情数组
+            strategy: 策略函数
+            **params: 策略参数
+
+        Returns:
+            回测结果
+        """
+        return self.run_positions(prices, strategy(prices, **params))
+
+    def run_positions(self, prices: PriceArrays, target: np.ndarray) -> BacktestResult:
+        """
+        按目标仓位回测
+
+        Args:
+            prices: 对齐后的行情数组
+            target: 每根 K 线收盘后的目标仓位 (T, N)
+
+        Returns:
+            回测结果
+        """
+        started = time.perf_counter()
+        config = self.config or BacktestConfig.for_market(prices.market)
+        T, N = prices.shape
+
+        target = np.asarray(target, dtype=np.float64)
+        if target.ndim == 1:
+            target = target[:, None]
+        if target.shape != (T, N):
+            raise ValueError(f"目标仓位形状 {target.shape} 与行情 {(T, N)} 不一致")
+
+        lower = -1.0 if config.allow_short else 0.0
+        target = np.clip(np.nan_to_num(_ffill(target), nan=0.0), lower, 1.0)
+        # 收盘后的信号在下一根 K 线开盘成交
+        desired = _shift(target, 0.0)
+
+        close = _ffill(prices.close)
+        prev_close = _shift(close, np.nan)
+        open_ = np.where(np.isnan(prices.open), close, prices.open)
+        tradable = ~np.isnan(prices.open) & ~np.isnan(prices.close) & ~(prices.volume <= 0)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            gap = open_ / prev_close - 1
+            if config.price_limit:
+                if config.limit_pct is not None:
+                    limit = np.full(N, config.limit_pct)
+                else:
+                    limit = np.array([a_share_limit_pct(t) for t in prices.tickers])
+                up_locked = gap >= limit - LIMIT_TOLERANCE
+                down_locked = gap <= -(limit - LIMIT_TOLERANCE)
+            else:
+                up_locked = down_locked = np.zeros((T, N), dtype=bool)
+
+            held = _resolve_positions(desired, tradable, up_locked, down_locked)
+            prev_held = _shift(held, 0.0)
+
+            overnight = np.nan_to_num(gap, nan=0.0, posinf=0.0, neginf=0.0)
+            intraday = np.nan_to_num(close / open_ - 1, nan=0.0, posinf=0.0, neginf=0.0)
+
+        trade = held - prev_held
+        cost = (
+            np.maximum(trade, 0) * (config.commission + config.buy_tax + config.slippage)
+            + np.maximum(-trade, 0) * (config.commission + config.sell_tax + config.slippage)
+        )
+        # 隔夜收益属于调仓前的仓位，日内收益属于调仓后的仓位
+        returns = (1 + prev_held * overnight) * (1 + held * intraday - cost) - 1
+        equity = config.initial_cash * np.cumprod(1 + returns, axis=0)
+
+        metrics = compute_metrics(returns, equity, held, config.initial_cash, config.periods_per_year)
+        elapsed = (time.perf_counter() - started) * 1000
+        logger.debug(f"📊 回测完成: {N} 只股票 × {T} 个交易日，耗时 {elapsed:.1f}ms")
+
+        return BacktestResult(
+            tickers=list(prices.tickers),
+            dates=prices.dates,
+            positions=held,
+            returns=returns,
+            equity=equity,
+            metrics=metrics,
+            config=config,
+        )
@@ -0,0 +1,109 @@
+"""
+回测行情数据
+
+把 StockDataProvider.get_panel 返回的截面面板拆成按字段的 (T, N) NumPy 数组，
+回测、参数扫描都直接在数组上计算。某只股票在某个交易日没有数据（未上市、停牌）时为 NaN。
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from data.panel import Panel
+
+PRICE_FIELDS = ("open", "high", "low", "close", "volume")
+
+
+@dataclass
+class PriceArrays:
+    """按交易日对齐的多只股票行情，价格字段的形状均为 (T, N)"""
+    dates: np.ndarray
+    tickers: List[str]
+    market: str
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    @property
+    def shape(self):
+        return self.close.shape
+
+    def field(self, name: str) -> np.ndarray:
+        """按名称取字段数组"""
+        if name not in PRICE_FIELDS:
+            raise KeyError(f"未知的行情字段: {name}")
+        return getattr(self, name)
+
+    def slice(self, start: int, stop: int) -> "PriceArrays":
+        """按交易日下标截取 [start, stop) 区间（返回视图，不复制数据）"""
+        return PriceArrays(
+            dates=self.dates[start:stop],
+            tickers=self.tickers,
+            market=self.market,
+            **{name: getattr(self, name)[start:stop] for name in PRICE_FIELDS},
+        )
+
+    def select(self, tickers: Sequence[str]) -> "PriceArrays":
+        """按股票代码选取子集"""
+        index = {t: i for i, t in enumerate(self.tickers)}
+        cols = [index[t] for t in tickers]
+        return PriceArrays(
+            dates=self.dates,
+            tickers=list(tickers),
+            market=self.market,
+            **{name: getattr(self, name)[:, cols] for name in PRICE_FIELDS},
+        )
+
+    @classmethod
+    def from_panel(cls, panel: Panel) -> "PriceArrays":
+        """由截面面板构建（面板需包含全部行情字段，停牌日应为 NaN，即构建面板时 ffill=False）"""
+        return cls(
+            dates=panel.dates,
+            tickers=list(panel.tickers),
+            market=panel.market,
+            **{name: np.ascontiguousarray(panel.field(name), dtype=np.float64) for name in PRICE_FIELDS},
+        )
+
+    @classmethod
+    def from_frames(cls, frames: Dict[str, pd.DataFrame], market: str = "A股") -> "PriceArrays":
+        """
+        由多只股票的标准化日线构建对齐数组
+
+        Args:
+            frames: {ticker: 标准化日线 DataFrame}
+            market: 市场类型
+
+        Returns:
+            对齐后的行情数组，交易日为所有股票交易日的并集
+        """
+        return cls.from_panel(Panel.from_frames(frames, market, PRICE_FIELDS, ffill=False))
+
+
+def load_price_arrays(
+    provider,
+    tickers: Sequence[str],
+    date: str,
+    market: str = "A股",
+    days: int = 365 * 3,
+    max_workers: int = 8
+) -> PriceArrays:
+    """
+    通过 StockDataProvider 获取多只股票按交易日历对齐的行情（优先命中本地 OHLCV 缓存）
+
+    Args:
+        provider: StockDataProvider 实例
+        tickers: 股票代码列表
+        date: 结束日期（含）
+        market: 市场类型
+        days: 历史数据天数
+        max_workers: 并发拉取的线程数
+
+    Returns:
+        对齐后的行情数组（获取失败的股票会被跳过）
+    """
+    panel = provider.get_panel(tickers, date, market, days, fields=PRICE_FIELDS, ffill=False, max_workers=max_workers)
+    return PriceArrays.from_panel(panel)
@@ -0,0 +1,140 @@
+"""
+回测绩效指标
+
+所有指标按列（每只股票一列）向量化计算，输入为 (T, N) 的日收益率、净值和持仓数组，
+输出为 {指标名: (N,) 数组}。
+"""
+
+from typing import Dict
+
+import numpy as np
+
+
+def max_drawdown(equity: np.ndarray) -> np.ndarray:
+    """最大回撤（负数，如 -0.2 表示回撤 20%）"""
+    if equity.shape[0] == 0:
+        return np.zeros(equity.shape[1:])
+    running_max = np.maximum.accumulate(equity, axis=0)
+    return (equity / running_max - 1).min(axis=0)
+
+
+def round_trips(positions: np.ndarray, equity: np.ndarray, initial_cash: float):
+    """
+    按持仓区间切分交易，计算每笔交易的收益率
+
+    持仓从 0 变为非 0 视为开仓，回到 0 或方向反转视为平仓；回测结束时仍持有的仓位按最后一根 K 线平仓。
+
+    Returns:
+        (交易所属的列下标, 每笔交易的收益率)
+    """
+    T, N = positions.shape
+    if T == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+
+    side = np.sign(positions)
+    prev_side = np.vstack([np.zeros((1, N)), side[:-1]])
+    # 开仓：由空仓或反方向变为持仓；平仓：上一根 K 线有持仓且本根持仓方向改变
+    entries = (side != 0) & (side != prev_side)
+    exits = (prev_side != 0) & (side != prev_side)
+
+    # 最后仍持仓时在末尾补一个平仓点（下标 T）
+    exits = np.vstack([exits, (side[-1] != 0)[None, :]])
+
+    # 列优先展开，保证同一列的开仓、平仓按时间排序后一一对应
+    entry_col, entry_t = np.nonzero(entries.T)
+    exit_col, exit_t = np.nonzero(exits.T)
+
+    # 净值前补一行初始资金，equity_ext[t] 为第 t 根 K 线开盘前（上一根收盘）的净值；
+    # 平仓发生在第 t 根 K 线开盘，平仓收益取到该 K 线收盘，包含隔夜跳空和卖出成本
+    equity_ext = np.vstack([np.full((1, N), initial_cash), equity])
+    start_value = equity_ext[entry_t, entry_col]
+    end_value = equity_ext[np.minimum(exit_t + 1, T), exit_col]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        trade_returns = np.where(start_value > 0, end_value / start_value - 1, 0.0)
+    return entry_col, trade_returns
+
+
+def trade_statistics(positions: np.ndarray, equity: np.ndarray, initial_cash: float) -> Dict[str, np.ndarray]:
+    """
+    按列统计逐笔交易：交易笔数、盈利笔数、盈利合计、亏损合计（负数）
+
+    Returns:
+        统计项名称 -> (N,) 数组；各项可跨列相加后再用 trade_ratios 计算组合层面的胜率和盈亏比
+    """
+    N = positions.shape[1]
+    trade_col, trade_returns = round_trips(positions, equity, initial_cash)
+    return {
+        "trades": np.bincount(trade_col, minlength=N),
+        "wins": np.bincount(trade_col, weights=(trade_returns > 0).astype(np.float64), minlength=N),
+        "gains": np.bincount(trade_col, weights=np.maximum(trade_returns, 0), minlength=N),
+        "losses": np.bincount(trade_col, weights=np.minimum(trade_returns, 0), minlength=N),
+    }
+
+
+def trade_ratios(stats: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """由 trade_statistics 的统计项计算胜率和盈亏比"""
+    trades, wins, gains, losses = stats["trades"], stats["wins"], stats["gains"], stats["losses"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        win_rate = np.where(trades > 0, wins / trades, 0.0)
+        profit_factor = np.where(losses < 0, gains / -losses, np.where(gains > 0, np.inf, 0.0))
+    return {"win_rate": win_rate, "profit_factor": profit_factor, "trades_count": trades}
+
+
+def compute_metrics(
+    returns: np.ndarray,
+    equity: np.ndarray,
+    positions: np.ndarray,
+    initial_cash: float,
+    periods_per_year: int = 252
+) -> Dict[str, np.ndarray]:
+    """
+    计算全部绩效指标
+
+    Args:
+        returns: 每根 K 线的策略收益率 (T, N)
+        equity: 净值曲线 (T, N)
+        positions: 实际持仓权重 (T, N)
+        initial_cash: 初始资金
+        periods_per_year: 每年交易日数
+
+    Returns:
+        指标名称 -> (N,) 数组
+    """
+    T, N = returns.shape
+    final_equity = equity[-1] if T else np.full(N, float(initial_cash))
+    total_return = final_equity / initial_cash - 1
+
+    years = T / periods_per_year if T else np.nan
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        annual_return = np.where(total_return > -1, np.power(1 + total_return, 1 / years) - 1, -1.0)
+
+        mean = returns.mean(axis=0) if T else np.zeros(N)
+        std = returns.std(axis=0) if T else np.zeros(N)
+        downside = np.sqrt((np.minimum(returns, 0) ** 2).mean(axis=0)) if T else np.zeros(N)
+        sharpe = np.where(std > 0, mean / std * np.sqrt(periods_per_year), 0.0)
+        sortino = np.where(downside > 0, mean / downside * np.sqrt(periods_per_year), 0.0)
+
+        mdd = max_drawdown(equity) if T else np.zeros(N)
+        calmar = np.where(mdd < 0, annual_return / np.abs(mdd), 0.0)
+
+    prev_positions = np.vstack([np.zeros((1, N)), positions[:-1]]) if T else positions
+    turnover = np.abs(positions - prev_positions).sum(axis=0)
+    exposure = (positions != 0).mean(axis=0) if T else np.zeros(N)
+
+    ratios = trade_ratios(trade_statistics(positions, equity, initial_cash))
+
+    return {
+        "total_return": total_return,
+        "annual_return": annual_return,
+        "volatility": std * np.sqrt(periods_per_year),
+        "sharpe_ratio": sharpe,
+        "sortino_ratio": sortino,
+        "max_drawdown": mdd,
+        "calmar_ratio": calmar,
+        "win_rate": ratios["win_rate"],
+        "profit_factor": ratios["profit_factor"],
+        "trades_count": ratios["trades_count"],
+        "turnover": turnover,
+        "exposure": exposure,
+        "final_equity": final_equity,
+    }
@@ -0,0 +1,511 @@
+"""
+策略参数优化
+
+在进程池中并行运行参数扫描（网格 / 随机 / 贝叶斯）和滚动优化（walk-forward）：
+- 行情数组只在主进程写入一次共享内存，工作进程直接映射为 NumPy 视图，任务之间只传递参数和指标
+- 结果按完成顺序流式返回（iter_* 方法为生成器），可以边跑边展示
+- 贝叶斯优化使用 optuna（可选依赖），未安装时退化为随机搜索
+"""
+
+import os
+import math
+import time
+import random
+import itertools
+import logging
+from concurrent.futures import Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .data import PriceArrays, PRICE_FIELDS
+from .backtest_engine import BacktestConfig, BacktestEngine, Strategy
+
+logger = logging.getLogger(__name__)
+
+# 参数空间：{参数名: 候选值列表 或 (下限, 上限) 区间}；区间两端都是整数时按整数采样
+ParamSpace = Dict[str, Union[Sequence[Any], Tuple[float, float]]]
+
+# 评估区间：(起始下标, 结束下标, 开始计入指标的下标)，前一段只用于指标预热
+Window = Tuple[int, int, int]
+
+METHOD_GRID = "grid"
+METHOD_RANDOM = "random"
+METHOD_BAYES = "bayes"
+
+
+def _default_workers() -> int:
+    """读取环境变量 OPTIMIZER_MAX_WORKERS，默认使用全部 CPU 核心"""
+    try:
+        return max(1, int(os.getenv("OPTIMIZER_MAX_WORKERS", str(os.cpu_count() or 1))))
+    except ValueError:
+        return os.cpu_count() or 1
+
+
+@dataclass
+class SweepResult:
+    """单次参数评估的结果"""
+    params: Dict[str, Any]
+    value: Optional[float]
+    metrics: Dict[str, Any] = field(default_factory=dict)
+    # 样本内/样本外区间的日期（ISO 格式）
+    period: Tuple[str, str] = ("", "")
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "params": self.params,
+            "value": self.value,
+            "metrics": self.metrics,
+            "period": list(self.period),
+            "error": self.error,
+            "elapsed": round(self.elapsed, 4),
+        }
+
+
+@dataclass
+class WalkForwardStep:
+    """滚动优化的一个窗口：样本内最优参数及其样本外表现"""
+    index: int
+    best: SweepResult
+    out_of_sample: SweepResult
+    evaluated: int
+
+    def to_dict(self) -> Dict:
+        return {
+            "index": self.index,
+            "params": self.best.params,
+            "in_sample": self.best.to_dict(),
+            "out_of_sample": self.out_of_sample.to_dict(),
+            "evaluated": self.evaluated,
+        }
+
+
+# ==================== 参数空间 ====================
+
+def _is_range(spec) -> bool:
+    return isinstance(spec, tuple) and len(spec) == 2 and all(isinstance(v, (int, float)) for v in spec)
+
+
+def grid_params(space: ParamSpace) -> Iterator[Dict[str, Any]]:
+    """网格搜索：所有候选值的笛卡尔积（区间参数按整数展开）"""
+    names = list(space)
+    values = []
+    for name in names:
+        spec = space[name]
+        if _is_range(spec):
+            low, high = spec
+            if not (isinstance(low, int) and isinstance(high, int)):
+                raise ValueError(f"网格搜索不支持连续区间参数: {name}")
+            spec = range(low, high + 1)
+        values.append(list(spec))
+    for combo in itertools.product(*values):
+        yield dict(zip(names, combo))
+
+
+def sample_params(space: ParamSpace, rng: random.Random) -> Dict[str, Any]:
+    """随机搜索：每个参数独立均匀采样"""
+    params = {}
+    for name, spec in space.items():
+        if _is_range(spec):
+            low, high = spec
+            if isinstance(low, int) and isinstance(high, int):
+                params[name] = rng.randint(low, high)
+            else:
+                params[name] = rng.uniform(low, high)
+        else:
+            params[name] = rng.choice(list(spec))
+    return params
+
+
+def _suggest_params(trial, space: ParamSpace) -> Dict[str, Any]:
+    """由 optuna trial 生成参数"""
+    params = {}
+    for name, spec in space.items():
+        if _is_range(spec):
+            low, high = spec
+            if isinstance(low, int) and isinstance(high, int):
+                params[name] = trial.suggest_int(name, low, high)
+            else:
+                params[name] = trial.suggest_float(name, low, high)
+        else:
+            params[name] = trial.suggest_categorical(name, list(spec))
+    return params
+
+
+# ==================== 共享内存 ====================
+
+class SharedPriceArrays:
+    """
+    把行情数组放入共享内存
+
+    所有字段堆叠为一个 (字段数, T, N) 的 float64 块；日期和股票代码体积很小，随进程初始化参数传递。
+    作为上下文管理器使用，退出时释放共享内存。
+    """
+
+    def __init__(self, prices: PriceArrays):
+        self.prices = prices
+        self.shape = prices.shape
+        nbytes = max(1, len(PRICE_FIELDS) * int(np.prod(self.shape)) * 8)
+        self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        block = np.ndarray((len(PRICE_FIELDS),) + self.shape, dtype=np.float64, buffer=self.shm.buf)
+        for i, name in enumerate(PRICE_FIELDS):
+            block[i] = prices.field(name)
+        del block
+
+    def initargs(self) -> tuple:
+        return (self.shm.name, self.shape, self.prices.dates, list(self.prices.tickers), self.prices.market)
+
+    def close(self) -> None:
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "SharedPriceArrays":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """工作进程映射共享内存（由主进程负责释放，工作进程不登记到资源回收器）"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.13 以前没有 track 参数，映射时会自动登记到资源回收器，导致退出时的泄漏警告和重复 unlink。
+        # 映射后再注销不可行：进程池与主进程共用同一个回收器，按名称注销会连主进程的登记一起删除，
+        # 因此映射期间跳过登记（工作进程初始化时是单线程的）
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+# 工作进程内的全局状态，由 _init_worker 设置
+_worker_shm: Optional[shared_memory.SharedMemory] = None
+_worker_prices: Optional[PriceArrays] = None
+_worker_engine: Optional[BacktestEngine] = None
+
+
+def _init_worker(shm_name: str, shape: tuple, dates, tickers: List[str], market: str, config: Optional[BacktestConfig]) -> None:
+    global _worker_shm, _worker_prices, _worker_engine
+    # 保留 SharedMemory 对象的引用，否则被回收后视图会失效
+    _worker_shm = _attach(shm_name)
+    block = np.ndarray((len(PRICE_FIELDS),) + tuple(shape), dtype=np.float64, buffer=_worker_shm.buf)
+    _worker_prices = PriceArrays(dates, tickers, market, *block)
+    _worker_engine = BacktestEngine(config)
+
+
+def _evaluate(
+    prices: PriceArrays,
+    engine: BacktestEngine,
+    strategy: Strategy,
+    params: Dict[str, Any],
+    window: Window,
+    objective: str
+) -> SweepResult:
+    """在给定区间上回测一组参数，返回等权组合的指标"""
+    started = time.perf_counter()
+    start, stop, eval_start = window
+    dates = prices.dates[eval_start:stop]
+    period = (str(dates[0])[:10], str(dates[-1])[:10]) if len(dates) else ("", "")
+    try:
+        result = engine.run(prices.slice(start, stop), strategy, **params)
+        if eval_start > start:
+            result = result.since(eval_start - start)
+        metrics = result.portfolio()
+        value = metrics.get(objective)
+        return SweepResult(params, value, metrics, period, elapsed=time.perf_counter() - started)
+    except Exception as e:
+        return SweepResult(params, None, {}, period, error=f"{type(e).__name__}: {e}", elapsed=time.perf_counter() - started)
+
+
+def _evaluate_in_worker(strategy: Strategy, params: Dict[str, Any], window: Window, objective: str) -> SweepResult:
+    return _evaluate(_worker_prices, _worker_engine, strategy, params, window, objective)
+
+
+def _score(result: SweepResult) -> float:
+    """排序用的得分，失败或无效结果排在最后"""
+    if result.value is None or (isinstance(result.value, float) and math.isnan(result.value)):
+        return -math.inf
+    return float(result.value)
+
+
+# ==================== 优化器 ====================
+
+class StrategyOptimizer:
+    """
+    策略参数优化器
+
+    目标指标取等权组合的绩效（默认夏普比率），越大越好；
+    如需以回撤为目标，max_drawdown 为负数，同样是越大越好。
+    """
+
+    def __init__(
+        self,
+        prices: PriceArrays,
+        strategy: Strategy,
+        config: Optional[BacktestConfig] = None,
+        objective: str = "sharpe_ratio",
+        max_workers: Optional[int] = None
+    ):
+        """
+        初始化优化器
+
+        Args:
+            prices: 对齐后的行情数组
+            strategy: 策略函数（必须是模块级函数，才能传给工作进程）
+            config: 回测参数（默认按市场生成）
+            objective: 优化目标指标
+            max_workers: 工作进程数（默认读取 OPTIMIZER_MAX_WORKERS，否则为 CPU 核心数）
+        """
+        self.prices = prices
+        self.strategy = strategy
+        self.config = config
+        self.objective = objective
+        self.max_workers = max_workers or _default_workers()
+
+    # ==================== 参数扫描 ====================
+
+    def iter_sweep(
+        self,
+        space: ParamSpace,
+        method: str = METHOD_GRID,
+        n_iter: int = 100,
+        window: Optional[Window] = None,
+        constraint: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        seed: Optional[int] = None
+    ) -> Iterator[SweepResult]:
+        """
+        参数扫描，按完成顺序逐个返回结果
+
+        Args:
+            space: 参数空间
+            method: grid / random / bayes
+            n_iter: 随机和贝叶斯搜索的评估次数（网格搜索忽略）
+            window: 评估区间（默认全部数据）
+            constraint: 参数约束，返回 False 的组合会被跳过（如 fast < slow）
+            seed: 随机种子
+
+        Yields:
+            每组参数的评估结果
+        """
+        window = window or (0, self.prices.shape[0], 0)
+        with self._session() as submit:
+            yield from self._sweep(submit, space, method, n_iter, window, constraint, seed)
+
+    def sweep(self, space: ParamSpace, method: str = METHOD_GRID, n_iter: int = 100, **kwargs) -> List[SweepResult]:
+        """参数扫描，返回按目标指标降序排列的全部结果"""
+        results = list(self.iter_sweep(space, method, n_iter, **kwargs))
+        results.sort(key=_score, reverse=True)
+        return results
+
+    def _sweep(self, submit, space, method, n_iter, window, constraint, seed) -> Iterator[SweepResult]:
+        started = time.perf_counter()
+        count = 0
+
+        if method == METHOD_BAYES:
+            try:
+                import optuna
+            except ImportError:
+                logger.warning("⚠️ 未安装 optuna，贝叶斯优化退化为随机搜索")
+                method = METHOD_RANDOM
+            else:
+                for result in self._bayes(submit, optuna, space, n_iter, window, constraint, seed):
+                    count += 1
+                    yield result
+                self._log_done(count, started)
+                return
+
+        if method == METHOD_GRID:
+            candidates = grid_params(space)
+        elif method == METHOD_RANDOM:
+            rng = random.Random(seed)
+            candidates = (sample_params(space, rng) for _ in range(n_iter))
+        else:
+            raise ValueError(f"未知的优化方法: {method}")
+
+        if constraint is not None:
+            candidates = (p for p in candidates if constraint(p))
+
+        for result in self._map(submit, candidates, window):
+            count += 1
+            yield result
+        self._log_done(count, started)
+
+    def _bayes(self, submit, optuna, space, n_iter, window, constraint, seed) -> Iterator[SweepResult]:
+        """贝叶斯优化：同时在途的试验数等于进程数，每完成一个就把结果反馈给采样器"""
+        optuna.logging.set_verbosity(optuna.logging.WARNING)
+        study = optuna.create_study(direction="maximize", sampler=optuna.samplers.TPESampler(seed=seed))
+        pending = {}
+        asked = 0
+        while asked < n_iter or pending:
+            while asked < n_iter and len(pending) < self.max_workers:
+                trial = study.ask()
+                asked += 1
+                params = _suggest_params(trial, space)
+                if constraint is not None and not constraint(params):
+                    study.tell(trial, state=optuna.trial.TrialState.PRUNED)
+                    continue
+                pending[submit(params, window)] = trial
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                trial = pending.pop(future)
+                result = future.result()
+                if result.value is None:
+                    study.tell(trial, state=optuna.trial.TrialState.FAIL)
+                else:
+                    study.tell(trial, float(result.value))
+                yield result
+
+    def _map(self, submit, candidates, window: Window) -> Iterator[SweepResult]:
+        """提交候选参数并按完成顺序返回；在途任务数有上限，参数组合很多时也不会一次性全部提交"""
+        limit = self.max_workers * 4
+        pending = set()
+        candidates = iter(candidates)
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < limit:
+                try:
+                    params = next(candidates)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.add(submit(params, window))
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if result.error:
+                    logger.warning(f"⚠️ 参数 {result.params} 回测失败: {result.error}")
+                yield result
+
+    # ==================== 滚动优化 ====================
+
+    def iter_walk_forward(
+        self,
+        space: ParamSpace,
+        train_bars: int,
+        test_bars: int,
+        step: Optional[int] = None,
+        warmup_bars: int = 0,
+        method: str = METHOD_GRID,
+        n_iter: int = 100,
+        constraint: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        seed: Optional[int] = None
+    ) -> Iterator[WalkForwardStep]:
+        """
+        滚动优化：在样本内区间寻找最优参数，在紧随其后的样本外区间检验
+
+        Args:
+            space: 参数空间
+            train_bars: 样本内 K 线数
+            test_bars: 样本外 K 线数
+            step: 窗口滚动步长（默认等于 test_bars，样本外区间首尾相接）
+            warmup_bars: 样本外回测额外向前取的预热 K 线数（不计入指标）
+            method: 样本内的搜索方法
+            n_iter: 样本内随机/贝叶斯搜索的评估次数
+            constraint: 参数约束
+            seed: 随机种子（第 i 个窗口使用 seed + i，各窗口的候选参数序列不同且可复现）
+
+        Yields:
+            每个窗口的优化结果
+        """
+        step = step or test_bars
+        total = self.prices.shape[0]
+        if train_bars <= 0 or test_bars <= 0 or total < train_bars + test_bars:
+            raise ValueError(f"数据长度 {total} 不足以划分样本内 {train_bars} + 样本外 {test_bars} 个 K 线")
+        starts = range(0, total - train_bars - test_bars + 1, step)
+
+        with self._session() as submit:
+            for index, start in enumerate(starts):
+                train_end = start + train_bars
+                window_seed = None if seed is None else seed + index
+                results = list(self._sweep(submit, space, method, n_iter, (start, train_end, start), constraint, window_seed))
+                if not results:
+                    continue
+                best = max(results, key=_score)
+                test_window = (max(0, train_end - warmup_bars), train_end + test_bars, train_end)
+                oos = next(self._map(submit, [best.params], test_window))
+                logger.info(
+                    f"📊 滚动窗口 {index + 1}/{len(starts)}: 最优参数 {best.params}，"
+                    f"样本内 {self.objective}={best.value}，样本外 {self.objective}={oos.value}"
+                )
+                yield WalkForwardStep(index=index, best=best, out_of_sample=oos, evaluated=len(results))
+
+    def walk_forward(self, space: ParamSpace, train_bars: int, test_bars: int, **kwargs) -> List[WalkForwardStep]:
+        """滚动优化，返回全部窗口的结果"""
+        return list(self.iter_walk_forward(space, train_bars, test_bars, **kwargs))
+
+    # ==================== 执行 ====================
+
+    def _session(self):
+        """创建执行会话：多进程时建立共享内存和进程池，单进程时直接在当前进程计算"""
+        return _ProcessSession(self) if self.max_workers > 1 else _InlineSession(self)
+
+    def _log_done(self, count: int, started: float) -> None:
+        elapsed = time.perf_counter() - started
+        rate = count / elapsed if elapsed > 0 else 0.0
+        logger.info(f"✅ 参数扫描完成: {count} 组参数，耗时 {elapsed:.1f}s（{rate:.1f} 组/秒，{self.max_workers} 个进程）")
+
+
+class _ProcessSession:
+    """进程池 + 共享内存"""
+
+    def __init__(self, optimizer: StrategyOptimizer):
+        self.optimizer = optimizer
+
+    def __enter__(self):
+        opt = self.optimizer
+        self.shared = SharedPriceArrays(opt.prices)
+        try:
+            self.executor = ProcessPoolExecutor(
+                max_workers=opt.max_workers,
+                initializer=_init_worker,
+                initargs=self.shared.initargs() + (opt.config,),
+            )
+        except Exception:
+            self.shared.close()
+            raise
+
+        def submit(params, window):
+            return self.executor.submit(_evaluate_in_worker, opt.strategy, params, window, opt.objective)
+
+        return submit
+
+    def __exit__(self, *exc):
+        # 提前结束迭代时取消尚未开始的任务
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.shared.close()
+
+
+class _InlineSession:
+    """单进程：立即计算，返回已完成的 Future"""
+
+    def __init__(self, optimizer: StrategyOptimizer):
+        self.optimizer = optimizer
+
+    def __enter__(self):
+        opt = self.optimizer
+        engine = BacktestEngine(opt.config)
+
+        def submit(params, window):
+            future = Future()
+            future.set_result(_evaluate(opt.prices, engine, opt.strategy, params, window, opt.objective))
+            return future
+
+        return submit
+
+    def __exit__(self, *exc):
+        pass
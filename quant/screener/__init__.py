@@ -0,0 +1,3 @@
+"""
+选股筛选器
+"""
@@ -0,0 +1,216 @@
+"""
+筛选表达式
+
+一个很小的表达式语言，语法是 Python 表达式的安全子集，在 (T, N) 指标数组上向量化求值：
+
+- 列名：close、volume、ma20、rsi14、high_60、volume_ratio 等（见 Screener.available_fields）
+- 滞后：列名[n] 表示 n 个交易日前的值，如 high_60[1]
+- 运算：+ - * /、比较（可连写，如 30 < rsi14 < 70）、and / or / not、括号
+- 函数：abs(x)、min(a, b)、max(a, b)、cross_above(a, b)、cross_below(a, b)
+
+例：close > high_60[1] and volume_ratio > 2 （收盘价突破前 60 日最高价且放量）
+
+NaN 参与的比较结果为 False，因此数据不足的股票不会被选中。
+"""
+
+import ast
+import operator
+import functools
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, Mapping
+
+import numpy as np
+
+
+class ExpressionError(ValueError):
+    """筛选表达式不合法"""
+
+
+def _lag(x: np.ndarray, periods: int) -> np.ndarray:
+    """沿时间轴滞后 periods 个交易日"""
+    if periods == 0:
+        return x
+    out = np.full(x.shape, np.nan)
+    if periods < x.shape[0]:
+        out[periods:] = x[:-periods]
+    return out
+
+
+def _cross_above(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return (a > b) & (_lag(a, 1) <= _lag(b, 1))
+
+
+def _cross_below(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return (a < b) & (_lag(a, 1) >= _lag(b, 1))
+
+
+_FUNCTIONS: Dict[str, Callable] = {
+    "abs": np.abs,
+    "min": np.minimum,
+    "max": np.maximum,
+    "cross_above": _cross_above,
+    "cross_below": _cross_below,
+}
+FUNCTION_NAMES = tuple(_FUNCTIONS)
+_ARITY = {"abs": 1, "min": 2, "max": 2, "cross_above": 2, "cross_below": 2}
+
+_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+}
+_COMPARE_OPS = {
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+}
+
+# 单个表达式的最大长度，防止超长输入
+MAX_EXPRESSION_LENGTH = 1000
+
+
+@dataclass(frozen=True)
+class Expression:
+    """已校验的筛选表达式"""
+    text: str
+    tree: ast.Expression
+    # 表达式引用的列名
+    names: FrozenSet[str]
+
+
+def compile_expression(text: str, fields=None) -> Expression:
+    """
+    解析并校验表达式（不需要数据即可发现语法错误和未知列名）
+
+    Args:
+        text: 表达式文本
+        fields: 允许的列名集合（可选）
+
+    Returns:
+        已校验的表达式
+
+    Raises:
+        ExpressionError: 语法错误、使用了不支持的语法或未知列名
+    """
+    text = (text or "").strip()
+    if not text:
+        raise ExpressionError("筛选表达式不能为空")
+    if len(text) > MAX_EXPRESSION_LENGTH:
+        raise ExpressionError(f"筛选表达式过长（上限 {MAX_EXPRESSION_LENGTH} 个字符）")
+    try:
+        tree = ast.parse(text, mode="eval")
+    except SyntaxError as e:
+        position = f"（第 {e.offset} 个字符）" if e.offset else ""
+        raise ExpressionError(f"表达式语法错误: {e.msg}{position}") from None
+
+    names = set()
+    _validate(tree.body, names)
+    if fields is not None:
+        unknown = sorted(names - set(fields))
+        if unknown:
+            raise ExpressionError(f"未知的列: {', '.join(unknown)}")
+    return Expression(text=text, tree=tree, names=frozenset(names))
+
+
+def _validate(node: ast.AST, names: set) -> None:
+    """只允许白名单中的语法节点"""
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise ExpressionError(f"只支持数字常量: {node.value!r}")
+    elif isinstance(node, ast.Name):
+        names.add(node.id)
+    elif isinstance(node, ast.Subscript):
+        if not isinstance(node.value, ast.Name):
+            raise ExpressionError("滞后只能用于列名，如 close[1]")
+        index = node.slice
+        if not (isinstance(index, ast.Constant) and isinstance(index.value, int)
+                and not isinstance(index.value, bool) and index.value >= 0):
+            raise ExpressionError("滞后天数必须是非负整数，如 close[1]")
+        names.add(node.value.id)
+    elif isinstance(node, ast.BinOp):
+        if type(node.op) not in _BINARY_OPS:
+            raise ExpressionError("只支持 + - * / 运算")
+        _validate(node.left, names)
+        _validate(node.right, names)
+    elif isinstance(node, ast.UnaryOp):
+        if not isinstance(node.op, (ast.USub, ast.UAdd, ast.Not)):
+            raise ExpressionError("不支持的一元运算")
+        _validate(node.operand, names)
+    elif isinstance(node, ast.BoolOp):
+        for value in node.values:
+            _validate(value, names)
+    elif isinstance(node, ast.Compare):
+        if any(type(op) not in _COMPARE_OPS for op in node.ops):
+            raise ExpressionError("只支持 > >= < <= == != 比较")
+        _validate(node.left, names)
+        for comparator in node.comparators:
+            _validate(comparator, names)
+    elif isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCTIONS:
+            raise ExpressionError(f"不支持的函数，可用函数: {', '.join(_FUNCTIONS)}")
+        if node.keywords or len(node.args) != _ARITY[node.func.id]:
+            raise ExpressionError(f"{node.func.id} 需要 {_ARITY[node.func.id]} 个参数")
+        for arg in node.args:
+            _validate(arg, names)
+    else:
+        raise ExpressionError(f"不支持的语法: {type(node).__name__}")
+
+
+def evaluate(expression: Expression, columns: Mapping[str, np.ndarray]) -> np.ndarray:
+    """
+    在列数组上求值
+
+    Args:
+        expression: 已校验的表达式
+        columns: 列名 -> (T, N) 数组
+
+    Returns:
+        (T, N) 数组；条件表达式为布尔数组
+    """
+    missing = sorted(name for name in expression.names if name not in columns)
+    if missing:
+        raise ExpressionError(f"未知的列: {', '.join(missing)}")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.asarray(_eval(expression.tree.body, columns))
+
+
+def _truthy(value) -> np.ndarray:
+    value = np.asarray(value)
+    if value.dtype == bool:
+        return value
+    return (value != 0) & ~np.isnan(value)
+
+
+def _eval(node: ast.AST, columns: Mapping[str, np.ndarray]):
+    if isinstance(node, ast.Constant):
+        return float(node.value)
+    if isinstance(node, ast.Name):
+        return columns[node.id]
+    if isinstance(node, ast.Subscript):
+        return _lag(columns[node.value.id], node.slice.value)
+    if isinstance(node, ast.BinOp):
+        return _BINARY_OPS[type(node.op)](_eval(node.left, columns), _eval(node.right, columns))
+    if isinstance(node, ast.UnaryOp):
+        operand = _eval(node.operand, columns)
+        if isinstance(node.op, ast.Not):
+            return ~_truthy(operand)
+        return -operand if isinstance(node.op, ast.USub) else operand
+    if isinstance(node, ast.BoolOp):
+        values = [_truthy(_eval(v, columns)) for v in node.values]
+        return functools.reduce(np.logical_and if isinstance(node.op, ast.And) else np.logical_or, values)
+    if isinstance(node, ast.Compare):
+        left = _eval(node.left, columns)
+        result = None
+        for op, comparator in zip(node.ops, node.comparators):
+            right = _eval(comparator, columns)
+            part = _COMPARE_OPS[type(op)](left, right)
+            result = part if result is None else result & part
+            left = right
+        return result
+    if isinstance(node, ast.Call):
+        return _FUNCTIONS[node.func.id](*(_eval(arg, columns) for arg in node.args))
+    raise ExpressionError(f"不支持的语法: {type(node).__name__}")
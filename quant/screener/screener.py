@@ -0,0 +1,251 @@
+"""
+全市场选股筛选器
+
+先用本地数据和指标做廉价的向量化过滤，只把命中的股票交给 LLM 分析师：
+1. 通过 StockDataProvider.get_panel 一次取得整个股票池对齐后的日线面板（命中本地缓存）
+2. 在 (交易日 × 股票) 数组上一次性计算全部技术指标列
+3. 在这些列上对筛选表达式求值，取最后一个交易日的结果
+
+同一股票池、同一日期的指标列缓存在内存中，调整表达式反复筛选时不再重复计算；
+当天（盘中行情仍在变化）的缓存只保留 today_ttl_minutes。
+"""
+
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.singleflight import SingleFlight
+from data.indicators import compute_indicators
+from data.panel import Panel, PANEL_FIELDS
+from .expression import FUNCTION_NAMES, Expression, compile_expression, evaluate
+
+logger = logging.getLogger(__name__)
+
+# compute_indicators 产生的列名（用一根 K 线求一次即可得到）
+INDICATOR_FIELDS = tuple(compute_indicators(np.ones(1), np.ones(1), np.ones(1), np.ones(1)))
+
+
+@dataclass
+class ScreenResult:
+    """筛选结果"""
+    expression: str
+    market: str
+    date: str
+    universe: int
+    evaluated: int
+    hits: List[Dict] = field(default_factory=list)
+    matched: int = 0
+    elapsed_ms: float = 0.0
+
+    @property
+    def tickers(self) -> List[str]:
+        return [hit["ticker"] for hit in self.hits]
+
+    def to_dict(self) -> Dict:
+        return {
+            "expression": self.expression,
+            "market": self.market,
+            "date": self.date,
+            "universe": self.universe,
+            "evaluated": self.evaluated,
+            "matched": self.matched,
+            "hits": self.hits,
+            "elapsed_ms": round(self.elapsed_ms, 1),
+        }
+
+
+def _number(value: float) -> Optional[float]:
+    value = float(value)
+    return None if np.isnan(value) or np.isinf(value) else round(value, 4)
+
+
+class Screener:
+    """选股筛选器"""
+
+    def __init__(
+        self,
+        provider,
+        lookback_days: Optional[int] = None,
+        cache_entries: int = 4,
+        today_ttl_minutes: Optional[float] = None
+    ):
+        """
+        初始化筛选器
+
+        Args:
+            provider: StockDataProvider 实例
+            lookback_days: 计算指标使用的历史天数（默认读取 SCREENER_LOOKBACK_DAYS，否则为 180）
+            cache_entries: 内存中保留的指标列缓存数量
+            today_ttl_minutes: 筛选日期为今天时指标列的缓存时间，分钟（默认读取 SCREENER_TODAY_TTL_MINUTES，否则为 5）
+        """
+        if lookback_days is None:
+            try:
+                lookback_days = int(os.getenv("SCREENER_LOOKBACK_DAYS", "180"))
+            except ValueError:
+                lookback_days = 180
+        if today_ttl_minutes is None:
+            try:
+                today_ttl_minutes = float(os.getenv("SCREENER_TODAY_TTL_MINUTES", "5"))
+            except ValueError:
+                today_ttl_minutes = 5.0
+        self.provider = provider
+        self.lookback_days = lookback_days
+        self.cache_entries = cache_entries
+        self.today_ttl = max(0.0, today_ttl_minutes) * 60
+
+        # key -> (面板, 指标列, 计算时间)
+        self._cache: "OrderedDict[Tuple, Tuple[Panel, Dict[str, np.ndarray], float]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._flight = SingleFlight()
+
+    @staticmethod
+    def available_fields() -> List[str]:
+        """表达式中可以使用的列名"""
+        return list(PANEL_FIELDS) + list(INDICATOR_FIELDS)
+
+    @staticmethod
+    def available_functions() -> List[str]:
+        """表达式中可以使用的函数"""
+        return list(FUNCTION_NAMES)
+
+    def compile(self, expression: str) -> Expression:
+        """
+        校验表达式
+
+        Raises:
+            ExpressionError: 表达式不合法
+        """
+        return compile_expression(expression, self.available_fields())
+
+    def screen(
+        self,
+        expression: str,
+        market: str = "A股",
+        date: Optional[str] = None,
+        tickers: Optional[Sequence[str]] = None,
+        sort_by: Optional[str] = None,
+        descending: bool = True,
+        limit: int = 50
+    ) -> ScreenResult:
+        """
+        在股票池上执行筛选
+
+        Args:
+            expression: 筛选表达式，如 "close > high_60[1] and volume_ratio > 2"
+            market: 市场类型
+            date: 筛选日期（默认今天，取该日及以前最后一个交易日）
+            tickers: 股票池（默认为该市场全部股票）
+            sort_by: 排序表达式（可选，如 "volume_ratio"）
+            descending: 是否降序
+            limit: 返回的命中数量上限
+
+        Returns:
+            筛选结果
+
+        Raises:
+            ExpressionError: 表达式不合法
+            ValueError: 股票池为空
+        """
+        started = time.perf_counter()
+        condition = self.compile(expression)
+        order = self.compile(sort_by) if sort_by else None
+
+        date = date or datetime.now().strftime("%Y-%m-%d")
+        universe = list(dict.fromkeys(tickers)) if tickers else self.provider.symbol_directory.list_codes(market)
+        if not universe:
+            raise ValueError(f"{market} 股票池为空，请指定股票列表或检查股票代码目录")
+
+        panel, columns = self._columns(market, date, universe)
+        result = ScreenResult(
+            expression=condition.text,
+            market=market,
+            date=str(panel.dates[-1])[:10] if len(panel.dates) else date,
+            universe=len(universe),
+            evaluated=len(panel.tickers),
+        )
+        if not len(panel.dates) or not panel.tickers:
+            result.elapsed_ms = (time.perf_counter() - started) * 1000
+            return result
+
+        # 只看最后一个交易日，且当天停牌的股票不入选
+        mask = np.asarray(evaluate(condition, columns), dtype=bool)
+        if mask.ndim == 2:
+            mask = mask[-1]
+        mask = np.broadcast_to(mask, panel.observed[-1].shape) & panel.observed[-1]
+        hits = np.flatnonzero(mask)
+        result.matched = int(len(hits))
+
+        if order is not None and len(hits):
+            score = np.broadcast_to(np.asarray(evaluate(order, columns), dtype=np.float64), panel.observed.shape)[-1][hits]
+            # NaN 始终排在最后
+            key = np.where(np.isnan(score), -np.inf, score if descending else -score)
+            hits = hits[np.argsort(-key, kind="stable")]
+
+        shown = sorted(condition.names | (order.names if order is not None else set()))
+        for j in hits[:limit]:
+            ticker = panel.tickers[j]
+            hit = {
+                "ticker": ticker,
+                "name": self.provider.symbol_directory.get_name(ticker, market),
+                "close": _number(columns["close"][-1, j]),
+                "pct_change": _number(columns["pct_change"][-1, j]),
+            }
+            for name in shown:
+                hit.setdefault(name, _number(columns[name][-1, j]))
+            result.hits.append(hit)
+
+        result.elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info(
+            f"🔍 筛选完成: {condition.text} -> {result.matched}/{result.evaluated} 只股票命中，"
+            f"耗时 {result.elapsed_ms:.0f}ms"
+        )
+        return result
+
+    # ==================== 指标列 ====================
+
+    def _columns(self, market: str, date: str, universe: List[str]) -> Tuple[Panel, Dict[str, np.ndarray]]:
+        """取得股票池的行情和指标列（带内存缓存，相同请求并发时只计算一次）"""
+        key = (market, date, self.lookback_days, tuple(universe))
+        # 今天及以后的日期包含盘中尚未确定的 K 线，缓存超过 today_ttl 后重新计算
+        intraday = date >= datetime.now().strftime("%Y-%m-%d")
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                if intraday and time.time() - entry[2] > self.today_ttl:
+                    del self._cache[key]
+                else:
+                    self._cache.move_to_end(key)
+                    return entry[0], entry[1]
+
+        panel, columns = self._flight.do(key, lambda: self._build_columns(market, date, universe))
+
+        with self._cache_lock:
+            self._cache[key] = (panel, columns, time.time())
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return panel, columns
+
+    def _build_columns(self, market: str, date: str, universe: List[str]) -> Tuple[Panel, Dict[str, np.ndarray]]:
+        started = time.perf_counter()
+        panel = self.provider.get_panel(universe, date, market, self.lookback_days, fields=PANEL_FIELDS, ffill=True)
+        columns = {name: panel.field(name) for name in PANEL_FIELDS}
+        if len(panel.dates) and panel.tickers:
+            columns.update(compute_indicators(
+                close=columns["close"],
+                high=columns["high"],
+                low=columns["low"],
+                volume=columns["volume"],
+            ))
+        logger.info(
+            f"📊 筛选指标计算完成: {len(panel.tickers)} 只股票 × {len(panel.dates)} 个交易日，"
+            f"耗时 {(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+        return panel, columns
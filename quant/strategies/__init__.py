@@ -0,0 +1,26 @@
+"""
+策略集合
+"""
+
+from typing import Dict
+
+from quant.backtest.backtest_engine import Strategy
+from .technical import ma_cross, rsi_reversion, breakout
+
+STRATEGIES: Dict[str, Strategy] = {
+    "ma_cross": ma_cross,
+    "rsi_reversion": rsi_reversion,
+    "breakout": breakout,
+}
+
+
+def get_strategy(name: str) -> Strategy:
+    """
+    按名称获取内置策略
+
+    Raises:
+        ValueError: 未知的策略名称
+    """
+    if name not in STRATEGIES:
+        raise ValueError(f"未知的策略: {name}，可用策略: {', '.join(STRATEGIES)}")
+    return STRATEGIES[name]
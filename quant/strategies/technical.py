@@ -0,0 +1,33 @@
+"""
+技术指标策略
+
+每个策略都是 (行情数组, **参数) -> 目标仓位 (T, N) 的纯函数，基于 data.indicators 在所有股票上
+一次性向量化计算。返回 NaN 表示维持上一个目标仓位（用于“进场后持有到离场条件出现”的状态型策略）。
+"""
+
+import numpy as np
+
+from data.indicators import sma, rsi, rolling_max, rolling_min
+from quant.backtest.data import PriceArrays
+
+
+def ma_cross(prices: PriceArrays, fast: int = 5, slow: int = 20) -> np.ndarray:
+    """均线交叉：快线在慢线之上时满仓，否则空仓"""
+    fast_ma = sma(prices.close, fast)
+    slow_ma = sma(prices.close, slow)
+    signal = np.where(fast_ma > slow_ma, 1.0, 0.0)
+    return np.where(np.isnan(fast_ma) | np.isnan(slow_ma), np.nan, signal)
+
+
+def rsi_reversion(prices: PriceArrays, window: int = 14, oversold: float = 30, overbought: float = 70) -> np.ndarray:
+    """RSI 超买超卖：跌破超卖线买入，升破超买线卖出，其余时间维持仓位"""
+    value = rsi(prices.close, window)
+    return np.where(value < oversold, 1.0, np.where(value > overbought, 0.0, np.nan))
+
+
+def breakout(prices: PriceArrays, entry: int = 20, exit: int = 10) -> np.ndarray:
+    """通道突破：收盘价创 entry 日新高买入，跌破 exit 日新低卖出"""
+    close = prices.close
+    upper = np.vstack([np.full((1, close.shape[1]), np.nan), rolling_max(close, entry)[:-1]])
+    lower = np.vstack([np.full((1, close.shape[1]), np.nan), rolling_min(close, exit)[:-1]])
+    return np.where(close > upper, 1.0, np.where(close < lower, 0.0, np.nan))
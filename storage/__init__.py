@@ -2,3 +2,32 @@
 存储模块
 """
 
+import os
+import logging
+
+from .base import ReportStorage
+
+logger = logging.getLogger(__name__)
+
+
+def create_storage_from_env() -> ReportStorage:
+    """
+    根据环境变量 STORAGE_BACKEND 创建存储实例
+
+    - mongodb（默认）：MongoDB，连接配置见 MONGODB_*
+    - sqlite：本地 SQLite 文件，路径见 SQLITE_STORAGE_PATH
+
+    Returns:
+        存储实例
+    """
+    backend = os.getenv("STORAGE_BACKEND", "mongodb").strip().lower()
+
+    if backend == "sqlite":
+        from .sqlite import SQLiteStorage
+        return SQLiteStorage()
+
+    if backend != "mongodb":
+        logger.warning(f"⚠️ 未知的 STORAGE_BACKEND: {backend}，使用 mongodb")
+
+    from .mongodb import MongoDBStorage
+    return MongoDBStorage()
@@ -0,0 +1,145 @@
+"""
+存储接口
+
+所有存储后端（MongoDB、SQLite）实现同一组方法，API 和命令行只依赖这个接口。
+"""
+
+import re
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+# 每个分析师报告摘要的最大字符数
+SUMMARY_MAX_CHARS = 120
+
+# 游标中的时间戳按毫秒编码（与 MongoDB 的 datetime 精度一致）
+_EPOCH = datetime(1970, 1, 1)
+
+
+def new_analysis_id(stock_symbol: str, analysis_date: str) -> str:
+    """生成分析 ID（带随机后缀，同一秒内的重复分析不会冲突）"""
+    return f"{stock_symbol}_{analysis_date}_{int(datetime.now().timestamp())}_{uuid.uuid4().hex[:6]}"
+
+
+def summarize_reports(reports: Dict[str, str], max_chars: int = SUMMARY_MAX_CHARS) -> Dict[str, str]:
+    """
+    生成报告摘要：去掉 Markdown 标记后取每个分析师报告的开头部分
+
+    Args:
+        reports: 报告字典 {analyst_name: report_content}
+        max_chars: 每份摘要的最大字符数
+
+    Returns:
+        摘要字典 {analyst_name: summary}
+    """
+    summary = {}
+    for name, content in reports.items():
+        # 去掉行首的标题/引用/列表/表格符号和行内的强调符号
+        lines = (re.sub(r"^[\s#>*+|-]+", "", line) for line in (content or "").splitlines())
+        text = re.sub(r"[*`]+", "", " ".join(line for line in lines if line))
+        text = re.sub(r"\s+", " ", text).strip()
+        summary[name] = text if len(text) <= max_chars else text[:max_chars] + "…"
+    return summary
+
+
+def to_millis(timestamp: datetime) -> int:
+    """无时区 datetime 转为毫秒时间戳"""
+    return (timestamp.replace(tzinfo=None) - _EPOCH) // timedelta(milliseconds=1)
+
+
+def from_millis(millis: int) -> datetime:
+    """毫秒时间戳转为无时区 datetime"""
+    return _EPOCH + timedelta(milliseconds=int(millis))
+
+
+def encode_cursor(timestamp: datetime, tiebreak: Any) -> str:
+    """把 (timestamp, 同一时间内的排序键) 编码为分页游标"""
+    return f"{to_millis(timestamp)}_{tiebreak}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    解析分页游标
+
+    Raises:
+        ValueError: 游标格式错误
+    """
+    try:
+        millis, tiebreak = cursor.split("_", 1)
+        return from_millis(int(millis)), tiebreak
+    except Exception:
+        raise ValueError(f"无效的分页游标: {cursor}")
+
+
+class ReportStorage:
+    """
+    存储接口
+
+    connected 为 False 时，读方法返回空结果，写方法返回 False。
+    """
+
+    connected: bool = False
+
+    @property
+    def accepts_writes(self) -> bool:
+        """当前是否可以保存报告（带本地暂存的后端在未连接时也可以接受写入）"""
+        return self.connected
+
+    def save_analysis_report(
+        self,
+        stock_symbol: str,
+        analysis_date: str,
+        market: str,
+        analysts: List[str],
+        reports: Dict[str, str],
+        research_depth: int = 3,
+        image_analysis: Optional[str] = None
+    ) -> bool:
+        raise NotImplementedError
+
+    def get_analysis_reports(
+        self,
+        stock_symbol: Optional[str] = None,
+        analysis_date: Optional[str] = None,
+        limit: int = 10
+    ) -> List[Dict]:
+        raise NotImplementedError
+
+    def list_analysis_reports(
+        self,
+        stock_symbol: Optional[str] = None,
+        analysis_date: Optional[str] = None,
+        limit: int = 10,
+        after: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        raise NotImplementedError
+
+    def get_analysis_report(self, analysis_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def save_job(self, job: Dict[str, Any]) -> bool:
+        raise NotImplementedError
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def get_unfinished_jobs(self, limit: int = 1000) -> List[Dict]:
+        raise NotImplementedError
+
+    def claim_job(self, job: Dict[str, Any]) -> bool:
+        """
+        原子地认领任务：存储中的任务为 pending，或为 running 但租约（lease_until）已过期时，
+        写入 job（状态 running、owner、lease_until）并返回 True；已被其它进程认领时返回 False
+        """
+        raise NotImplementedError
+
+    def renew_job(self, job: Dict[str, Any]) -> bool:
+        """续期租约：仅当任务仍由 job["owner"] 执行时写入 job，返回是否成功"""
+        raise NotImplementedError
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """立即写入缓冲中的数据（无缓冲的后端直接返回 True）"""
+        return True
+
+    def close(self) -> None:
+        raise NotImplementedError
@@ -0,0 +1,93 @@
+"""
+报告正文的内容寻址存储
+
+报告正文按 SHA-256 去重，压缩后单独保存（zstd 可用时优先，否则 zlib），
+报告文档只保存 {分析师: 哈希}。相同内容的重复分析只占一份空间。
+"""
+
+import os
+import zlib
+import hashlib
+import logging
+from typing import Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+CODEC_ZSTD = "zstd"
+CODEC_ZLIB = "zlib"
+CODEC_NONE = "none"
+
+try:
+    import zstandard
+    _HAS_ZSTD = True
+except ImportError:
+    zstandard = None
+    _HAS_ZSTD = False
+
+
+def _codec_from_env() -> str:
+    """读取环境变量 REPORT_COMPRESSION（zstd/zlib/none），zstd 不可用时退化为 zlib"""
+    codec = os.getenv("REPORT_COMPRESSION", CODEC_ZSTD if _HAS_ZSTD else CODEC_ZLIB).strip().lower()
+    if codec == CODEC_ZSTD and not _HAS_ZSTD:
+        logger.warning("⚠️ 未安装 zstandard，报告压缩使用 zlib")
+        return CODEC_ZLIB
+    if codec not in (CODEC_ZSTD, CODEC_ZLIB, CODEC_NONE):
+        logger.warning(f"⚠️ 未知的 REPORT_COMPRESSION: {codec}，使用 zlib")
+        return CODEC_ZLIB
+    return codec
+
+
+DEFAULT_CODEC = _codec_from_env()
+
+
+def content_hash(text: str) -> str:
+    """正文的内容地址（与压缩方式无关）"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def compress_text(text: str, codec: str = DEFAULT_CODEC) -> bytes:
+    """压缩正文"""
+    raw = text.encode("utf-8")
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=10).compress(raw)
+    if codec == CODEC_ZLIB:
+        return zlib.compress(raw, 6)
+    return raw
+
+
+def decompress_text(data: bytes, codec: str) -> str:
+    """
+    解压正文
+
+    Raises:
+        RuntimeError: 数据使用 zstd 压缩但未安装 zstandard
+    """
+    if codec == CODEC_ZSTD:
+        if not _HAS_ZSTD:
+            raise RuntimeError("报告使用 zstd 压缩，请安装 zstandard")
+        return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data).decode("utf-8")
+    return bytes(data).decode("utf-8")
+
+
+def pack_reports(reports: Dict[str, str], codec: str = DEFAULT_CODEC) -> Tuple[Dict[str, str], Dict[str, Tuple[str, bytes, int]]]:
+    """
+    把报告字典拆分为引用和正文块
+
+    Args:
+        reports: 报告字典 {analyst_name: report_content}
+        codec: 压缩方式
+
+    Returns:
+        (引用 {analyst_name: hash}, 正文块 {hash: (codec, 压缩数据, 原始字符数)})
+    """
+    refs: Dict[str, str] = {}
+    blobs: Dict[str, Tuple[str, bytes, int]] = {}
+    for name, content in reports.items():
+        content = content or ""
+        digest = content_hash(content)
+        refs[name] = digest
+        if digest not in blobs:
+            blobs[digest] = (codec, compress_text(content, codec), len(content))
+    return refs, blobs
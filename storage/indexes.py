@@ -0,0 +1,215 @@
+"""
+MongoDB 索引管理模块
+
+按实际查询形态定义索引，启动时与集合中已有的索引对比：
+缺失的创建、定义变化的重建、未登记的（冗余）索引删除，已一致时不做任何写操作。
+check_query_plans 用 explain() 检查主要查询是否命中索引、是否需要内存排序。
+"""
+
+import os
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """索引定义"""
+    name: str
+    keys: Tuple[Tuple[str, int], ...]
+    unique: bool = False
+    expire_after_seconds: Optional[int] = None
+    description: str = field(default="", compare=False)
+
+    def options(self) -> Dict[str, Any]:
+        options: Dict[str, Any] = {"name": self.name}
+        if self.unique:
+            options["unique"] = True
+        if self.expire_after_seconds is not None:
+            options["expireAfterSeconds"] = self.expire_after_seconds
+        return options
+
+    def matches(self, existing: Dict[str, Any]) -> bool:
+        """判断已有索引（list_indexes 返回的文档）是否与定义一致"""
+        return (
+            tuple((k, int(v)) for k, v in existing["key"].items()) == self.keys
+            and bool(existing.get("unique", False)) == self.unique
+            and existing.get("expireAfterSeconds") == self.expire_after_seconds
+        )
+
+
+def report_indexes(ttl_days: Optional[int] = None) -> List[IndexSpec]:
+    """
+    分析报告集合的索引
+
+    Args:
+        ttl_days: 报告保留天数（可选，设置后按 timestamp 自动删除过期报告）
+
+    Returns:
+        索引定义列表
+    """
+    specs = [
+        IndexSpec(
+            "analysis_id_unique", (("analysis_id", 1),), unique=True,
+            description="按 analysis_id 获取完整报告"
+        ),
+        IndexSpec(
+            "symbol_timestamp", (("stock_symbol", 1), ("timestamp", -1), ("_id", -1)),
+            description="按股票查询历史，按时间倒序游标分页"
+        ),
+        IndexSpec(
+            "date_timestamp", (("analysis_date", 1), ("timestamp", -1), ("_id", -1)),
+            description="按分析日期查询历史"
+        ),
+        IndexSpec(
+            "timestamp_id", (("timestamp", -1), ("_id", -1)),
+            description="不带条件的历史列表"
+        ),
+    ]
+    if ttl_days:
+        specs.append(IndexSpec(
+            "timestamp_ttl", (("timestamp", 1),), expire_after_seconds=ttl_days * 86400,
+            description="过期报告自动删除"
+        ))
+    return specs
+
+
+def job_indexes() -> List[IndexSpec]:
+    """后台任务集合的索引"""
+    return [
+        IndexSpec("job_id_unique", (("job_id", 1),), unique=True, description="按 job_id 查询任务"),
+        IndexSpec("status_created_at", (("status", 1), ("created_at", 1)), description="恢复未完成任务"),
+    ]
+
+
+def report_ttl_days_from_env() -> Optional[int]:
+    """从环境变量 MONGODB_REPORT_TTL_DAYS 读取报告保留天数，未设置或无效时不过期"""
+    try:
+        ttl_days = int(os.getenv("MONGODB_REPORT_TTL_DAYS", "0"))
+    except ValueError:
+        return None
+    return ttl_days if ttl_days > 0 else None
+
+
+def reconcile_indexes(collection, specs: List[IndexSpec], drop_unknown: bool = True) -> Dict[str, List[str]]:
+    """
+    使集合的索引与定义一致（幂等）
+
+    Args:
+        collection: pymongo 集合
+        specs: 索引定义
+        drop_unknown: 是否删除未登记的索引（_id 索引除外）
+
+    Returns:
+        {"created": [...], "rebuilt": [...], "dropped": [...], "unchanged": [...]}
+    """
+    result: Dict[str, List[str]] = {"created": [], "rebuilt": [], "dropped": [], "unchanged": []}
+    existing = {index["name"]: index for index in collection.list_indexes()}
+    wanted = {spec.name for spec in specs}
+
+    # 先删除冗余索引，避免与新索引的键重复时创建失败
+    for name, index in existing.items():
+        if name == "_id_" or name in wanted:
+            continue
+        same_keys = any(
+            tuple((k, int(v)) for k, v in index["key"].items()) == spec.keys for spec in specs
+        )
+        if drop_unknown or same_keys:
+            collection.drop_index(name)
+            result["dropped"].append(name)
+
+    for spec in specs:
+        index = existing.get(spec.name)
+        if index is not None and spec.matches(index):
+            result["unchanged"].append(spec.name)
+            continue
+        try:
+            if index is not None:
+                collection.drop_index(spec.name)
+            collection.create_index(list(spec.keys), **spec.options())
+            result["rebuilt" if index is not None else "created"].append(spec.name)
+        except Exception as e:
+            # 例如已有重复的 analysis_id 导致唯一索引无法创建，不影响其它索引
+            logger.warning(f"⚠️ 创建索引 {spec.name} 失败: {e}")
+
+    changes = {k: v for k, v in result.items() if v and k != "unchanged"}
+    if changes:
+        logger.info(f"✅ MongoDB 索引已同步 {collection.name}: {changes}")
+    return result
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """展开执行计划树"""
+    stages = [plan]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages.extend(_plan_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+def explain_query(
+    collection,
+    query: Dict[str, Any],
+    sort: Optional[List[Tuple[str, int]]] = None,
+    limit: int = 10
+) -> Dict[str, Any]:
+    """
+    分析一个查询的执行计划
+
+    Returns:
+        {"index": 使用的索引名, "collscan": 是否全表扫描, "in_memory_sort": 是否内存排序}
+    """
+    cursor = collection.find(query).limit(limit)
+    if sort:
+        cursor = cursor.sort(sort)
+    explanation = cursor.explain()
+    stages = _plan_stages(explanation["queryPlanner"]["winningPlan"])
+    names = [stage.get("stage") for stage in stages]
+    index_names = [stage["indexName"] for stage in stages if "indexName" in stage]
+    return {
+        "index": index_names[0] if index_names else None,
+        "collscan": "COLLSCAN" in names,
+        "in_memory_sort": "SORT" in names,
+    }
+
+
+def check_query_plans(collection) -> Dict[str, Dict[str, Any]]:
+    """
+    检查分析报告集合主要查询的执行计划
+
+    Returns:
+        {查询名: explain_query 结果 + ok}，ok 表示命中索引且无需内存排序
+    """
+    newest_first = [("timestamp", -1), ("_id", -1)]
+    queries = {
+        "history_by_symbol": ({"stock_symbol": "000001"}, newest_first),
+        "history_by_date": ({"analysis_date": "2024-01-01"}, newest_first),
+        "history_all": ({}, newest_first),
+        "report_by_id": ({"analysis_id": "000001_2024-01-01_0"}, None),
+    }
+
+    results = {}
+    for name, (query, sort) in queries.items():
+        plan = explain_query(collection, query, sort)
+        plan["ok"] = plan["index"] is not None and not plan["collscan"] and not plan["in_memory_sort"]
+        results[name] = plan
+        if not plan["ok"]:
+            logger.warning(f"⚠️ 查询 {name} 未充分使用索引: {plan}")
+    return results
+
+
+if __name__ == "__main__":
+    # 命令行检查：python -m storage.indexes
+    from .mongodb import MongoDBStorage
+
+    logging.basicConfig(level=logging.INFO)
+    storage = MongoDBStorage()
+    if not storage.connected:
+        raise SystemExit("MongoDB 未连接")
+    for query_name, plan in storage.check_indexes().items():
+        print(f"{'✅' if plan['ok'] else '❌'} {query_name}: {plan}")
+    storage.close()
@@ -3,16 +3,48 @@ MongoDB 存储模块
 """
 
 import os
-from datetime import datetime
-from typing import Dict, List, Optional, Any
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+import time
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any, Tuple
+from bson import ObjectId
+from bson import Binary
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, DuplicateKeyError
 import logging
 
+from .blobs import decompress_text, pack_reports
+from .base import ReportStorage, decode_cursor, encode_cursor, new_analysis_id, summarize_reports
+from .indexes import check_query_plans, job_indexes, reconcile_indexes, report_indexes, report_ttl_days_from_env
+from .write_buffer import DUPLICATE_KEY_ERROR, BufferedWriter
+
 logger = logging.getLogger(__name__)
 
+# 列表接口返回的字段（不包含完整报告正文）
+LISTING_PROJECTION = {
+    "analysis_id": 1,
+    "stock_symbol": 1,
+    "analysis_date": 1,
+    "market": 1,
+    "analysts": 1,
+    "research_depth": 1,
+    "timestamp": 1,
+    "status": 1,
+    "summary": 1,
+}
+
+# 写缓冲本地日志默认路径（MongoDB 不可用时暂存报告）
+DEFAULT_JOURNAL_PATH = os.path.join("data", "cache", "mongo_journal", "stock_analysis_reports.jsonl")
+
+# 正文块最近一次被写入引用后的保护期：正文块先于报告文档写入，保护期内即使暂无引用也不清理
+BLOB_GC_GRACE = timedelta(hours=1)
+
+
+class BlobWriteError(Exception):
+    """报告正文块写入失败（与报告文档的 BulkWriteError 区分，其 writeErrors 下标不对应报告文档）"""
+
 
-class MongoDBStorage:
+class MongoDBStorage(ReportStorage):
     """MongoDB 存储管理器"""
     
     def __init__(self):
@@ -20,8 +52,21 @@ class MongoDBStorage:
         self.client = None
         self.db = None
         self.collection = None
+        self.jobs_collection = None
+        self.blobs_collection = None
         self.connected = False
+        self.writer: Optional[BufferedWriter] = None
+        # 断开后重新连接的最短间隔（秒），避免每次请求都等待服务器选择超时
+        try:
+            self.reconnect_interval = float(os.getenv("MONGODB_RECONNECT_INTERVAL", "30"))
+        except ValueError:
+            self.reconnect_interval = 30.0
+        self._last_connect_attempt = time.monotonic()
+        self._connect_lock = threading.Lock()
+        self._gc_stop = threading.Event()
         self._connect()
+        self._start_writer()
+        self._start_blob_gc()
     
     def _connect(self):
         """连接到 MongoDB"""
@@ -49,6 +94,8 @@ class MongoDBStorage:
             # 选择数据库和集合
             self.db = self.client[database]
             self.collection = self.db["stock_analysis_reports"]
+            self.jobs_collection = self.db["analysis_jobs"]
+            self.blobs_collection = self.db["report_blobs"]
             
             # 创建索引
             self._create_indexes()
@@ -63,24 +110,163 @@ class MongoDBStorage:
             logger.error(f"❌ MongoDB 初始化失败: {e}")
             self.connected = False
     
+    def _is_available(self) -> bool:
+        """
+        MongoDB 当前是否可用
+        
+        connected 由每次写入的结果更新（网络错误时置为 False）；断开期间按
+        reconnect_interval 节流重新连接（启动时未连上则完整初始化，否则 ping）。
+        """
+        if self.connected:
+            return True
+        with self._connect_lock:
+            if self.connected:
+                return True
+            if time.monotonic() - self._last_connect_attempt < self.reconnect_interval:
+                return False
+            self._last_connect_attempt = time.monotonic()
+            if self.collection is None:
+                if self.client is not None:
+                    self.client.close()
+                self._connect()
+            else:
+                try:
+                    self.client.admin.command('ping')
+                    self.connected = True
+                    logger.info("✅ MongoDB 已恢复连接")
+                except Exception as e:
+                    logger.warning(f"⚠️ MongoDB 仍不可用: {e}")
+            return self.connected
+    
+    @property
+    def accepts_writes(self) -> bool:
+        """启用写缓冲时 MongoDB 不可用也接受写入（暂存到本地日志，恢复后回放）"""
+        return self.writer is not None or self._is_available()
+    
     def _create_indexes(self):
-        """创建索引"""
+        """按查询形态同步索引（已一致时不做写操作）"""
         try:
-            # 创建复合索引
-            self.collection.create_index([
-                ("stock_symbol", 1),
-                ("analysis_date", -1),
-                ("timestamp", -1)
-            ])
-            
-            # 创建单字段索引
-            self.collection.create_index("stock_symbol")
-            self.collection.create_index("analysis_date")
-            self.collection.create_index("timestamp")
-            
-            logger.info("✅ MongoDB 索引创建成功")
+            reconcile_indexes(self.collection, report_indexes(report_ttl_days_from_env()))
+            reconcile_indexes(self.jobs_collection, job_indexes())
         except Exception as e:
-            logger.warning(f"⚠️ MongoDB 索引创建失败: {e}")
+            logger.warning(f"⚠️ MongoDB 索引同步失败: {e}")
+    
+    def check_indexes(self) -> Dict[str, Dict[str, Any]]:
+        """
+        用 explain() 检查主要查询是否命中索引
+        
+        Returns:
+            {查询名: {"index", "collscan", "in_memory_sort", "ok"}}
+        """
+        if not self._is_available():
+            return {}
+        return check_query_plans(self.collection)
+    
+    def _start_writer(self):
+        """启动异步写缓冲（MONGODB_WRITE_BEHIND=false 时关闭，退化为同步写入）"""
+        if os.getenv("MONGODB_WRITE_BEHIND", "true").lower() in ("0", "false", "no"):
+            return
+        
+        try:
+            batch_size = int(os.getenv("MONGODB_WRITE_BATCH_SIZE", "50"))
+        except ValueError:
+            batch_size = 50
+        try:
+            flush_interval = float(os.getenv("MONGODB_WRITE_FLUSH_INTERVAL", "1.0"))
+        except ValueError:
+            flush_interval = 1.0
+        try:
+            max_retries = int(os.getenv("MONGODB_WRITE_MAX_RETRIES", "3"))
+        except ValueError:
+            max_retries = 3
+        
+        self.writer = BufferedWriter(
+            insert_many=self._insert_reports,
+            is_available=self._is_available,
+            journal_path=os.getenv("MONGODB_JOURNAL_PATH", DEFAULT_JOURNAL_PATH),
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+            max_retries=max_retries,
+            replay_interval=self.reconnect_interval
+        )
+        logger.info(f"✅ MongoDB 异步写缓冲已启动: batch_size={batch_size}, flush_interval={flush_interval}s")
+    
+    def _start_blob_gc(self):
+        """
+        启用报告 TTL 时启动正文块清理线程
+        
+        TTL 索引只删除报告文档，正文块需要定期清理（MONGODB_BLOB_GC_INTERVAL_HOURS，默认 24 小时，
+        启动时先执行一次）。多个进程同时清理是安全的。
+        """
+        if report_ttl_days_from_env() is None:
+            return
+        try:
+            interval_hours = float(os.getenv("MONGODB_BLOB_GC_INTERVAL_HOURS", "24"))
+        except ValueError:
+            interval_hours = 24.0
+        if interval_hours <= 0:
+            logger.warning("⚠️ 已设置 MONGODB_REPORT_TTL_DAYS 但关闭了正文块清理，过期报告的正文块不会被删除")
+            return
+        
+        thread = threading.Thread(
+            target=self._blob_gc_loop,
+            args=(interval_hours * 3600,),
+            name="mongo-blob-gc",
+            daemon=True
+        )
+        thread.start()
+        logger.info(f"✅ MongoDB 正文块清理已启动: 每 {interval_hours:g} 小时")
+    
+    def _blob_gc_loop(self, interval: float):
+        """定期清理无引用的正文块，直到 close()"""
+        while True:
+            if self._is_available():
+                try:
+                    self.sweep_orphan_blobs()
+                except Exception as e:
+                    logger.warning(f"⚠️ 清理正文块失败: {e}")
+            if self._gc_stop.wait(interval):
+                return
+    
+    def sweep_orphan_blobs(self, grace: timedelta = BLOB_GC_GRACE, batch_size: int = 1000) -> int:
+        """
+        删除没有任何报告引用的正文块（例如报告被 TTL 索引删除后）
+        
+        每次写入都会更新正文块的 last_used。截止时间在扫描引用之前确定，
+        扫描期间新写入或重新引用的正文块 last_used 晚于截止时间，不会被删除。
+        
+        Args:
+            grace: 保护期，last_used 在保护期内的正文块不删除
+            batch_size: 每次 delete_many 的正文块数
+            
+        Returns:
+            删除的正文块数
+        """
+        if not self._is_available():
+            return 0
+        
+        cutoff = datetime.now() - grace
+        referenced = set()
+        for document in self.collection.find({"report_refs": {"$exists": True}}, {"report_refs": 1, "_id": 0}):
+            referenced.update(document["report_refs"].values())
+        
+        candidates = self.blobs_collection.find(
+            {"$or": [{"last_used": {"$lt": cutoff}}, {"last_used": {"$exists": False}}]},
+            {"_id": 1}
+        )
+        orphans = [blob["_id"] for blob in candidates if blob["_id"] not in referenced]
+        
+        deleted = 0
+        for i in range(0, len(orphans), batch_size):
+            chunk = orphans[i:i + batch_size]
+            # 删除时再次检查 last_used，跳过扫描之后被重新引用的正文块
+            deleted += self.blobs_collection.delete_many({
+                "_id": {"$in": chunk},
+                "$or": [{"last_used": {"$lt": cutoff}}, {"last_used": {"$exists": False}}],
+            }).deleted_count
+        if deleted:
+            logger.info(f"♻️ 已清理 {deleted} 个无引用的报告正文块")
+        return deleted
     
     def save_analysis_report(
         self,
@@ -105,15 +291,18 @@ class MongoDBStorage:
             image_analysis: 图片分析结果（可选）
             
         Returns:
-            是否保存成功
+            是否保存成功（启用写缓冲时表示已进入写入队列，实际写入在后台批量完成）
         """
-        if not self.connected:
+        if not self.accepts_writes:
             logger.warning("MongoDB 未连接，跳过保存")
             return False
         
         try:
             # 生成分析 ID
-            analysis_id = f"{stock_symbol}_{analysis_date}_{int(datetime.now().timestamp())}"
+            analysis_id = new_analysis_id(stock_symbol, analysis_date)
+            
+            # 报告正文按内容哈希去重压缩，文档只保存引用；_blobs 在写入时拆到 report_blobs 集合
+            refs, blobs = pack_reports(reports)
             
             # 构建文档
             document = {
@@ -123,7 +312,12 @@ class MongoDBStorage:
                 "market": market,
                 "analysts": analysts,
                 "research_depth": research_depth,
-                "reports": reports,
+                "report_refs": refs,
+                "_blobs": {
+                    digest: {"codec": codec, "data": Binary(data), "size": size}
+                    for digest, (codec, data, size) in blobs.items()
+                },
+                "summary": summarize_reports(reports),
                 "timestamp": datetime.now(),
                 "status": "completed"
             }
@@ -132,15 +326,16 @@ class MongoDBStorage:
             if image_analysis:
                 document["image_analysis"] = image_analysis
             
-            # 插入文档
-            result = self.collection.insert_one(document)
-            
-            if result.inserted_id:
-                logger.info(f"✅ 分析报告已保存到 MongoDB: {analysis_id}")
+            # 交给写缓冲批量写入（MongoDB 不可用时暂存到本地日志）
+            if self.writer is not None:
+                self.writer.submit(document)
+                logger.info(f"📥 分析报告已加入写入队列: {analysis_id}")
                 return True
-            else:
-                logger.error("❌ MongoDB 插入失败")
-                return False
+            
+            # 插入文档
+            self._insert_reports([document])
+            logger.info(f"✅ 分析报告已保存到 MongoDB: {analysis_id}")
+            return True
                 
         except Exception as e:
             logger.error(f"❌ 保存分析报告失败: {e}")
@@ -163,7 +358,7 @@ class MongoDBStorage:
         Returns:
             报告列表
         """
-        if not self.connected:
+        if not self._is_available():
             logger.warning("MongoDB 未连接，无法获取报告")
             return []
         
@@ -175,7 +370,7 @@ class MongoDBStorage:
                 query["analysis_date"] = analysis_date
             
             cursor = self.collection.find(query).sort("timestamp", -1).limit(limit)
-            reports = list(cursor)
+            reports = self._resolve_reports(list(cursor))
             
             # 转换 ObjectId 为字符串
             for report in reports:
@@ -190,8 +385,310 @@ class MongoDBStorage:
             logger.error(f"❌ 获取分析报告失败: {e}")
             return []
     
+    def list_analysis_reports(
+        self,
+        stock_symbol: Optional[str] = None,
+        analysis_date: Optional[str] = None,
+        limit: int = 10,
+        after: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        分页获取分析报告列表（只返回元数据和摘要，不含报告正文）
+        
+        按 (timestamp, _id) 倒序做游标分页，不使用 skip，翻页代价与页码无关。
+        
+        Args:
+            stock_symbol: 股票代码（可选）
+            analysis_date: 分析日期（可选）
+            limit: 每页数量
+            after: 上一页返回的游标（可选）
+            
+        Returns:
+            (报告列表, 下一页游标)，没有更多数据时游标为 None
+            
+        Raises:
+            ValueError: 游标格式错误
+        """
+        if not self._is_available():
+            logger.warning("MongoDB 未连接，无法获取报告")
+            return [], None
+        
+        query: Dict[str, Any] = {}
+        if stock_symbol:
+            query["stock_symbol"] = stock_symbol
+        if analysis_date:
+            query["analysis_date"] = analysis_date
+        if after:
+            timestamp, tiebreak = decode_cursor(after)
+            try:
+                object_id = ObjectId(tiebreak)
+            except Exception:
+                raise ValueError(f"无效的分页游标: {after}")
+            query["$or"] = [
+                {"timestamp": {"$lt": timestamp}},
+                {"timestamp": timestamp, "_id": {"$lt": object_id}},
+            ]
+        
+        try:
+            # 多取一条用于判断是否还有下一页
+            cursor = self.collection.find(query, LISTING_PROJECTION).sort(
+                [("timestamp", -1), ("_id", -1)]
+            ).limit(limit + 1)
+            reports = list(cursor)
+        except Exception as e:
+            logger.error(f"❌ 获取分析报告列表失败: {e}")
+            return [], None
+        
+        next_cursor = None
+        if len(reports) > limit:
+            reports = reports[:limit]
+            last = reports[-1]
+            next_cursor = encode_cursor(last["timestamp"], last["_id"])
+        
+        for report in reports:
+            report["_id"] = str(report["_id"])
+            if isinstance(report.get("timestamp"), datetime):
+                report["timestamp"] = report["timestamp"].isoformat()
+        
+        return reports, next_cursor
+    
+    def get_analysis_report(self, analysis_id: str) -> Optional[Dict]:
+        """
+        按分析 ID 获取完整报告
+        
+        Args:
+            analysis_id: 分析 ID
+            
+        Returns:
+            报告字典，不存在时返回 None
+        """
+        if not self._is_available():
+            logger.warning("MongoDB 未连接，无法获取报告")
+            return None
+        
+        try:
+            report = self.collection.find_one({"analysis_id": analysis_id})
+            if report is None:
+                return None
+            report = self._resolve_reports([report])[0]
+        except Exception as e:
+            logger.error(f"❌ 获取分析报告失败: {e}")
+            return None
+        
+        report["_id"] = str(report["_id"])
+        if isinstance(report.get("timestamp"), datetime):
+            report["timestamp"] = report["timestamp"].isoformat()
+        return report
+    
+    def _insert_reports(self, documents: List[Dict]) -> None:
+        """
+        写入报告文档：先写入（已存在则跳过）正文块，再批量插入不含正文的文档
+        
+        正文块以内容哈希为 _id，重复写入是幂等的，写缓冲重试时可以直接再次调用。
+        只有报告文档的 insert_many 会抛出 BulkWriteError（writeErrors 下标对应 documents）。
+        
+        Raises:
+            BlobWriteError: 正文块写入失败（并发 upsert 产生的重复键除外）
+            BulkWriteError: 部分报告文档写入失败
+        """
+        # last_used 供 sweep_orphan_blobs 判断正文块是否刚被引用
+        now = datetime.now()
+        operations = {}
+        for document in documents:
+            for digest, blob in document.get("_blobs", {}).items():
+                operations[digest] = UpdateOne(
+                    {"_id": digest},
+                    {"$setOnInsert": blob, "$set": {"last_used": now}},
+                    upsert=True
+                )
+        try:
+            self._write_reports(documents, operations)
+        except ConnectionFailure:
+            self.connected = False
+            raise
+        self.connected = True
+    
+    def _write_reports(self, documents: List[Dict], operations: Dict[str, UpdateOne]) -> None:
+        """依次写入正文块和报告文档（由 _insert_reports 调用）"""
+        if operations:
+            try:
+                self.blobs_collection.bulk_write(list(operations.values()), ordered=False)
+            except BulkWriteError as e:
+                # 并发 upsert 同一正文块时会产生重复键，说明正文块已存在
+                errors = [
+                    err for err in e.details.get("writeErrors", [])
+                    if err.get("code") != DUPLICATE_KEY_ERROR
+                ]
+                if errors or e.details.get("writeConcernErrors"):
+                    message = errors[0].get("errmsg") if errors else "writeConcernError"
+                    raise BlobWriteError(f"报告正文块写入失败: {message}") from e
+        
+        self.collection.insert_many(
+            [{k: v for k, v in document.items() if k != "_blobs"} for document in documents],
+            ordered=False
+        )
+    
+    def _resolve_reports(self, documents: List[Dict]) -> List[Dict]:
+        """按 report_refs 取回并解压正文，填充 reports 字段（旧文档直接保存了 reports，原样返回）"""
+        digests = {
+            digest
+            for document in documents
+            for digest in document.get("report_refs", {}).values()
+        }
+        if not digests:
+            return documents
+        
+        bodies = {
+            blob["_id"]: decompress_text(blob["data"], blob["codec"])
+            for blob in self.blobs_collection.find({"_id": {"$in": list(digests)}})
+        }
+        for document in documents:
+            refs = document.pop("report_refs", None)
+            if refs is not None:
+                document["reports"] = {name: bodies.get(digest, "") for name, digest in refs.items()}
+        return documents
+    
+    def save_job(self, job: Dict[str, Any]) -> bool:
+        """
+        保存（插入或更新）后台任务
+        
+        Args:
+            job: 任务字典，以 job_id 为唯一键
+            
+        Returns:
+            是否保存成功
+        """
+        if not self._is_available():
+            return False
+        
+        try:
+            document = {k: v for k, v in job.items() if k != "_id"}
+            self.jobs_collection.replace_one({"job_id": job["job_id"]}, document, upsert=True)
+            return True
+        except Exception as e:
+            logger.error(f"❌ 保存任务失败: {e}")
+            return False
+    
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """
+        获取后台任务
+        
+        Args:
+            job_id: 任务 ID
+            
+        Returns:
+            任务字典，不存在时返回 None
+        """
+        if not self._is_available():
+            return None
+        
+        try:
+            return self.jobs_collection.find_one({"job_id": job_id}, {"_id": 0})
+        except Exception as e:
+            logger.error(f"❌ 获取任务失败: {e}")
+            return None
+    
+    def claim_job(self, job: Dict[str, Any]) -> bool:
+        """
+        原子地认领任务
+        
+        条件 upsert：任务为 pending，或为 running 但租约已过期（或没有租约）时替换为 job；
+        条件不满足时 upsert 插入与已有 job_id 冲突，说明已被其它进程认领。
+        
+        Args:
+            job: 状态为 running、带 owner 和 lease_until 的任务字典
+            
+        Returns:
+            是否认领成功
+        """
+        if not self._is_available():
+            return False
+        
+        try:
+            self.jobs_collection.replace_one(
+                {
+                    "job_id": job["job_id"],
+                    "$or": [
+                        {"status": "pending"},
+                        {"status": "running", "lease_until": {"$not": {"$gte": datetime.now()}}},
+                    ],
+                },
+                {k: v for k, v in job.items() if k != "_id"},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+        except Exception as e:
+            logger.error(f"❌ 认领任务失败: {e}")
+            return False
+    
+    def renew_job(self, job: Dict[str, Any]) -> bool:
+        """
+        续期任务租约
+        
+        Args:
+            job: 带新 lease_until 的任务字典
+            
+        Returns:
+            任务仍由 job["owner"] 执行且已更新时返回 True
+        """
+        if not self._is_available():
+            return False
+        
+        try:
+            result = self.jobs_collection.replace_one(
+                {"job_id": job["job_id"], "owner": job.get("owner"), "status": "running"},
+                {k: v for k, v in job.items() if k != "_id"}
+            )
+            return result.matched_count == 1
+        except Exception as e:
+            logger.error(f"❌ 续期任务失败: {e}")
+            return False
+    
+    def get_unfinished_jobs(self, limit: int = 1000) -> List[Dict]:
+        """
+        获取未完成的后台任务（用于进程重启后恢复）
+        
+        Args:
+            limit: 返回数量限制
+            
+        Returns:
+            按创建时间排序的任务列表
+        """
+        if not self._is_available():
+            return []
+        
+        try:
+            cursor = self.jobs_collection.find(
+                {"status": {"$in": ["pending", "running"]}},
+                {"_id": 0}
+            ).sort("created_at", 1).limit(limit)
+            return list(cursor)
+        except Exception as e:
+            logger.error(f"❌ 获取未完成任务失败: {e}")
+            return []
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        立即写入缓冲中的报告
+        
+        Args:
+            timeout: 最长等待秒数
+            
+        Returns:
+            是否在超时前完成
+        """
+        if self.writer is None:
+            return True
+        return self.writer.flush(timeout)
+    
     def close(self):
-        """关闭连接"""
+        """刷新写缓冲并关闭连接"""
+        self._gc_stop.set()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
         if self.client:
             self.client.close()
             self.connected = False
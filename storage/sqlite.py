@@ -0,0 +1,513 @@
+"""
+SQLite 存储模块 - 无需 MongoDB 服务的本地持久化
+
+与 MongoDBStorage 提供相同的接口。使用 WAL 模式，读写互不阻塞；
+索引与历史查询的形态一致（按股票/日期过滤，按时间倒序游标分页）。
+"""
+
+import os
+import json
+import sqlite3
+import threading
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .blobs import decompress_text, pack_reports
+from .base import ReportStorage, decode_cursor, encode_cursor, from_millis, new_analysis_id, summarize_reports, to_millis
+
+logger = logging.getLogger(__name__)
+
+# 默认数据库路径
+DEFAULT_SQLITE_PATH = os.path.join("data", "storage", "tradingagents.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis_reports (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    analysis_id TEXT NOT NULL UNIQUE,
+    stock_symbol TEXT NOT NULL,
+    analysis_date TEXT NOT NULL,
+    market TEXT,
+    analysts TEXT,
+    research_depth INTEGER,
+    reports TEXT,
+    report_refs TEXT,
+    summary TEXT,
+    image_analysis TEXT,
+    timestamp INTEGER NOT NULL,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_reports_symbol_ts ON analysis_reports (stock_symbol, timestamp DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_reports_date_ts ON analysis_reports (analysis_date, timestamp DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_reports_ts ON analysis_reports (timestamp DESC, id DESC);
+
+CREATE TABLE IF NOT EXISTS report_blobs (
+    hash TEXT PRIMARY KEY,
+    codec TEXT NOT NULL,
+    data BLOB NOT NULL,
+    size INTEGER
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS analysis_jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created_at TEXT,
+    owner TEXT,
+    lease_until TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON analysis_jobs (status, created_at);
+"""
+
+# 列表接口返回的列（不包含完整报告正文）
+_LISTING_COLUMNS = "id, analysis_id, stock_symbol, analysis_date, market, analysts, research_depth, timestamp, status, summary"
+
+
+def _iso(value: Any) -> Any:
+    """datetime 转为定长 ISO 字符串（字符串比较与时间先后一致），其它值原样返回"""
+    return value.isoformat(timespec="microseconds") if isinstance(value, datetime) else value
+
+
+def _json_default(value: Any) -> Any:
+    """任务字典中的 datetime 按 ISO 格式保存"""
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"无法序列化的类型: {type(value)}")
+
+
+def _json_object_hook(value: Dict) -> Any:
+    if len(value) == 1 and "$date" in value:
+        return datetime.fromisoformat(value["$date"])
+    return value
+
+
+class SQLiteStorage(ReportStorage):
+    """SQLite 存储管理器"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        初始化 SQLite 数据库
+
+        Args:
+            path: 数据库文件路径，默认读取环境变量 SQLITE_STORAGE_PATH
+        """
+        self.path = path or os.getenv("SQLITE_STORAGE_PATH", DEFAULT_SQLITE_PATH)
+        self.conn: Optional[sqlite3.Connection] = None
+        self.connected = False
+        self._lock = threading.Lock()
+        self._connect()
+
+    def _connect(self):
+        """打开数据库并建表"""
+        try:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.row_factory = sqlite3.Row
+            with self._lock:
+                self.conn.execute("PRAGMA journal_mode=WAL")
+                self.conn.execute("PRAGMA synchronous=NORMAL")
+                self.conn.executescript(_SCHEMA)
+                # 早期版本的表没有 report_refs 列
+                columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(analysis_reports)")}
+                if "report_refs" not in columns:
+                    self.conn.execute("ALTER TABLE analysis_reports ADD COLUMN report_refs TEXT")
+                # 早期版本的任务表没有 owner/lease_until 列
+                job_columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(analysis_jobs)")}
+                for column in ("owner", "lease_until"):
+                    if column not in job_columns:
+                        self.conn.execute(f"ALTER TABLE analysis_jobs ADD COLUMN {column} TEXT")
+                self.conn.commit()
+            self.connected = True
+            logger.info(f"✅ SQLite 存储已打开: {self.path}")
+        except Exception as e:
+            logger.error(f"❌ SQLite 存储初始化失败: {e}")
+            self.connected = False
+
+    # ==================== 分析报告 ====================
+
+    def save_analysis_report(
+        self,
+        stock_symbol: str,
+        analysis_date: str,
+        market: str,
+        analysts: List[str],
+        reports: Dict[str, str],
+        research_depth: int = 3,
+        image_analysis: Optional[str] = None
+    ) -> bool:
+        """
+        保存分析报告
+
+        Args:
+            stock_symbol: 股票代码
+            analysis_date: 分析日期
+            market: 市场类型
+            analysts: 分析师列表
+            reports: 报告字典 {analyst_name: report_content}
+            research_depth: 研究深度
+            image_analysis: 图片分析结果（可选）
+
+        Returns:
+            是否保存成功
+        """
+        if not self.connected:
+            logger.warning("SQLite 未打开，跳过保存")
+            return False
+
+        analysis_id = new_analysis_id(stock_symbol, analysis_date)
+        # 报告正文按内容哈希去重压缩，表中只保存引用
+        refs, blobs = pack_reports(reports)
+        try:
+            # 正文块和报告在同一个事务中写入，报告插入失败时正文块一并回滚，不留下无引用的正文块
+            with self._lock, self.conn:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO report_blobs (hash, codec, data, size) VALUES (?, ?, ?, ?)",
+                    [(digest, codec, data, size) for digest, (codec, data, size) in blobs.items()],
+                )
+                self.conn.execute(
+                    "INSERT INTO analysis_reports (analysis_id, stock_symbol, analysis_date, market, analysts, "
+                    "research_depth, report_refs, summary, image_analysis, timestamp, status) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        analysis_id,
+                        stock_symbol,
+                        analysis_date,
+                        market,
+                        json.dumps(analysts, ensure_ascii=False),
+                        research_depth,
+                        json.dumps(refs, ensure_ascii=False),
+                        json.dumps(summarize_reports(reports), ensure_ascii=False),
+                        image_analysis,
+                        to_millis(datetime.now()),
+                        "completed",
+                    ),
+                )
+            logger.info(f"✅ 分析报告已保存到 SQLite: {analysis_id}")
+            return True
+        except Exception as e:
+            logger.error(f"❌ 保存分析报告失败: {e}")
+            return False
+
+    def get_analysis_reports(
+        self,
+        stock_symbol: Optional[str] = None,
+        analysis_date: Optional[str] = None,
+        limit: int = 10
+    ) -> List[Dict]:
+        """
+        获取分析报告（完整内容）
+
+        Args:
+            stock_symbol: 股票代码（可选）
+            analysis_date: 分析日期（可选）
+            limit: 返回数量限制
+
+        Returns:
+            报告列表
+        """
+        if not self.connected:
+            logger.warning("SQLite 未打开，无法获取报告")
+            return []
+
+        where, params = self._filters(stock_symbol, analysis_date)
+        try:
+            with self._lock:
+                rows = self.conn.execute(
+                    f"SELECT * FROM analysis_reports {where} ORDER BY timestamp DESC, id DESC LIMIT ?",
+                    (*params, limit),
+                ).fetchall()
+                return self._resolve_reports([self._row_to_report(row) for row in rows])
+        except Exception as e:
+            logger.error(f"❌ 获取分析报告失败: {e}")
+            return []
+
+    def list_analysis_reports(
+        self,
+        stock_symbol: Optional[str] = None,
+        analysis_date: Optional[str] = None,
+        limit: int = 10,
+        after: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        分页获取分析报告列表（只返回元数据和摘要，不含报告正文）
+
+        Args:
+            stock_symbol: 股票代码（可选）
+            analysis_date: 分析日期（可选）
+            limit: 每页数量
+            after: 上一页返回的游标（可选）
+
+        Returns:
+            (报告列表, 下一页游标)，没有更多数据时游标为 None
+
+        Raises:
+            ValueError: 游标格式错误
+        """
+        if not self.connected:
+            logger.warning("SQLite 未打开，无法获取报告")
+            return [], None
+
+        where, params = self._filters(stock_symbol, analysis_date)
+        if after:
+            timestamp, tiebreak = decode_cursor(after)
+            try:
+                row_id = int(tiebreak)
+            except ValueError:
+                raise ValueError(f"无效的分页游标: {after}")
+            where += (" AND " if where else "WHERE ") + "(timestamp, id) < (?, ?)"
+            params.extend([to_millis(timestamp), row_id])
+
+        try:
+            with self._lock:
+                rows = self.conn.execute(
+                    f"SELECT {_LISTING_COLUMNS} FROM analysis_reports {where} "
+                    "ORDER BY timestamp DESC, id DESC LIMIT ?",
+                    (*params, limit + 1),
+                ).fetchall()
+        except Exception as e:
+            logger.error(f"❌ 获取分析报告列表失败: {e}")
+            return [], None
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(from_millis(last["timestamp"]), last["id"])
+
+        return [self._row_to_report(row) for row in rows], next_cursor
+
+    def get_analysis_report(self, analysis_id: str) -> Optional[Dict]:
+        """
+        按分析 ID 获取完整报告
+
+        Args:
+            analysis_id: 分析 ID
+
+        Returns:
+            报告字典，不存在时返回 None
+        """
+        if not self.connected:
+            logger.warning("SQLite 未打开，无法获取报告")
+            return None
+
+        try:
+            with self._lock:
+                row = self.conn.execute(
+                    "SELECT * FROM analysis_reports WHERE analysis_id = ?", (analysis_id,)
+                ).fetchone()
+                if row is None:
+                    return None
+                return self._resolve_reports([self._row_to_report(row)])[0]
+        except Exception as e:
+            logger.error(f"❌ 获取分析报告失败: {e}")
+            return None
+
+    @staticmethod
+    def _filters(stock_symbol: Optional[str], analysis_date: Optional[str]) -> Tuple[str, List[Any]]:
+        clauses, params = [], []
+        if stock_symbol:
+            clauses.append("stock_symbol = ?")
+            params.append(stock_symbol)
+        if analysis_date:
+            clauses.append("analysis_date = ?")
+            params.append(analysis_date)
+        return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    @staticmethod
+    def _row_to_report(row: sqlite3.Row) -> Dict:
+        """数据库行转为与 MongoDBStorage 相同结构的字典"""
+        report = dict(row)
+        report["_id"] = str(report.pop("id"))
+        report["timestamp"] = from_millis(report["timestamp"]).isoformat()
+        for key in ("analysts", "reports", "report_refs", "summary"):
+            if report.get(key) is not None:
+                report[key] = json.loads(report[key])
+        for key in ("image_analysis", "reports", "report_refs"):
+            if report.get(key) is None:
+                report.pop(key, None)
+        return report
+
+    def _resolve_reports(self, reports: List[Dict]) -> List[Dict]:
+        """按 report_refs 取回并解压正文，填充 reports 字段（调用方需持有锁）"""
+        digests = list({
+            digest
+            for report in reports
+            for digest in report.get("report_refs", {}).values()
+        })
+        if not digests:
+            return reports
+
+        placeholders = ", ".join("?" * len(digests))
+        bodies = {
+            row["hash"]: decompress_text(row["data"], row["codec"])
+            for row in self.conn.execute(
+                f"SELECT hash, codec, data FROM report_blobs WHERE hash IN ({placeholders})", digests
+            )
+        }
+        for report in reports:
+            refs = report.pop("report_refs", None)
+            if refs is not None:
+                report["reports"] = {name: bodies.get(digest, "") for name, digest in refs.items()}
+        return reports
+
+    # ==================== 后台任务 ====================
+
+    def save_job(self, job: Dict[str, Any]) -> bool:
+        """
+        保存（插入或更新）后台任务
+
+        Args:
+            job: 任务字典，以 job_id 为唯一键
+
+        Returns:
+            是否保存成功
+        """
+        if not self.connected:
+            return False
+
+        try:
+            with self._lock:
+                self.conn.execute(
+                    "INSERT INTO analysis_jobs (job_id, status, created_at, owner, lease_until, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(job_id) DO UPDATE SET status = excluded.status, owner = excluded.owner, "
+                    "lease_until = excluded.lease_until, data = excluded.data",
+                    self._job_row(job),
+                )
+                self.conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"❌ 保存任务失败: {e}")
+            return False
+
+    def claim_job(self, job: Dict[str, Any]) -> bool:
+        """
+        原子地认领任务（单条 upsert 语句，多个进程共用同一个数据库文件时也只有一个成功）
+
+        Args:
+            job: 状态为 running、带 owner 和 lease_until 的任务字典
+
+        Returns:
+            是否认领成功
+        """
+        if not self.connected:
+            return False
+
+        try:
+            with self._lock:
+                cursor = self.conn.execute(
+                    "INSERT INTO analysis_jobs (job_id, status, created_at, owner, lease_until, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(job_id) DO UPDATE SET status = excluded.status, owner = excluded.owner, "
+                    "lease_until = excluded.lease_until, data = excluded.data "
+                    "WHERE analysis_jobs.status = 'pending' OR (analysis_jobs.status = 'running' "
+                    "AND (analysis_jobs.lease_until IS NULL OR analysis_jobs.lease_until < ?))",
+                    self._job_row(job) + (_iso(datetime.now()),),
+                )
+                self.conn.commit()
+            return cursor.rowcount == 1
+        except Exception as e:
+            logger.error(f"❌ 认领任务失败: {e}")
+            return False
+
+    def renew_job(self, job: Dict[str, Any]) -> bool:
+        """
+        续期任务租约
+
+        Args:
+            job: 带新 lease_until 的任务字典
+
+        Returns:
+            任务仍由 job["owner"] 执行且已更新时返回 True
+        """
+        if not self.connected:
+            return False
+
+        try:
+            _, status, _, owner, lease_until, data = self._job_row(job)
+            with self._lock:
+                cursor = self.conn.execute(
+                    "UPDATE analysis_jobs SET status = ?, lease_until = ?, data = ? "
+                    "WHERE job_id = ? AND owner = ? AND status = 'running'",
+                    (status, lease_until, data, job["job_id"], owner),
+                )
+                self.conn.commit()
+            return cursor.rowcount == 1
+        except Exception as e:
+            logger.error(f"❌ 续期任务失败: {e}")
+            return False
+
+    @staticmethod
+    def _job_row(job: Dict[str, Any]) -> Tuple[Any, ...]:
+        """任务字典转为 (job_id, status, created_at, owner, lease_until, data)"""
+        data = json.dumps(
+            {k: v for k, v in job.items() if k != "_id"},
+            ensure_ascii=False,
+            default=_json_default,
+        )
+        return (
+            job["job_id"],
+            job["status"],
+            _iso(job.get("created_at")),
+            job.get("owner"),
+            _iso(job.get("lease_until")),
+            data,
+        )
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """
+        获取后台任务
+
+        Args:
+            job_id: 任务 ID
+
+        Returns:
+            任务字典，不存在时返回 None
+        """
+        if not self.connected:
+            return None
+
+        try:
+            with self._lock:
+                row = self.conn.execute("SELECT data FROM analysis_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        except Exception as e:
+            logger.error(f"❌ 获取任务失败: {e}")
+            return None
+
+        return json.loads(row["data"], object_hook=_json_object_hook) if row is not None else None
+
+    def get_unfinished_jobs(self, limit: int = 1000) -> List[Dict]:
+        """
+        获取未完成的后台任务（用于进程重启后恢复）
+
+        Args:
+            limit: 返回数量限制
+
+        Returns:
+            按创建时间排序的任务列表
+        """
+        if not self.connected:
+            return []
+
+        try:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT data FROM analysis_jobs WHERE status IN ('pending', 'running') "
+                    "ORDER BY created_at LIMIT ?",
+                    (limit,),
+                ).fetchall()
+        except Exception as e:
+            logger.error(f"❌ 获取未完成任务失败: {e}")
+            return []
+
+        return [json.loads(row["data"], object_hook=_json_object_hook) for row in rows]
+
+    def close(self):
+        """关闭数据库"""
+        if self.conn is not None:
+            with self._lock:
+                self.conn.close()
+            self.conn = None
+            self.connected = False
+            logger.info("SQLite 存储已关闭")
@@ -0,0 +1,279 @@
+"""
+MongoDB 异步写缓冲模块
+
+后台线程批量写入文档（insert_many, ordered=False），按数量/时间间隔/关闭时刷新；
+对网络类错误进行重试，重试失败或 MongoDB 不可用时把文档追加到本地日志文件，
+MongoDB 恢复后自动回放，保证不丢数据。
+"""
+
+import os
+import time
+import queue
+import threading
+import logging
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from bson import ObjectId, json_util
+from pymongo.errors import BulkWriteError, ConnectionFailure
+
+logger = logging.getLogger(__name__)
+
+# MongoDB 重复键错误码（重试时已写入的文档会触发，视为成功）
+DUPLICATE_KEY_ERROR = 11000
+
+
+class _FlushRequest:
+    """刷新请求标记"""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+_STOP = object()
+
+
+class BufferedWriter:
+    """
+    写缓冲
+
+    每个文档在入队时分配 _id，因此重试和日志回放是幂等的：
+    已写入的文档再次写入只会产生重复键错误，会被忽略。
+    """
+
+    def __init__(
+        self,
+        insert_many: Callable[[List[Dict]], None],
+        is_available: Callable[[], bool],
+        journal_path: str,
+        batch_size: int = 50,
+        flush_interval: float = 1.0,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+        replay_interval: float = 30.0
+    ):
+        """
+        初始化写缓冲
+
+        Args:
+            insert_many: 批量写入函数
+            is_available: 判断 MongoDB 当前是否可用
+            journal_path: 本地日志文件路径
+            batch_size: 达到该数量立即写入
+            flush_interval: 最长缓冲时间（秒）
+            max_retries: 网络错误重试次数
+            retry_backoff: 重试基础等待时间（秒），按 2 的幂递增
+            replay_interval: 本地日志中有待回放的文档时，空闲状态下检查 MongoDB 是否恢复的间隔（秒）
+        """
+        self.insert_many = insert_many
+        self.is_available = is_available
+        self.journal_path = Path(journal_path)
+        # 回放中的日志：回放完成后删除；进程在回放途中退出时保留，下次回放时一并写入
+        self.replay_path = self.journal_path.with_suffix(self.journal_path.suffix + ".replaying")
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.replay_interval = replay_interval
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._journal_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="mongo-writer", daemon=True)
+        self._thread.start()
+
+        # 启动时回放上次遗留的日志（包括回放途中中断的 .replaying 文件）
+        if self._has_journal() and self.is_available():
+            self._queue.put(_FlushRequest())
+
+    # ==================== 公共接口 ====================
+
+    def submit(self, document: Dict) -> None:
+        """提交一个待写入的文档（立即返回）"""
+        if self._closed:
+            raise RuntimeError("BufferedWriter 已关闭")
+        document.setdefault("_id", ObjectId())
+        self._queue.put(document)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        立即写入缓冲中的文档
+
+        Returns:
+            是否在超时前完成
+        """
+        request = _FlushRequest()
+        self._queue.put(request)
+        return request.done.wait(timeout)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """刷新剩余文档并停止后台线程"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning("⚠️ MongoDB 写缓冲关闭超时，部分文档可能仍在写入")
+
+    def pending_journal_size(self) -> int:
+        """本地日志中待回放的文档数（含回放中断遗留的文档）"""
+        count = 0
+        with self._journal_lock:
+            for path in (self.journal_path, self.replay_path):
+                if path.exists():
+                    with open(path, "r", encoding="utf-8") as f:
+                        count += sum(1 for line in f if line.strip())
+        return count
+
+    def _has_journal(self) -> bool:
+        return self.journal_path.exists() or self.replay_path.exists()
+
+    # ==================== 后台线程 ====================
+
+    def _run(self) -> None:
+        batch: List[Dict] = []
+        deadline = None
+
+        while True:
+            if deadline is not None:
+                timeout = max(0.0, deadline - time.monotonic())
+            else:
+                # 空闲时若有待回放的日志，定期醒来检查 MongoDB 是否恢复
+                timeout = self.replay_interval if self._has_journal() else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, dict):
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(batch) < self.batch_size:
+                    continue
+
+            # 达到批量大小、超时、刷新请求或停止信号时写入
+            if batch:
+                self._write(batch)
+                batch = []
+            deadline = None
+
+            if item is None:
+                self._replay_journal()
+            elif isinstance(item, _FlushRequest):
+                self._replay_journal()
+                item.done.set()
+            elif item is _STOP:
+                self._replay_journal()
+                return
+
+    def _write(self, batch: List[Dict]) -> None:
+        if not self.is_available():
+            self._spill(batch)
+            return
+
+        remaining = batch
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.insert_many(remaining)
+                logger.info(f"✅ 批量写入 MongoDB: {len(remaining)} 个文档")
+                self._replay_journal()
+                return
+            except BulkWriteError as e:
+                # 重复键说明已写入；其余错误的文档重试
+                failed_indexes = {
+                    err["index"] for err in e.details.get("writeErrors", [])
+                    if err.get("code") != DUPLICATE_KEY_ERROR
+                }
+                if not failed_indexes and not e.details.get("writeConcernErrors"):
+                    return
+                if failed_indexes:
+                    remaining = [doc for i, doc in enumerate(remaining) if i in failed_indexes]
+                logger.warning(f"⚠️ MongoDB 批量写入部分失败: {len(remaining)} 个文档")
+            except ConnectionFailure as e:
+                logger.warning(f"⚠️ MongoDB 写入网络错误 ({attempt + 1}/{self.max_retries + 1}): {e}")
+            except Exception as e:
+                logger.error(f"❌ MongoDB 写入失败: {e}")
+                break
+
+            if attempt < self.max_retries:
+                time.sleep(self.retry_backoff * (2 ** attempt))
+
+        self._spill(remaining)
+
+    # ==================== 本地日志 ====================
+
+    def _spill(self, documents: List[Dict]) -> None:
+        """追加到本地日志"""
+        try:
+            with self._journal_lock:
+                self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.journal_path, "a", encoding="utf-8") as f:
+                    for document in documents:
+                        f.write(json_util.dumps(document, ensure_ascii=False) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+            logger.warning(f"💾 MongoDB 不可用，{len(documents)} 个文档已写入本地日志: {self.journal_path}")
+        except Exception as e:
+            logger.error(f"❌ 写入本地日志失败，{len(documents)} 个文档丢失: {e}")
+
+    def _replay_journal(self) -> None:
+        """MongoDB 可用时回放本地日志"""
+        if not self._has_journal() or not self.is_available():
+            return
+
+        replay_path = self.replay_path
+        with self._journal_lock:
+            if self.journal_path.exists() and replay_path.exists():
+                # 上次回放途中中断遗留的文件：把新日志追加进去，不能覆盖
+                with open(self.journal_path, "rb") as src, open(replay_path, "ab+") as dst:
+                    # 遗留文件的最后一行可能不完整，先补换行，避免与追加的第一行粘连
+                    if dst.tell() > 0:
+                        dst.seek(-1, os.SEEK_END)
+                        if dst.read(1) != b"\n":
+                            dst.write(b"\n")
+                    for line in src:
+                        dst.write(line if line.endswith(b"\n") else line + b"\n")
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                self.journal_path.unlink()
+            elif self.journal_path.exists():
+                os.replace(self.journal_path, replay_path)
+
+        documents = []
+        with open(replay_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    documents.append(json_util.loads(line))
+                except ValueError as e:
+                    # 写入日志途中进程退出会留下不完整的最后一行
+                    logger.warning(f"⚠️ 跳过无法解析的日志行: {e}")
+
+        if not documents:
+            replay_path.unlink()
+            return
+
+        logger.info(f"♻️ 回放本地日志: {len(documents)} 个文档")
+        failed: List[Dict] = []
+        for i in range(0, len(documents), self.batch_size):
+            chunk = documents[i:i + self.batch_size]
+            try:
+                self.insert_many(chunk)
+            except BulkWriteError as e:
+                failed_indexes = {
+                    err["index"] for err in e.details.get("writeErrors", [])
+                    if err.get("code") != DUPLICATE_KEY_ERROR
+                }
+                failed.extend(doc for j, doc in enumerate(chunk) if j in failed_indexes)
+            except Exception as e:
+                logger.warning(f"⚠️ 回放本地日志失败，稍后重试: {e}")
+                failed.extend(documents[i:])
+                break
+
+        # 先把失败的文档写回日志再删除回放文件：中途退出时文档可能重复，但按 _id 写入是幂等的
+        if failed:
+            self._spill(failed)
+        replay_path.unlink()